@@ -0,0 +1,12 @@
+# backend/main/celery.py
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')
+
+app = Celery('main')
+
+# Toda la configuración de Celery vive en settings.py con el prefijo CELERY_
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -1,4 +1,5 @@
 # backend/main/settings.py
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -24,6 +25,7 @@ SHARED_APPS = (
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # OpClass/GinIndex en índices de expresiones (users)
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -80,7 +82,10 @@ AUTH_USER_MODEL = 'users.User'
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     # --- CAMBIO 2: MIDDLEWARE DE TENANTS ---
-    'django_tenants.middleware.main.TenantMainMiddleware',
+    # TenantMainMiddleware con LRU hostname -> inquilino (sin consulta por petición)
+    'apps.tenants.middleware.TenantCacheMiddleware',
+    # Consumo por inquilino (peticiones, consultas, tiempo de BD): apps.core.consumo
+    'apps.core.middleware.ConsumoMiddleware',
 
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -116,25 +121,78 @@ WSGI_APPLICATION = 'main.wsgi.application'
 # --- VARIABLES DE ENTORNO ---
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+STRIPE_WEBHOOK_LOTE = int(os.getenv('STRIPE_WEBHOOK_LOTE', '100'))  # eventos por lote del worker
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')  # ej: http://localhost:12111 con run_fake_stripe
+STRIPE_TIMEOUT_CONEXION = float(os.getenv('STRIPE_TIMEOUT_CONEXION', '2'))
+STRIPE_TIMEOUT_LECTURA = float(os.getenv('STRIPE_TIMEOUT_LECTURA', '10'))
+STRIPE_MAX_REINTENTOS = int(os.getenv('STRIPE_MAX_REINTENTOS', '2'))
+STRIPE_POOL_CONEXIONES = int(os.getenv('STRIPE_POOL_CONEXIONES', '20'))
+STRIPE_CACHE_PAYMENT_INTENT_SEGUNDOS = int(os.getenv('STRIPE_CACHE_PAYMENT_INTENT_SEGUNDOS', '5'))
+PAGOS_CONCILIACION_VENTANA_HORAS = int(os.getenv('PAGOS_CONCILIACION_VENTANA_HORAS', '6'))
+ROLES_CACHE_SEGUNDOS = int(os.getenv('ROLES_CACHE_SEGUNDOS', '300'))  # permisos por grupo (apps.users.roles)
+AUTH_USUARIO_CACHE_SEGUNDOS = int(os.getenv('AUTH_USUARIO_CACHE_SEGUNDOS', '60'))  # User completo (apps.users.authentication)
+USUARIOS_STATS_CACHE_SEGUNDOS = int(os.getenv('USUARIOS_STATS_CACHE_SEGUNDOS', '60'))  # UserViewSet.stats
+IMPORTACION_PROCESOS = int(os.getenv('IMPORTACION_PROCESOS', '0')) or None  # hash de contraseñas en import_users (None = núcleos)
+IMPORTACION_API_MAX_BYTES = int(os.getenv('IMPORTACION_API_MAX_BYTES', str(5 * 1024 * 1024)))  # CSV por la API (va en el mensaje de Celery); más grande: manage.py import_users
+BITACORA_COLA_MAX = int(os.getenv('BITACORA_COLA_MAX', '10000'))  # eventos en memoria por proceso (apps.core.bitacora)
+BITACORA_LOTE = int(os.getenv('BITACORA_LOTE', '500'))
+BITACORA_FLUSH_SEGUNDOS = float(os.getenv('BITACORA_FLUSH_SEGUNDOS', '1'))
+CONSUMO_FLUSH_SEGUNDOS = float(os.getenv('CONSUMO_FLUSH_SEGUNDOS', '60'))  # cada cuánto vuelca cada proceso su consumo (apps.core.consumo)
+CONSUMO_MAX_DIAS = int(os.getenv('CONSUMO_MAX_DIAS', '366'))  # rango máximo de TenantUsageView
+TENANT_CACHE_MAX = int(os.getenv('TENANT_CACHE_MAX', '1024'))  # hostnames en el LRU de apps.tenants.resolucion
+TENANT_CACHE_VERSION_SEGUNDOS = float(os.getenv('TENANT_CACHE_VERSION_SEGUNDOS', '5'))  # cada cuánto se revisa la versión compartida
+TENANT_INFO_CACHE_SEGUNDOS = int(os.getenv('TENANT_INFO_CACHE_SEGUNDOS', '3600'))  # TenantInfoView
+TENANT_PLANTILLA_SCHEMA = os.getenv('TENANT_PLANTILLA_SCHEMA', 'plantilla_tenant')  # esquema migrado que se clona en cada alta
+TENANT_RESERVA_PREFIJO = os.getenv('TENANT_RESERVA_PREFIJO', 'reserva_')  # esquemas pre-clonados listos para renombrar
+TENANT_RESERVAS = int(os.getenv('TENANT_RESERVAS', '3'))
+MIGRACION_PROCESOS = int(os.getenv('MIGRACION_PROCESOS', '4'))  # esquemas migrados a la vez por migrate_tenants_parallel
+ANALITICA_HILOS = int(os.getenv('ANALITICA_HILOS', '8'))  # esquemas consultados a la vez (apps.tenants.analitica)
+ANALITICA_DIAS_ACTIVO = int(os.getenv('ANALITICA_DIAS_ACTIVO', '30'))  # usuario activo = login en estos días
+ANALITICA_MAX_EDAD_SEGUNDOS = int(os.getenv('ANALITICA_MAX_EDAD_SEGUNDOS', '86400'))  # recalcula aunque la marca no cambie
+RESPALDO_HILOS = int(os.getenv('RESPALDO_HILOS', '4'))  # tablas copiadas a la vez por export_tenant/import_tenant
+RESPALDO_COMPRESION = int(os.getenv('RESPALDO_COMPRESION', '3'))  # nivel de gzip (1 rápido ... 9 pequeño)
 SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
 MAILGUN_API_KEY = os.getenv('MAILGUN_API_KEY')
 MAILGUN_DOMAIN = os.getenv('MAILGUN_DOMAIN')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@tudominio.com')
+DEFAULT_FROM_NAME = os.getenv('DEFAULT_FROM_NAME', 'Tu Tienda')
+MAILGUN_API_BASE = os.getenv('MAILGUN_API_BASE', 'https://api.mailgun.net/v3')  # ej: http://localhost:12112/v3 con run_fake_mail
 
 # --- MICROSERVICIOS (API GATEWAY) ---
 PREDICTION_SERVICE_URL = os.getenv('PREDICTION_SERVICE_URL', 'http://localhost:8002')
 REPORTS_SERVICE_URL = os.getenv('REPORTS_SERVICE_URL', 'http://localhost:8001')
 
 
+# Conexiones persistentes: cada hilo reutiliza la suya hasta DB_CONN_MAX_AGE segundos,
+# comprobando que sigue viva antes de usarla tras una petición
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=os.environ.get('DATABASE_URL')
+        default=os.environ.get('DATABASE_URL'),
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
     )
 }
 
-DATABASES['default']['ENGINE'] = 'django_tenants.postgresql_backend'
+# django-tenants con un search_path que no se repite si el esquema no cambia (apps.core.postgresql_backend)
+DATABASES['default']['ENGINE'] = 'apps.core.postgresql_backend'
+TENANT_LIMIT_SET_CALLS = True
+
+# Shards de inquilinos (apps.tenants.shards): 'default' tiene el esquema público y también
+# inquilinos; cada base extra se declara como "alias=url", separadas por ';'
+# (ej: "shard1=postgres://...;shard2=postgres://...") y se prepara con migrate_schemas --shared --database=<alias>
+TENANT_SHARDS_URLS = os.getenv('TENANT_SHARDS_URLS', '')
+for _shard in filter(None, (s.strip() for s in TENANT_SHARDS_URLS.split(';'))):
+    _alias, _url = (parte.strip() for parte in _shard.split('=', 1))
+    DATABASES[_alias] = dj_database_url.parse(_url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+    DATABASES[_alias]['ENGINE'] = 'apps.core.postgresql_backend'
+TENANT_SHARDS = list(DATABASES)
+PG_DUMP = os.getenv('PG_DUMP', 'pg_dump')  # binarios de move_tenant_shard
+PG_RESTORE = os.getenv('PG_RESTORE', 'pg_restore')
 
 DATABASE_ROUTERS = (
+    'apps.tenants.shards.ShardRouter',  # modelos de inquilino -> base del shard del inquilino actual
     'django_tenants.routers.TenantSyncRouter',
 )
 
@@ -164,8 +222,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Mantemos del anterior backend
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        # Confía en los claims firmados del token: sin consulta de User por petición
+        'apps.users.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -181,6 +239,10 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    # Cubos de tokens por inquilino y usuario en Redis (apps.core.throttling, THROTTLE_PLANES)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.TenantRateThrottle',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -197,7 +259,74 @@ SIMPLE_JWT = {
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    # Lista negra en Redis (apps.users.blacklist) en lugar de las tablas token_blacklist
+    'TOKEN_REFRESH_SERIALIZER': 'apps.users.serializers.RefreshTokenSerializer',
+    'TOKEN_VERIFY_SERIALIZER': 'apps.users.serializers.VerifyTokenSerializer',
+}
+
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/1')
+JWT_BLACKLIST_REDIS_URL = os.getenv('JWT_BLACKLIST_REDIS_URL', REDIS_URL)
+JWT_BLACKLIST_BLOOM = os.getenv('JWT_BLACKLIST_BLOOM', 'False').lower() in ('1', 'true', 'yes')
+JWT_BLACKLIST_BLOOM_CAPACIDAD = int(os.getenv('JWT_BLACKLIST_BLOOM_CAPACIDAD', '100000'))
+JWT_BLACKLIST_BLOOM_SEGUNDOS = float(os.getenv('JWT_BLACKLIST_BLOOM_SEGUNDOS', '5'))
+CORREO_REDIS_URL = os.getenv('CORREO_REDIS_URL', REDIS_URL)  # colas de apps.core.correo
+CORREO_LOTE = int(os.getenv('CORREO_LOTE', '50'))  # mensajes por inquilino y turno
+CORREO_LIMITE_POR_MINUTO = int(os.getenv('CORREO_LIMITE_POR_MINUTO', '300'))  # por inquilino
+CORREO_MAX_INTENTOS = int(os.getenv('CORREO_MAX_INTENTOS', '5'))
+CORREO_PASADA_SEGUNDOS = int(os.getenv('CORREO_PASADA_SEGUNDOS', '50'))  # duración máxima de una pasada de envío
+CORREO_TIMEOUT = float(os.getenv('CORREO_TIMEOUT', '10'))
+
+# Caché en Redis (apps.core.cache): 'default' separa las claves por inquilino, 'compartida' no
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', REDIS_URL)
+CACHE_GENERACION_SEGUNDOS = float(os.getenv('CACHE_GENERACION_SEGUNDOS', '2'))  # cada cuánto se relee la generación de un inquilino
+CACHE_CALCULO_SEGUNDOS = float(os.getenv('CACHE_CALCULO_SEGUNDOS', '10'))  # espera máxima a que otro proceso recalcule una entrada
+CACHES = {
+    'default': {
+        'BACKEND': 'apps.core.cache.TenantRedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'tenant',
+        'TIMEOUT': 300,
+    },
+    'compartida': {
+        'BACKEND': 'apps.core.cache.RedisCacheCompartida',
+        'LOCATION': CACHE_REDIS_URL,
+        'KEY_PREFIX': 'compartida',
+        'TIMEOUT': 300,
+    },
+}
+
+# Límites de peticiones (apps.core.throttling): por plan del inquilino y grupo
+# de endpoints, un cubo para todo el inquilino y otro por usuario (o IP).
+# 'N/periodo' = ráfaga de N peticiones que se recupera en ese periodo.
+THROTTLE_REDIS_URL = os.getenv('THROTTLE_REDIS_URL', REDIS_URL)
+THROTTLE_REDIS_TIMEOUT = float(os.getenv('THROTTLE_REDIS_TIMEOUT', '0.25'))  # segundos; si Redis no responde la petición pasa sin límite
+THROTTLE_PLANES = {
+    'basico': {
+        'general': {'tenant': '3000/min', 'usuario': '300/min'},
+        'reportes': {'tenant': '20/min', 'usuario': '5/min'},
+        'predicciones': {'tenant': '20/min', 'usuario': '5/min'},
+        'exportaciones': {'tenant': '10/min', 'usuario': '3/min'},
+        'checkout': {'tenant': '300/min', 'usuario': '20/min'},
+    },
+    'profesional': {
+        'general': {'tenant': '10000/min', 'usuario': '600/min'},
+        'reportes': {'tenant': '60/min', 'usuario': '10/min'},
+        'predicciones': {'tenant': '60/min', 'usuario': '10/min'},
+        'exportaciones': {'tenant': '30/min', 'usuario': '5/min'},
+        'checkout': {'tenant': '1000/min', 'usuario': '30/min'},
+    },
+    'empresarial': {
+        'general': {'tenant': '30000/min', 'usuario': '1200/min'},
+        'reportes': {'tenant': '200/min', 'usuario': '20/min'},
+        'predicciones': {'tenant': '200/min', 'usuario': '20/min'},
+        'exportaciones': {'tenant': '100/min', 'usuario': '10/min'},
+        'checkout': {'tenant': '3000/min', 'usuario': '60/min'},
+    },
 }
+# Ajustes por entorno sin tocar el código, ej: {"basico": {"reportes": {"tenant": "40/min"}}}
+for _plan, _grupos in json.loads(os.getenv('THROTTLE_PLANES_JSON', '{}')).items():
+    for _grupo, _limites in _grupos.items():
+        THROTTLE_PLANES.setdefault(_plan, {}).setdefault(_grupo, {}).update(_limites)
 
 """CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",  # Vite
@@ -250,6 +379,50 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Tareas periódicas (celery beat)
+CELERY_BEAT_SCHEDULE = {
+    # Red de seguridad: drena la bandeja de webhooks aunque falle el aviso inmediato
+    'procesar-eventos-webhook': {
+        'task': 'apps.ecommerce.pagos.tasks.procesar_eventos_webhook',
+        'schedule': 60.0,
+    },
+    # Liquida pagos cuyo webhook se perdió, sin esperar a que el cliente consulte
+    'conciliar-pagos': {
+        'task': 'apps.ecommerce.pagos.tasks.conciliar_pagos',
+        'schedule': 300.0,
+    },
+    # Borra de token_blacklist los tokens ya caducados (la lista negra vigente está en Redis)
+    'podar-tokens-expirados': {
+        'task': 'apps.users.tasks.podar_tokens_expirados',
+        'schedule': 86400.0,
+    },
+    # Red de seguridad del envío de correo: reintentos y colas frenadas por la cuota del minuto
+    'enviar-correos-pendientes': {
+        'task': 'apps.core.tasks.enviar_correos_pendientes',
+        'schedule': 30.0,
+    },
+    # Mantiene migrada la plantilla de inquilinos y repone los esquemas de reserva
+    'reponer-reservas-tenants': {
+        'task': 'apps.tenants.tasks.reponer_reservas_tenants',
+        'schedule': 600.0,
+    },
+    # Métricas de la plataforma: solo recalcula los inquilinos con escrituras nuevas
+    'actualizar-metricas-plataforma': {
+        'task': 'apps.tenants.tasks.actualizar_metricas_plataforma',
+        'schedule': 300.0,
+    },
+    # Corrige la deriva de las estadísticas de compra de los clientes (se suman al pagar cada pedido)
+    'recalcular-estadisticas-clientes': {
+        'task': 'apps.crm.clientes.tasks.recalcular_estadisticas_clientes',
+        'schedule': 86400.0,
+    },
+    # Reescribe en bloque los miembros de los segmentos automáticos según sus reglas
+    'refrescar-segmentos-clientes': {
+        'task': 'apps.crm.clientes.tasks.refrescar_segmentos_clientes',
+        'schedule': 3600.0,
+    },
+}
+
 if not DEBUG:
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
@@ -1,7 +1,8 @@
 # backend/main/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from apps.tenants.views import TenantInfoView, RegisterTenantView
+from apps.core.views import DatabasePoolStatsView, TenantUsageView, ThrottleStatsView
+from apps.tenants.views import TenantInfoView, RegisterTenantView, TenantStatusView, PlatformMetricsView
 
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
@@ -31,5 +32,10 @@ urlpatterns = [
     
     path('api/tenant-info/', TenantInfoView.as_view(), name='tenant-info'),
     path('api/tenants/register/', RegisterTenantView.as_view(), name='tenant-register'),
+    path('api/tenants/status/<str:schema_name>/', TenantStatusView.as_view(), name='tenant-status'),
+    path('api/tenants/metrics/', PlatformMetricsView.as_view(), name='platform-metrics'),
+    path('api/core/db-pool/', DatabasePoolStatsView.as_view(), name='db-pool-stats'),
+    path('api/core/throttling/', ThrottleStatsView.as_view(), name='throttle-stats'),
+    path('api/core/usage/', TenantUsageView.as_view(), name='tenant-usage'),
     path('api/ia/', include('apps.ia_services.urls')),
 ]
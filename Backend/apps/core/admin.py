@@ -1,3 +1,17 @@
 from django.contrib import admin
+from .models import ConsumoTenant, EventoWebhook
 
-# Register your models here.
+
+@admin.register(EventoWebhook)
+class EventoWebhookAdmin(admin.ModelAdmin):
+    list_display = ('id_evento', 'tipo', 'tenant_schema', 'estado', 'intentos', 'recibido_en', 'procesado_en')
+    list_filter = ('estado', 'tipo', 'proveedor')
+    search_fields = ('id_evento', 'tenant_schema')
+    readonly_fields = ('recibido_en',)
+
+
+@admin.register(ConsumoTenant)
+class ConsumoTenantAdmin(admin.ModelAdmin):
+    list_display = ('schema_name', 'dia', 'peticiones', 'consultas', 'segundos_bd', 'tareas', 'llamadas_servicios')
+    list_filter = ('dia',)
+    search_fields = ('schema_name',)
@@ -0,0 +1,134 @@
+# /apps/core/bitacora.py
+"""
+Escritura asíncrona de la bitácora de auditoría.
+
+Las vistas llaman a `registrar_bitacora(accion, ip, usuario)` en lugar de
+Bitacora.objects.create(): el evento se encola en memoria (con el esquema
+del inquilino actual) y un hilo de fondo por proceso lo inserta con
+bulk_create en lotes, agrupando por inquilino. Así el INSERT sale del camino
+de login/registro.
+
+- La cola está acotada (BITACORA_COLA_MAX); si se llena, el evento se
+  descarta y se cuenta en `descartados` (con un warning en el log) en lugar
+  de frenar la petición.
+- Al terminar el proceso (atexit) se vacía lo pendiente.
+- Si el modelo Bitacora no está instalado, registrar_bitacora no hace nada.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django_tenants.utils import schema_context
+
+try:
+    from bitacora.models import Bitacora
+except Exception:
+    Bitacora = None
+
+logger = logging.getLogger(__name__)
+
+
+class EscritorBitacora:
+
+    def __init__(self):
+        self._cola = queue.Queue(maxsize=settings.BITACORA_COLA_MAX)
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._vaciando = threading.Lock()
+        self._pendientes = []
+        self.descartados = 0
+
+    def registrar(self, accion, ip=None, usuario=None):
+        if Bitacora is None:
+            return
+        self._asegurar_hilo()
+        evento = (connection.schema_name, accion, ip, getattr(usuario, 'pk', usuario))
+        try:
+            self._cola.put_nowait(evento)
+        except queue.Full:
+            self.descartados += 1
+            if self.descartados % 100 == 1:
+                logger.warning("Cola de bitácora llena: %s eventos descartados", self.descartados)
+
+    def _asegurar_hilo(self):
+        # Tras un fork (gunicorn/celery prefork) el hilo del padre no existe en el hijo
+        if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._cola = queue.Queue(maxsize=settings.BITACORA_COLA_MAX)
+                self._pendientes = []
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='bitacora', daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            # Lo que se va juntando queda en _pendientes para que vaciar() al salir no lo pierda
+            self._apartar(self._cola.get())
+            # Espera hasta BITACORA_FLUSH_SEGUNDOS a juntar un lote completo
+            limite = time.monotonic() + settings.BITACORA_FLUSH_SEGUNDOS
+            while len(self._pendientes) < settings.BITACORA_LOTE:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    self._apartar(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            self.vaciar()
+
+    def _apartar(self, evento):
+        # Con el mismo lock que vaciar(): si lo llama atexit mientras se junta un
+        # lote, el evento entra en la lista nueva y no en la que ya se escribió
+        with self._vaciando:
+            self._pendientes.append(evento)
+
+    def vaciar(self):
+        """Escribe lo pendiente y lo encolado, en bloques de BITACORA_LOTE por inquilino."""
+        with self._vaciando:
+            lote, self._pendientes = self._pendientes, []
+            while True:
+                while len(lote) < settings.BITACORA_LOTE:
+                    try:
+                        lote.append(self._cola.get_nowait())
+                    except queue.Empty:
+                        break
+                if not lote:
+                    return
+                self._escribir(lote)
+                lote = []
+
+    def _escribir(self, lote):
+        por_tenant = defaultdict(list)
+        for schema, accion, ip, usuario_id in lote:
+            por_tenant[schema].append(Bitacora(accion=accion, ip=ip, usuario_id=usuario_id))
+        close_old_connections()
+        for schema, registros in por_tenant.items():
+            try:
+                with schema_context(schema):
+                    Bitacora.objects.bulk_create(registros)
+            except Exception:
+                logger.exception("No se pudieron escribir %s eventos de bitácora en %s", len(registros), schema)
+
+
+escritor = EscritorBitacora()
+
+
+def registrar_bitacora(accion, ip=None, usuario=None):
+    escritor.registrar(accion, ip=ip, usuario=usuario)
+
+
+@atexit.register
+def _vaciar_al_salir():
+    if Bitacora is not None and escritor._pid == os.getpid():
+        escritor.vaciar()
@@ -0,0 +1,128 @@
+# /apps/core/cache.py
+"""
+Backends de caché sobre Redis (CACHE_REDIS_URL, el mismo servidor que Celery).
+
+- TenantRedisCache (alias 'default'): antepone a cada clave el esquema del
+  inquilino actual (connection.schema_name) y su generación, así dos tiendas
+  nunca comparten entradas aunque usen la misma clave. Subir la generación de
+  un inquilino (invalidar_tenant) invalida todas sus entradas a la vez; las
+  viejas caducan solas por TTL.
+- RedisCacheCompartida (alias 'compartida'): claves sin inquilino, para datos
+  globales (versión de la resolución de inquilinos, objetos de Stripe) y
+  marcas que no deben caer con una invalidación masiva.
+
+Cada proceso recuerda la generación de cada esquema durante
+CACHE_GENERACION_SEGUNDOS: el proceso que invalida lo ve enseguida, los demás
+como mucho tras ese intervalo. Un delete() de una clave concreta es inmediato
+en todos.
+
+obtener_o_calcular() evita estampidas: con la entrada caducada, solo un
+proceso recalcula y el resto espera su resultado.
+
+clear() no vacía la base de Redis (que comparte con colas y lista negra):
+en TenantRedisCache invalida el inquilino actual y en RedisCacheCompartida
+borra solo las claves con su KEY_PREFIX.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+
+ESPERA_CALCULO = 0.05  # segundos entre consultas mientras otro proceso recalcula
+
+_FALTA = object()
+
+
+class RedisCacheCompartida(RedisCache):
+
+    def obtener_o_calcular(self, key, calcular, timeout=DEFAULT_TIMEOUT, version=None):
+        """
+        Como get_or_set(key, calcular), pero con la entrada ausente solo el
+        proceso que consigue el cerrojo llama a `calcular`; el resto espera
+        hasta CACHE_CALCULO_SEGUNDOS a que aparezca el valor (si el cálculo
+        falla o tarda más, lo calcula cada uno).
+        """
+        valor = self.get(key, _FALTA, version=version)
+        if valor is not _FALTA:
+            return valor
+
+        cerrojo = f"{key}:calculando"
+        if self.add(cerrojo, 1, settings.CACHE_CALCULO_SEGUNDOS, version=version):
+            try:
+                valor = calcular()
+                self.set(key, valor, timeout, version=version)
+                return valor
+            finally:
+                self.delete(cerrojo, version=version)
+
+        fin = time.monotonic() + settings.CACHE_CALCULO_SEGUNDOS
+        while time.monotonic() < fin:
+            time.sleep(ESPERA_CALCULO)
+            encontrados = self.get_many([key, cerrojo], version=version)
+            if key in encontrados:
+                return encontrados[key]
+            if cerrojo not in encontrados:
+                # El que calculaba terminó sin guardar (falló)
+                break
+        return calcular()
+
+    def clear(self):
+        """Borra solo las claves de este KEY_PREFIX."""
+        if not self.key_prefix:
+            raise ValueError("clear() necesita KEY_PREFIX: vaciaría toda la base de Redis")
+        cliente = self._cache.get_client(None, write=True)
+        claves = []
+        for clave in cliente.scan_iter(match=f"{self.key_prefix}:*", count=1000):
+            claves.append(clave)
+            if len(claves) >= 1000:
+                cliente.unlink(*claves)
+                claves = []
+        if claves:
+            cliente.unlink(*claves)
+        return True
+
+
+class TenantRedisCache(RedisCacheCompartida):
+
+    def __init__(self, server, params):
+        super().__init__(server, params)
+        self._generaciones = {}  # schema -> (generación, válida hasta)
+
+    def _clave_generacion(self, schema):
+        return f"{self.key_prefix}:generacion:{schema}"
+
+    def generacion(self, schema):
+        ahora = time.monotonic()
+        guardada = self._generaciones.get(schema)
+        if guardada is not None and ahora < guardada[1]:
+            return guardada[0]
+        valor = self._cache.get_client(None).get(self._clave_generacion(schema))
+        generacion = int(valor) if valor is not None else 0
+        self._generaciones[schema] = (generacion, ahora + settings.CACHE_GENERACION_SEGUNDOS)
+        return generacion
+
+    def make_key(self, key, version=None):
+        schema = getattr(connection, 'schema_name', None) or 'public'
+        prefijo = f"{self.key_prefix}:{schema}:{self.generacion(schema)}"
+        return self.key_func(key, prefijo, self.version if version is None else version)
+
+    def invalidar_tenant(self, schema=None):
+        """Sube la generación del inquilino (el actual por defecto): todas sus entradas dejan de valer."""
+        schema = schema or connection.schema_name
+        generacion = self._cache.get_client(None, write=True).incr(self._clave_generacion(schema))
+        self._generaciones[schema] = (generacion, time.monotonic() + settings.CACHE_GENERACION_SEGUNDOS)
+        return generacion
+
+    def clear(self):
+        self.invalidar_tenant()
+        return True
+
+
+def invalidar_tenant(schema=None):
+    """Invalida la caché por inquilino de `schema` (o del actual) si el backend lo permite."""
+    backend = caches['default']
+    if isinstance(backend, TenantRedisCache):
+        backend.invalidar_tenant(schema)
@@ -0,0 +1,176 @@
+# /apps/core/consumo.py
+"""
+Medición del consumo de recursos por inquilino (ConsumoTenant).
+
+Sin estas cifras no se puede saber qué tienda carga la plataforma, ni
+decidir en qué shard ponerla o qué plan le corresponde. Se miden:
+- peticiones HTTP y su duración (ConsumoMiddleware);
+- tareas de Celery y su duración (señales en apps.core.signals);
+- consultas SQL y su duración, durante una petición o tarea: un
+  execute_wrapper en cada conexión las atribuye al esquema activo en esa
+  conexión al ejecutarse, así una tarea que recorre inquilinos reparte su
+  uso de base de datos entre ellos (la tarea en sí cuenta para el esquema
+  con el que empezó, normalmente 'public');
+- llamadas a los microservicios (with medir_servicio()).
+
+Cada proceso suma en un diccionario en memoria, por (esquema, día), y un
+hilo de fondo lo vuelca cada CONSUMO_FLUSH_SEGUNDOS con un único INSERT ...
+ON CONFLICT que acumula sobre la fila del día. Al terminar el proceso
+(atexit) se vuelca lo pendiente. Si la escritura falla, las cifras vuelven
+al diccionario para la pasada siguiente.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connection, connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = (
+    'peticiones', 'segundos_peticiones', 'consultas', 'segundos_bd',
+    'tareas', 'segundos_tareas', 'llamadas_servicios', 'segundos_servicios',
+)
+
+
+class AcumuladorConsumo:
+
+    def __init__(self):
+        self._datos = {}  # (schema, día) -> {campo: valor}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+
+    def sumar(self, schema, **cifras):
+        self._asegurar_hilo()
+        clave = (schema, timezone.localdate())
+        with self._lock:
+            fila = self._datos.get(clave)
+            if fila is None:
+                fila = self._datos[clave] = dict.fromkeys(CAMPOS, 0)
+            for campo, valor in cifras.items():
+                fila[campo] += valor
+
+    def _asegurar_hilo(self):
+        # Tras un fork (gunicorn/celery prefork) el hilo del padre no existe en el hijo
+        if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo and self._hilo.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Lo heredado ya lo volcará el padre
+                self._datos = {}
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='consumo', daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            time.sleep(settings.CONSUMO_FLUSH_SEGUNDOS)
+            self.vaciar()
+
+    def vaciar(self):
+        """Vuelca los contadores a ConsumoTenant. Devuelve cuántas filas (esquema, día) escribió."""
+        with self._lock:
+            datos, self._datos = self._datos, {}
+        if not datos:
+            return 0
+        try:
+            _guardar(datos)
+        except Exception:
+            logger.exception("No se pudo volcar el consumo de %s inquilinos; se reintentará", len(datos))
+            with self._lock:
+                for clave, cifras in datos.items():
+                    fila = self._datos.setdefault(clave, dict.fromkeys(CAMPOS, 0))
+                    for campo, valor in cifras.items():
+                        fila[campo] += valor
+            return 0
+        return len(datos)
+
+
+def _guardar(datos):
+    from .models import ConsumoTenant
+
+    tabla = ConsumoTenant._meta.db_table
+    filas = [(schema, dia, *(cifras[c] for c in CAMPOS)) for (schema, dia), cifras in datos.items()]
+    marcadores = ', '.join(['(' + ', '.join(['%s'] * (2 + len(CAMPOS))) + ')'] * len(filas))
+    sumas = ', '.join(f"{c} = {tabla}.{c} + EXCLUDED.{c}" for c in CAMPOS)
+    close_old_connections()
+    conexion = connections[DEFAULT_DB_ALIAS]
+    conexion.set_schema_to_public()
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {tabla} (schema_name, dia, {', '.join(CAMPOS)}) VALUES {marcadores} "
+            f"ON CONFLICT (schema_name, dia) DO UPDATE SET {sumas}",
+            [valor for fila in filas for valor in fila],
+        )
+
+
+acumulador = AcumuladorConsumo()
+_activa = threading.local()
+
+
+class Medicion:
+    """
+    Duración de una petición o tarea más sus consultas SQL por esquema.
+    Dentro de otra medición del mismo hilo (p. ej. una tarea en modo eager)
+    solo cuenta la duración: las consultas ya las cuenta la de fuera.
+    """
+
+    def __init__(self, tipo, schema=None):
+        self.tipo = tipo  # 'peticiones' o 'tareas'
+        self.schema = schema or connection.schema_name
+        self.consultas = {}  # schema -> [consultas, segundos]
+        self._pila = ExitStack()
+        self._inicio = None
+
+    def __call__(self, execute, sql, params, many, context):
+        schema = getattr(context['connection'], 'schema_name', None) or self.schema
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            datos = self.consultas.setdefault(schema, [0, 0.0])
+            datos[0] += 1
+            datos[1] += time.perf_counter() - inicio
+
+    def empezar(self):
+        if getattr(_activa, 'medicion', None) is None:
+            _activa.medicion = self
+            for conexion in connections.all():
+                self._pila.enter_context(conexion.execute_wrapper(self))
+        self._inicio = time.perf_counter()
+        return self
+
+    def terminar(self):
+        segundos = time.perf_counter() - self._inicio
+        self._pila.close()
+        if getattr(_activa, 'medicion', None) is self:
+            _activa.medicion = None
+        acumulador.sumar(self.schema, **{self.tipo: 1, f'segundos_{self.tipo}': segundos})
+        for schema, (consultas, segundos_bd) in self.consultas.items():
+            acumulador.sumar(schema, consultas=consultas, segundos_bd=segundos_bd)
+
+
+@contextmanager
+def medir_servicio():
+    """Cuenta una llamada a un microservicio (y su duración) para el inquilino actual."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        acumulador.sumar(
+            connection.schema_name, llamadas_servicios=1, segundos_servicios=time.perf_counter() - inicio,
+        )
+
+
+@atexit.register
+def _vaciar_al_salir():
+    if acumulador._pid == os.getpid():
+        acumulador.vaciar()
@@ -0,0 +1,299 @@
+# /apps/core/correo.py
+"""
+Envío de correo transaccional y de campañas en lotes.
+
+En lugar de una tarea Celery por correo (cada una con su conexión HTTP
+nueva), `encolar_correo()` deja el mensaje en una lista de Redis por
+inquilino y, como mucho, una tarea `enviar_correos_pendientes` drena las
+colas:
+- Reparte los envíos entre inquilinos por turnos, con un límite por
+  inquilino y minuto (CORREO_LIMITE_POR_MINUTO): una campaña grande de un
+  inquilino no retrasa los correos de verificación de los demás.
+- Envía por una sola conexión persistente: sesión keep-alive contra la API
+  HTTP de Mailgun, o una única conexión del EMAIL_BACKEND de Django si
+  Mailgun no está configurado.
+- Las plantillas se compilan una vez por proceso y se renderizan en el
+  worker; en la cola solo viaja el contexto (JSON).
+- Los fallos transitorios vuelven al final de la cola hasta
+  CORREO_MAX_INTENTOS; los rechazos definitivos (4xx) se descartan.
+
+MAILGUN_API_BASE permite apuntar al servidor local (manage.py run_fake_mail).
+"""
+import json
+import logging
+import smtplib
+import time
+from functools import lru_cache
+
+import redis
+import requests
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+COLA = 'correo:cola:'         # lista por inquilino con los mensajes en JSON
+INQUILINOS = 'correo:tenants'  # set de inquilinos con cola pendiente
+CUOTA = 'correo:cuota:'       # contador de envíos por inquilino y minuto
+PROGRAMADO = 'correo:programado'  # hay una tarea de envío en camino
+
+# Quita al inquilino del set solo si su cola sigue vacía (atómico frente a encolar_correo)
+_SACAR_SI_VACIA = """
+if redis.call('llen', KEYS[1]) == 0 then
+    return redis.call('srem', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+_cliente = None
+
+
+def cliente_redis():
+    global _cliente
+    if _cliente is None:
+        _cliente = redis.Redis.from_url(settings.CORREO_REDIS_URL)
+    return _cliente
+
+
+@lru_cache(maxsize=128)
+def _plantilla(nombre):
+    return get_template(nombre)
+
+
+def renderizar(plantilla, contexto):
+    """
+    Devuelve (texto, html) a partir de `<plantilla>.txt` y `<plantilla>.html`.
+    La versión HTML es opcional.
+    """
+    texto = _plantilla(f"{plantilla}.txt").render(contexto)
+    try:
+        html = _plantilla(f"{plantilla}.html").render(contexto)
+    except TemplateDoesNotExist:
+        html = None
+    return texto, html
+
+
+def encolar_correo(para, asunto, plantilla, contexto=None, schema=None):
+    """
+    Deja un correo en la cola del inquilino actual (o `schema`). `contexto`
+    debe ser serializable a JSON: se renderiza al enviar.
+    """
+    schema = schema or connection.schema_name
+    mensaje = json.dumps({
+        'para': para,
+        'asunto': asunto,
+        'plantilla': plantilla,
+        'contexto': contexto or {},
+        'intentos': 0,
+    })
+    pipe = cliente_redis().pipeline()
+    pipe.rpush(f"{COLA}{schema}", mensaje)
+    pipe.sadd(INQUILINOS, schema)
+    pipe.execute()
+    programar_envio()
+
+
+def programar_envio():
+    """Encola la tarea de envío salvo que ya haya una en camino: una ráfaga no llena Celery."""
+    if not cliente_redis().set(PROGRAMADO, 1, nx=True, ex=settings.CORREO_PASADA_SEGUNDOS):
+        return
+    from .tasks import enviar_correos_pendientes
+    try:
+        enviar_correos_pendientes.delay()
+    except Exception:
+        # Sin broker: la tarea periódica drenará las colas
+        cliente_redis().delete(PROGRAMADO)
+        logger.warning("No se pudo encolar enviar_correos_pendientes", exc_info=True)
+
+
+def pendientes():
+    """Mensajes en cola por inquilino."""
+    cliente = cliente_redis()
+    schemas = sorted(s.decode('utf-8') for s in cliente.smembers(INQUILINOS))
+    pipe = cliente.pipeline(transaction=False)
+    for schema in schemas:
+        pipe.llen(f"{COLA}{schema}")
+    return dict(zip(schemas, pipe.execute()))
+
+
+class ErrorEnvio(Exception):
+    def __init__(self, mensaje, definitivo=False):
+        super().__init__(mensaje)
+        self.definitivo = definitivo
+
+
+class TransporteMailgun:
+    """API HTTP de Mailgun sobre una sesión keep-alive (una conexión para todo el lote)."""
+
+    def __init__(self):
+        self.sesion = requests.Session()
+        self.sesion.auth = ('api', settings.MAILGUN_API_KEY)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+        self.sesion.mount('https://', adapter)
+        self.sesion.mount('http://', adapter)
+        self.url = f"{settings.MAILGUN_API_BASE.rstrip('/')}/{settings.MAILGUN_DOMAIN}/messages"
+        self.remitente = f"{settings.DEFAULT_FROM_NAME} <{settings.DEFAULT_FROM_EMAIL}>"
+
+    def enviar(self, mensajes):
+        """Devuelve una lista paralela a `mensajes` con None (enviado) o ErrorEnvio."""
+        resultados = []
+        for mensaje in mensajes:
+            datos = {
+                'from': self.remitente,
+                'to': mensaje['para'],
+                'subject': mensaje['asunto'],
+                'text': mensaje['texto'],
+            }
+            if mensaje['html']:
+                datos['html'] = mensaje['html']
+            try:
+                respuesta = self.sesion.post(self.url, data=datos, timeout=settings.CORREO_TIMEOUT)
+            except requests.RequestException as exc:
+                resultados.append(ErrorEnvio(str(exc)))
+                continue
+            if respuesta.status_code < 300:
+                resultados.append(None)
+            else:
+                # 429 y 5xx son transitorios; el resto (dirección inválida, dominio...) no
+                transitorio = respuesta.status_code == 429 or respuesta.status_code >= 500
+                resultados.append(ErrorEnvio(
+                    f"Mailgun {respuesta.status_code}: {respuesta.text[:200]}",
+                    definitivo=not transitorio,
+                ))
+        return resultados
+
+    def cerrar(self):
+        self.sesion.close()
+
+
+class TransporteDjango:
+    """EMAIL_BACKEND de Django con una sola conexión abierta para todo el lote."""
+
+    def __init__(self):
+        self.conexion = get_connection()
+        self.conexion.open()
+
+    def enviar(self, mensajes):
+        """Como TransporteMailgun.enviar: uno a uno sobre la conexión abierta, con un resultado por mensaje."""
+        resultados = []
+        for mensaje in mensajes:
+            correo = EmailMultiAlternatives(
+                mensaje['asunto'], mensaje['texto'], settings.DEFAULT_FROM_EMAIL, [mensaje['para']],
+                connection=self.conexion,
+            )
+            if mensaje['html']:
+                correo.attach_alternative(mensaje['html'], 'text/html')
+            try:
+                self.conexion.send_messages([correo])
+            except smtplib.SMTPRecipientsRefused as exc:
+                resultados.append(ErrorEnvio(str(exc), definitivo=True))
+            except smtplib.SMTPResponseException as exc:
+                # 5xx es un rechazo del servidor; 4xx, transitorio
+                resultados.append(ErrorEnvio(str(exc), definitivo=exc.smtp_code >= 500))
+            except Exception as exc:
+                resultados.append(ErrorEnvio(str(exc)))
+            else:
+                resultados.append(None)
+        return resultados
+
+    def cerrar(self):
+        self.conexion.close()
+
+
+def crear_transporte():
+    if settings.MAILGUN_API_KEY and settings.MAILGUN_DOMAIN:
+        return TransporteMailgun()
+    return TransporteDjango()
+
+
+class DespachadorCorreo:
+
+    def __init__(self, lote=None, limite_por_minuto=None):
+        self.lote = lote or settings.CORREO_LOTE
+        self.limite = limite_por_minuto or settings.CORREO_LIMITE_POR_MINUTO
+        self.cliente = cliente_redis()
+        self._sacar_si_vacia = self.cliente.register_script(_SACAR_SI_VACIA)
+        self.resumen = {'enviados': 0, 'reintentos': 0, 'descartados': 0, 'limitados': []}
+
+    def despachar(self, segundos=None):
+        """Envía por turnos entre inquilinos hasta vaciar las colas, agotar las cuotas o `segundos`."""
+        fin = time.monotonic() + (segundos or settings.CORREO_PASADA_SEGUNDOS)
+        transporte = None
+        try:
+            activos = [s.decode('utf-8') for s in self.cliente.smembers(INQUILINOS)]
+            while activos and time.monotonic() < fin:
+                siguientes = []
+                for schema in activos:
+                    mensajes = self._tomar(schema)
+                    if not mensajes:
+                        continue
+                    transporte = transporte or crear_transporte()
+                    # Un inquilino sin ningún envío correcto espera a la pasada siguiente
+                    if self._enviar(transporte, schema, mensajes):
+                        siguientes.append(schema)
+                activos = siguientes
+        finally:
+            if transporte is not None:
+                transporte.cerrar()
+        return self.resumen
+
+    def _tomar(self, schema):
+        """Saca hasta `lote` mensajes de la cola del inquilino, dentro de su cuota del minuto."""
+        cola = f"{COLA}{schema}"
+        cuota = f"{CUOTA}{schema}:{int(time.time() // 60)}"
+        pipe = self.cliente.pipeline()
+        pipe.incrby(cuota, self.lote)
+        pipe.expire(cuota, 120)
+        usados = pipe.execute()[0]
+        concedidos = max(0, min(self.lote, self.limite - (usados - self.lote)))
+
+        crudos = (self.cliente.lpop(cola, concedidos) or []) if concedidos else []
+        if len(crudos) < self.lote:
+            self.cliente.decrby(cuota, self.lote - len(crudos))
+        if not crudos:
+            if concedidos:
+                self._sacar_si_vacia(keys=[cola, INQUILINOS], args=[schema])
+            elif schema not in self.resumen['limitados']:
+                self.resumen['limitados'].append(schema)
+        return [json.loads(crudo) for crudo in crudos]
+
+    def _enviar(self, transporte, schema, mensajes):
+        listos = []
+        for mensaje in mensajes:
+            try:
+                mensaje['texto'], mensaje['html'] = renderizar(mensaje['plantilla'], mensaje['contexto'])
+            except Exception:
+                logger.exception("No se pudo renderizar %s para %s", mensaje['plantilla'], schema)
+                self.resumen['descartados'] += 1
+                continue
+            listos.append(mensaje)
+
+        enviados, reintentar = 0, []
+        for mensaje, error in zip(listos, transporte.enviar(listos)):
+            if error is None:
+                enviados += 1
+                continue
+            mensaje['intentos'] += 1
+            if error.definitivo or mensaje['intentos'] >= settings.CORREO_MAX_INTENTOS:
+                logger.error("Correo a %s descartado (%s): %s", mensaje['para'], schema, error)
+                self.resumen['descartados'] += 1
+                continue
+            del mensaje['texto'], mensaje['html']
+            reintentar.append(json.dumps(mensaje))
+
+        if reintentar:
+            self.resumen['reintentos'] += len(reintentar)
+            pipe = self.cliente.pipeline()
+            pipe.rpush(f"{COLA}{schema}", *reintentar)
+            pipe.sadd(INQUILINOS, schema)
+            pipe.execute()
+        self.resumen['enviados'] += enviados
+        return enviados
+
+
+def enviar_pendientes(lote=None, segundos=None, limite_por_minuto=None):
+    return DespachadorCorreo(lote=lote, limite_por_minuto=limite_por_minuto).despachar(segundos)
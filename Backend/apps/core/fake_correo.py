@@ -0,0 +1,95 @@
+# /apps/core/fake_correo.py
+"""
+Servidor local que imita el endpoint de envío de Mailgun, para probar el
+envío por lotes (apps.core.correo) sin red ni cuenta.
+
+Endpoints:
+- POST   /v3/<dominio>/messages   enviar (form: from, to, subject, text, html)
+- GET    /messages                mensajes recibidos, en orden (?to=<email> filtra)
+- DELETE /messages                vaciar
+
+--fallos-cada N responde 503 a una de cada N peticiones de envío, para
+ejercitar los reintentos. Cuenta también las conexiones TCP abiertas, lo que
+permite comprobar que el lote viaja por una conexión persistente.
+Uso: python manage.py run_fake_mail y MAILGUN_API_BASE=http://localhost:12112/v3,
+MAILGUN_API_KEY/MAILGUN_DOMAIN con cualquier valor en el backend.
+"""
+import re
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl, urlsplit
+
+from . import fake_http
+
+RUTA_ENVIO = re.compile(r'^/v3/(?P<dominio>[^/]+)/messages$')
+
+
+class FakeCorreo:
+    """Estado en memoria del servidor."""
+
+    def __init__(self, latencia_ms=0, fallos_cada=0):
+        self.latencia = latencia_ms / 1000.0
+        self.fallos_cada = fallos_cada
+        self.mensajes = []
+        self.peticiones = 0
+        self.conexiones = 0
+        self.lock = threading.Lock()
+
+    def recibir(self, dominio, datos):
+        """Devuelve (estado, cuerpo) como la API real."""
+        with self.lock:
+            self.peticiones += 1
+            if self.fallos_cada and self.peticiones % self.fallos_cada == 0:
+                return 503, {'message': 'Service temporarily unavailable'}
+            if not datos.get('to') or not datos.get('from'):
+                return 400, {'message': "'to' and 'from' parameters are missing"}
+            mensaje_id = f"<{uuid.uuid4().hex}@{dominio}>"
+            self.mensajes.append({
+                'id': mensaje_id,
+                'dominio': dominio,
+                'recibido': time.time(),
+                **{campo: datos.get(campo) for campo in ('from', 'to', 'subject', 'text', 'html')},
+            })
+        return 200, {'id': mensaje_id, 'message': 'Queued. Thank you.'}
+
+    def listar(self, filtros):
+        with self.lock:
+            mensajes = list(self.mensajes)
+            estadisticas = {'peticiones': self.peticiones, 'conexiones': self.conexiones}
+        if filtros.get('to'):
+            mensajes = [m for m in mensajes if m['to'] == filtros['to']]
+        return {'items': mensajes, 'total': len(mensajes), **estadisticas}
+
+
+class FakeCorreoHandler(fake_http.ManejadorFake):
+
+    def setup(self):
+        super().setup()
+        with self.estado.lock:
+            self.estado.conexiones += 1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != '/messages':
+            return self._responder(404, {'message': 'Not Found'})
+        self._responder(200, self.estado.listar(dict(parse_qsl(url.query))))
+
+    def do_DELETE(self):
+        if urlsplit(self.path).path != '/messages':
+            return self._responder(404, {'message': 'Not Found'})
+        with self.estado.lock:
+            self.estado.mensajes.clear()
+        self._responder(200, {'message': 'Deleted'})
+
+    def do_POST(self):
+        datos = dict(parse_qsl(self._leer_cuerpo(), keep_blank_values=True))
+        self._esperar()
+        m = RUTA_ENVIO.match(urlsplit(self.path).path)
+        if not m:
+            return self._responder(404, {'message': 'Not Found'})
+        self._responder(*self.estado.recibir(m.group('dominio'), datos))
+
+
+def crear_servidor(host='127.0.0.1', puerto=12112, **opciones):
+    return fake_http.crear_servidor(FakeCorreoHandler, FakeCorreo(**opciones), host, puerto)
@@ -0,0 +1,51 @@
+# /apps/core/fake_http.py
+"""
+Esqueleto común de los servidores locales que imitan APIs externas
+(apps.core.fake_correo, apps.ecommerce.pagos.fake_stripe).
+
+ManejadorFake responde JSON sobre HTTP/1.1 keep-alive, como las APIs reales,
+y deja al servicio solo sus rutas (do_GET, do_POST...). El estado en memoria
+del servicio queda en `self.estado`; crear_servidor() lo asigna en una
+subclase para que cada servidor tenga el suyo.
+"""
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ManejadorFake(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, como la API real
+    disable_nagle_algorithm = True  # cabeceras y cuerpo van en escrituras separadas
+    estado = None  # estado del servicio, se asigna en crear_servidor
+
+    def log_message(self, format, *args):
+        pass
+
+    def cabeceras_extra(self):
+        """Cabeceras propias del servicio en cada respuesta."""
+        return {}
+
+    def _responder(self, codigo, cuerpo):
+        datos = json.dumps(cuerpo).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(datos)))
+        for nombre, valor in self.cabeceras_extra().items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _leer_cuerpo(self):
+        largo = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(largo).decode('utf-8')
+
+    def _esperar(self):
+        """Latencia artificial (`latencia` del estado, en segundos)."""
+        latencia = getattr(self.estado, 'latencia', 0)
+        if latencia:
+            time.sleep(latencia)
+
+
+def crear_servidor(manejador, estado, host, puerto):
+    handler = type('Handler', (manejador,), {'estado': estado})
+    return ThreadingHTTPServer((host, puerto), handler)
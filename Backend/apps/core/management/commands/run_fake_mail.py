@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.fake_correo import crear_servidor
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a local Mailgun stand-in that accepts and stores messages in memory (GET /messages lists them). '
+        'Point MAILGUN_API_BASE at it to test batched mail delivery offline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12112)
+        parser.add_argument('--latency-ms', type=int, default=0, help='Artificial latency per request')
+        parser.add_argument('--fail-every', type=int, default=0, help='Answer 503 to one of every N send requests')
+
+    def handle(self, *args, **options):
+        servidor = crear_servidor(
+            host=options['host'],
+            puerto=options['port'],
+            latencia_ms=options['latency_ms'],
+            fallos_cada=options['fail_every'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Mailgun listening on http://{options['host']}:{options['port']}/v3"
+        ))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
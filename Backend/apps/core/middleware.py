@@ -0,0 +1,20 @@
+# apps/core/middleware.py
+from .consumo import Medicion
+
+
+class ConsumoMiddleware:
+    """
+    Cuenta la petición, su duración y sus consultas SQL para el inquilino
+    (ver apps.core.consumo). Va justo después del middleware de inquilinos,
+    que es quien fija connection.schema_name.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicion = Medicion('peticiones').empezar()
+        try:
+            return self.get_response(request)
+        finally:
+            medicion.terminar()
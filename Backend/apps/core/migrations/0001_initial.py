@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_evento', models.CharField(help_text='ID del evento en el proveedor (ej: evt_xxx)', max_length=255, unique=True)),
+                ('proveedor', models.CharField(default='stripe', max_length=50)),
+                ('tipo', models.CharField(help_text='Ej: payment_intent.succeeded', max_length=100)),
+                ('tenant_schema', models.CharField(help_text='Esquema del inquilino al que pertenece el evento', max_length=63)),
+                ('payload', models.JSONField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesado', 'Procesado'), ('error', 'Error'), ('ignorado', 'Ignorado')], default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('recibido_en', models.DateTimeField(auto_now_add=True)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now, help_text='No se procesa antes de esta fecha (backoff)')),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de webhook',
+                'verbose_name_plural': 'Eventos de webhook',
+                'ordering': ['recibido_en'],
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='core_webhook_pendientes_idx')],
+            },
+        ),
+    ]
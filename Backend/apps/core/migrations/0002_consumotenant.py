@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoTenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(max_length=63)),
+                ('dia', models.DateField()),
+                ('peticiones', models.PositiveBigIntegerField(default=0)),
+                ('segundos_peticiones', models.FloatField(default=0)),
+                ('consultas', models.PositiveBigIntegerField(default=0)),
+                ('segundos_bd', models.FloatField(default=0)),
+                ('tareas', models.PositiveBigIntegerField(default=0)),
+                ('segundos_tareas', models.FloatField(default=0)),
+                ('llamadas_servicios', models.PositiveBigIntegerField(default=0)),
+                ('segundos_servicios', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Consumo de inquilino',
+                'verbose_name_plural': 'Consumos de inquilinos',
+                'ordering': ['-dia', 'schema_name'],
+                'indexes': [models.Index(fields=['dia'], name='core_consumo_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('schema_name', 'dia'), name='consumo_tenant_dia_unico')],
+            },
+        ),
+    ]
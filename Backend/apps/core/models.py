@@ -1,3 +1,78 @@
+# apps/core/models.py
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class EventoWebhook(models.Model):
+    """
+    Bandeja de entrada de webhooks de proveedores externos (Stripe).
+    Vive en el esquema 'public': un mismo endpoint recibe eventos de todas
+    las tiendas y el worker los enruta luego al esquema de cada inquilino.
+    El id del evento es único, así los reintentos del proveedor se descartan.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESADO = 'procesado'
+    ESTADO_ERROR = 'error'
+    ESTADO_IGNORADO = 'ignorado'
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESADO, 'Procesado'),
+        (ESTADO_ERROR, 'Error'),
+        (ESTADO_IGNORADO, 'Ignorado'),
+    ]
+
+    id_evento = models.CharField(max_length=255, unique=True, help_text="ID del evento en el proveedor (ej: evt_xxx)")
+    proveedor = models.CharField(max_length=50, default='stripe')
+    tipo = models.CharField(max_length=100, help_text="Ej: payment_intent.succeeded")
+    tenant_schema = models.CharField(max_length=63, help_text="Esquema del inquilino al que pertenece el evento")
+    payload = models.JSONField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=ESTADO_PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    recibido_en = models.DateTimeField(auto_now_add=True)
+    disponible_en = models.DateTimeField(default=timezone.now, help_text="No se procesa antes de esta fecha (backoff)")
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['recibido_en']
+        indexes = [
+            models.Index(fields=['estado', 'disponible_en'], name='core_webhook_pendientes_idx'),
+        ]
+        verbose_name = 'Evento de webhook'
+        verbose_name_plural = 'Eventos de webhook'
+
+    def __str__(self):
+        return f"{self.proveedor} {self.tipo} ({self.id_evento}) - {self.estado}"
+
+
+class ConsumoTenant(models.Model):
+    """
+    Recursos que usó un inquilino en un día (ver apps.core.consumo): peticiones
+    HTTP, consultas y tiempo de base de datos, tareas de Celery y llamadas a
+    los microservicios. Vive en el esquema público; cada proceso suma sus
+    contadores en memoria y los vuelca aquí cada CONSUMO_FLUSH_SEGUNDOS.
+    """
+    schema_name = models.CharField(max_length=63)
+    dia = models.DateField()
+    peticiones = models.PositiveBigIntegerField(default=0)
+    segundos_peticiones = models.FloatField(default=0)
+    consultas = models.PositiveBigIntegerField(default=0)
+    segundos_bd = models.FloatField(default=0)
+    tareas = models.PositiveBigIntegerField(default=0)
+    segundos_tareas = models.FloatField(default=0)
+    llamadas_servicios = models.PositiveBigIntegerField(default=0)
+    segundos_servicios = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-dia', 'schema_name']
+        constraints = [
+            models.UniqueConstraint(fields=['schema_name', 'dia'], name='consumo_tenant_dia_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['dia'], name='core_consumo_dia_idx'),
+        ]
+        verbose_name = 'Consumo de inquilino'
+        verbose_name_plural = 'Consumos de inquilinos'
+
+    def __str__(self):
+        return f"{self.schema_name} {self.dia}"
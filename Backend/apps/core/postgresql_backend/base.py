@@ -0,0 +1,112 @@
+# apps/core/postgresql_backend/base.py
+"""
+Backend de django-tenants para conexiones persistentes (CONN_MAX_AGE).
+
+Con conexiones persistentes cada hilo reutiliza su conexión entre peticiones
+y el coste de conectar (TCP + TLS + autenticación) sale de la latencia. Pero
+el middleware llama a set_tenant() en cada petición y django-tenants olvida
+entonces qué search_path tiene la sesión, así que repite el SET aunque el
+esquema sea el mismo.
+
+Este backend recuerda el search_path que la sesión tiene de verdad en el
+servidor y, si set_tenant() pide el mismo, no lo vuelve a enviar. Un SET
+dentro de una transacción solo cuenta como vigente tras el commit: un
+rollback (también a un savepoint) lo deshace en el servidor, y entonces se
+vuelve a enviar en el siguiente cursor. Al cerrar o reconectar se olvida.
+Una conexión que vuelve al hilo en otra petición conserva su search_path
+real, y el SET se repite solo si el nuevo inquilino es otro.
+
+Requiere TENANT_LIMIT_SET_CALLS = True (si no, django-tenants hace el SET
+en cada cursor). Quien cambie el search_path a mano debe llamar a
+olvidar_search_path().
+
+`estadisticas` lleva los contadores del proceso (ver DatabasePoolStatsView).
+"""
+import threading
+import time
+from collections import Counter
+
+from django_tenants.postgresql_backend import base
+
+estadisticas = Counter()
+_lock = threading.Lock()
+
+
+def _contar(clave, cantidad=1):
+    with _lock:
+        estadisticas[clave] += cantidad
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        self._search_path_servidor = None  # vigente en la sesión (confirmado)
+        self._search_path_en_transaccion = False  # hubo un SET sin confirmar
+        self._reutilizable = False  # conexión que sobrevivió a la petición anterior
+        super().__init__(*args, **kwargs)
+
+    def olvidar_search_path(self):
+        self.search_path_set_schemas = None
+        self._search_path_servidor = None
+        self._search_path_en_transaccion = False
+
+    def set_tenant(self, tenant, include_public=True):
+        super().set_tenant(tenant, include_public)
+        if self.connection is not None and self._search_path_servidor is not None:
+            if self._search_path_servidor == self._get_cursor_search_paths():
+                self.search_path_set_schemas = self._search_path_servidor
+
+    def _cursor(self, name=None):
+        pendiente = not self.search_path_set_schemas
+        cursor = super()._cursor(name)
+        if self._reutilizable:
+            self._reutilizable = False
+            _contar('conexiones_reutilizadas')
+        if pendiente:
+            if self.search_path_set_schemas:
+                _contar('search_path_enviados')
+                if self.in_atomic_block or not self.get_autocommit():
+                    self._search_path_servidor = None
+                    self._search_path_en_transaccion = True
+                else:
+                    self._search_path_servidor = self.search_path_set_schemas
+        else:
+            _contar('search_path_omitidos')
+        return cursor
+
+    def _commit(self):
+        super()._commit()
+        if self._search_path_en_transaccion:
+            self._search_path_servidor = self.search_path_set_schemas
+            self._search_path_en_transaccion = False
+
+    def _rollback(self):
+        super()._rollback()
+        if self._search_path_en_transaccion:
+            self.olvidar_search_path()
+
+    def _savepoint_rollback(self, sid):
+        super()._savepoint_rollback(sid)
+        if self._search_path_en_transaccion:
+            # El SET pudo ser posterior al savepoint: se repite en el siguiente cursor
+            self.search_path_set_schemas = None
+            self._search_path_servidor = None
+
+    def connect(self):
+        self.olvidar_search_path()
+        self._reutilizable = False
+        inicio = time.monotonic()
+        super().connect()
+        _contar('conexiones_abiertas')
+        _contar('milisegundos_conectando', round((time.monotonic() - inicio) * 1000))
+
+    def close(self):
+        if self.connection is not None:
+            _contar('conexiones_cerradas')
+        self.olvidar_search_path()
+        super().close()
+
+    def close_if_unusable_or_obsolete(self):
+        # Django lo llama al empezar y al terminar cada petición (y Celery en cada tarea)
+        super().close_if_unusable_or_obsolete()
+        self._reutilizable = self.connection is not None
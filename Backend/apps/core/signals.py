@@ -0,0 +1,19 @@
+# apps/core/signals.py
+"""Consumo de las tareas de Celery por inquilino (ver apps.core.consumo)."""
+from celery.signals import task_postrun, task_prerun
+
+from .consumo import Medicion
+
+_mediciones = {}  # task_id -> Medicion
+
+
+@task_prerun.connect
+def empezar_medicion_tarea(task_id=None, **kwargs):
+    _mediciones[task_id] = Medicion('tareas').empezar()
+
+
+@task_postrun.connect
+def terminar_medicion_tarea(task_id=None, **kwargs):
+    medicion = _mediciones.pop(task_id, None)
+    if medicion is not None:
+        medicion.terminar()
@@ -0,0 +1,18 @@
+# /apps/core/tasks.py
+"""
+Tareas asíncronas comunes.
+- Drena las colas de correo (apps.core.correo) por lotes y con límite por inquilino.
+"""
+from celery import shared_task
+
+from .correo import PROGRAMADO, cliente_redis, enviar_pendientes
+
+
+@shared_task
+def enviar_correos_pendientes(lote=None, segundos=None):
+    """
+    Una pasada de envío. Libera la marca de "tarea programada" al empezar,
+    así lo que se encole mientras tanto programa como mucho una pasada más.
+    """
+    cliente_redis().delete(PROGRAMADO)
+    return enviar_pendientes(lote=lote, segundos=segundos)
@@ -0,0 +1,198 @@
+# /apps/core/throttling.py
+"""
+Límites de peticiones por inquilino con cubos de tokens en Redis.
+
+Sin límites, una tienda grande puede ocupar todos los workers y la base y
+subir la latencia de las demás. Cada petición gasta un token de dos cubos
+a la vez:
+- el del inquilino (todas las peticiones de su esquema), que reparte la
+  capacidad compartida entre tiendas;
+- el del usuario dentro de ese inquilino (o de la IP si no hay sesión), para
+  que un solo cliente no agote el cubo de su tienda.
+
+Los límites salen de THROTTLE_PLANES según Client.plan y el grupo de la
+vista (`throttle_scope`): 'general' por defecto y cubos aparte para los
+endpoints caros ('reportes', 'predicciones', 'exportaciones', 'checkout'),
+de modo que agotar uno no bloquea la navegación normal.
+
+La comprobación es un solo script Lua (un viaje a Redis, atómico entre
+workers): si algún cubo está vacío no se gasta ninguno y se devuelve cuánto
+falta para el próximo token, que DRF manda en `Retry-After`. El mismo
+script cuenta peticiones permitidas y rechazadas por inquilino y grupo en
+METRICAS (ver metricas()). Si Redis no responde se deja pasar la petición.
+
+Una acción de un ViewSet con cubo propio se marca con @grupo_limite(grupo);
+las vistas de Django que no pasan por DRF usan el decorador @limitar(grupo).
+"""
+import logging
+import math
+from functools import lru_cache, wraps
+
+import redis
+from django.conf import settings
+from django.db import connection
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+CUBO = 'throttle:cubo:'        # hash {t: tokens, ts: última recarga} por inquilino, grupo (y usuario)
+METRICAS = 'throttle:metricas'  # hash '<schema>:<grupo>:<resultado>' -> peticiones
+GRUPO_GENERAL = 'general'
+PLAN_POR_DEFECTO = 'basico'
+PERIODOS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# KEYS: cubos..., hash de métricas. ARGV: campo de métricas y, por cubo, capacidad y tokens por segundo.
+# Devuelve los segundos hasta poder pasar ('0' si pasa); como texto, Redis truncaría el decimal.
+_CONSUMIR = """
+local t = redis.call('time')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cubos = #KEYS - 1
+local tokens = {}
+local espera = 0
+for i = 1, cubos do
+    local capacidad = tonumber(ARGV[2 * i])
+    local ritmo = tonumber(ARGV[2 * i + 1])
+    local cubo = redis.call('hmget', KEYS[i], 't', 'ts')
+    local disponibles = capacidad
+    if cubo[1] then
+        disponibles = math.min(capacidad, tonumber(cubo[1]) + math.max(0, ahora - tonumber(cubo[2])) * ritmo)
+    end
+    tokens[i] = disponibles
+    if disponibles < 1 then
+        espera = math.max(espera, (1 - disponibles) / ritmo)
+    end
+end
+if espera > 0 then
+    redis.call('hincrby', KEYS[cubos + 1], ARGV[1] .. ':rechazadas', 1)
+    return tostring(espera)
+end
+for i = 1, cubos do
+    redis.call('hset', KEYS[i], 't', tokens[i] - 1, 'ts', ahora)
+    redis.call('expire', KEYS[i], math.ceil(tonumber(ARGV[2 * i]) / tonumber(ARGV[2 * i + 1])) + 1)
+end
+redis.call('hincrby', KEYS[cubos + 1], ARGV[1] .. ':permitidas', 1)
+return '0'
+"""
+
+_cliente = None
+_script = None
+
+
+def cliente_redis():
+    global _cliente, _script
+    if _cliente is None:
+        # Corre en cada petición: un Redis colgado no debe retenerla más de THROTTLE_REDIS_TIMEOUT
+        _cliente = redis.Redis.from_url(
+            settings.THROTTLE_REDIS_URL,
+            socket_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+            socket_connect_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+        )
+        _script = _cliente.register_script(_CONSUMIR)
+    return _cliente
+
+
+def parsear_limite(limite):
+    """'120/min' -> (capacidad, tokens por segundo)."""
+    cantidad, periodo = limite.split('/')
+    cantidad = int(cantidad)
+    return cantidad, cantidad / PERIODOS[periodo.strip()[0]]
+
+
+@lru_cache(maxsize=None)
+def limites(plan, grupo):
+    """[(nivel, capacidad, ritmo)] del plan y grupo; un nivel sin límite no aparece."""
+    planes = settings.THROTTLE_PLANES
+    config = planes.get(plan) or planes[PLAN_POR_DEFECTO]
+    por_nivel = config.get(grupo) or config[GRUPO_GENERAL]
+    return [
+        (nivel, *parsear_limite(por_nivel[nivel]))
+        for nivel in ('tenant', 'usuario') if por_nivel.get(nivel)
+    ]
+
+
+def _identidad(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f"u{user.pk}"
+    return f"ip:{BaseThrottle().get_ident(request)}"
+
+
+def consumir(request, grupo):
+    """Gasta un token de los cubos de la petición. Devuelve 0 si pasa, o los segundos a esperar."""
+    schema = connection.schema_name
+    plan = getattr(getattr(request, 'tenant', None), 'plan', None) or PLAN_POR_DEFECTO
+    cubos = limites(plan, grupo)
+    if not cubos:
+        return 0.0
+    base = f"{CUBO}{schema}:{grupo}"
+    claves, argumentos = [], [f"{schema}:{grupo}"]
+    for nivel, capacidad, ritmo in cubos:
+        claves.append(base if nivel == 'tenant' else f"{base}:{_identidad(request)}")
+        argumentos += [capacidad, ritmo]
+    try:
+        cliente_redis()
+        return float(_script(keys=claves + [METRICAS], args=argumentos))
+    except redis.RedisError:
+        logger.warning("Sin Redis para los límites de peticiones; se deja pasar", exc_info=True)
+        return 0.0
+
+
+def grupo_limite(grupo):
+    """
+    Marca una acción de ViewSet con su grupo de límites. No va en
+    @action(throttle_scope=...): el router lo pasaría a as_view(), que exige
+    el atributo en la clase y lo aplicaría a todo el ViewSet.
+    """
+    def decorador(accion):
+        accion.throttle_scope = grupo
+        return accion
+    return decorador
+
+
+def grupo_de_vista(view):
+    """El de la acción (@grupo_limite), si no el `throttle_scope` de la vista, si no 'general'."""
+    accion = getattr(view, getattr(view, 'action', None) or '', None)
+    return getattr(accion, 'throttle_scope', None) or getattr(view, 'throttle_scope', None) or GRUPO_GENERAL
+
+
+class TenantRateThrottle(BaseThrottle):
+    """Throttle de DRF para todas las vistas; el grupo sale de grupo_de_vista()."""
+
+    def allow_request(self, request, view):
+        self.espera = consumir(request, grupo_de_vista(view))
+        return self.espera == 0
+
+    def wait(self):
+        return self.espera
+
+
+def limitar(grupo):
+    """Lo mismo para vistas de Django sin DRF: 429 con Retry-After."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            espera = consumir(request, grupo)
+            if espera:
+                respuesta = JsonResponse(
+                    {'detail': f'Demasiadas peticiones. Reintente en {math.ceil(espera)} segundos.'}, status=429,
+                )
+                respuesta['Retry-After'] = str(math.ceil(espera))
+                return respuesta
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def metricas():
+    """{schema: {grupo: {'permitidas': n, 'rechazadas': n}}} acumulado desde el último reiniciar_metricas()."""
+    resultado = {}
+    for campo, valor in cliente_redis().hgetall(METRICAS).items():
+        schema, grupo, estado = campo.decode('utf-8').rsplit(':', 2)
+        por_grupo = resultado.setdefault(schema, {}).setdefault(grupo, {'permitidas': 0, 'rechazadas': 0})
+        por_grupo[estado] = int(valor)
+    return resultado
+
+
+def reiniciar_metricas():
+    cliente_redis().delete(METRICAS)
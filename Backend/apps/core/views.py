@@ -1,3 +1,120 @@
-from django.shortcuts import render
+# /apps/core/views.py
+import os
+from datetime import timedelta
 
-# Create your views here.
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django_tenants.utils import get_public_schema_name
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import throttling
+from .consumo import CAMPOS
+from .models import ConsumoTenant
+from .postgresql_backend.base import estadisticas
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    Uso de las conexiones persistentes a PostgreSQL (ver postgresql_backend).
+    'proceso': contadores del proceso que atiende la petición (cada worker
+    lleva los suyos). 'servidor': conexiones a esta base según
+    pg_stat_activity, agrupadas por estado. Solo staff del dominio principal.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if connection.schema_name != get_public_schema_name():
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT coalesce(state, 'desconocido'), count(*) FROM pg_stat_activity
+                WHERE datname = current_database() AND backend_type = 'client backend'
+                GROUP BY 1
+                """
+            )
+            servidor = dict(cursor.fetchall())
+        return Response({
+            'pid': os.getpid(),
+            'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+            'proceso': dict(estadisticas),
+            'servidor': servidor,
+        })
+
+
+class ThrottleStatsView(APIView):
+    """
+    Peticiones permitidas y rechazadas por inquilino y grupo de endpoints
+    (ver apps.core.throttling), los más limitados primero. DELETE pone los
+    contadores a cero. Solo staff del dominio principal.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if connection.schema_name != get_public_schema_name():
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        metricas = throttling.metricas()
+        rechazadas = {
+            schema: sum(grupo['rechazadas'] for grupo in grupos.values()) for schema, grupos in metricas.items()
+        }
+        return Response({
+            'tenants': [
+                {'schema_name': schema, 'rechazadas': rechazadas[schema], 'grupos': metricas[schema]}
+                for schema in sorted(metricas, key=rechazadas.get, reverse=True)
+            ],
+        })
+
+    def delete(self, request):
+        if connection.schema_name != get_public_schema_name():
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        throttling.reiniciar_metricas()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TenantUsageView(APIView):
+    """
+    Consumo por inquilino y día (ver apps.core.consumo), para planificar
+    capacidad, repartir shards y ajustar planes.
+
+    GET /api/core/usage/?desde=2026-01-01&hasta=2026-01-31
+    Por defecto, los últimos 30 días. Desde el dominio principal devuelve
+    todos los inquilinos (o uno con ?schema=) y sus totales del periodo,
+    los de más tiempo de BD primero; desde una tienda, solo los suyos.
+    Solo staff.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        try:
+            hasta = parse_date(request.query_params.get('hasta', '')) or timezone.localdate()
+            desde = parse_date(request.query_params.get('desde', '')) or hasta - timedelta(days=29)
+        except ValueError:
+            desde = hasta = None
+        if desde is None or desde > hasta or (hasta - desde).days >= settings.CONSUMO_MAX_DIAS:
+            return Response(
+                {'detail': f'Rango de fechas inválido (máximo {settings.CONSUMO_MAX_DIAS} días).'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        consumos = ConsumoTenant.objects.filter(dia__range=(desde, hasta))
+        if connection.schema_name != get_public_schema_name():
+            consumos = consumos.filter(schema_name=connection.schema_name)
+        elif request.query_params.get('schema'):
+            consumos = consumos.filter(schema_name=request.query_params['schema'])
+
+        totales = (
+            consumos.values('schema_name').annotate(**{campo: Sum(campo) for campo in CAMPOS})
+            .order_by('-segundos_bd')
+        )
+        return Response({
+            'desde': desde,
+            'hasta': hasta,
+            'totales': list(totales),
+            'dias': list(consumos.values('schema_name', 'dia', *CAMPOS)),
+        })
@@ -0,0 +1,119 @@
+# apps/crm/clientes/estadisticas.py
+"""
+Estadísticas de compra del Cliente (total_gastado, total_pedidos,
+fecha_ultima_compra y estado) sin recorrer su historial en cada pago.
+
+- sumar_pedido(): cuando un pedido pasa a pagado, al confirmarse la
+  transacción (programar_suma), se suma a su Cliente con un UPDATE de
+  expresiones F() y el total leído de la base. Pedido.sumado_a_cliente
+  garantiza que cada pedido se sume una sola vez: se bloquea la fila, se
+  marca y solo quien la marca suma, aunque el pedido se guarde de nuevo o
+  dos procesos lo liquiden a la vez.
+- recalcular_clientes(): pasada nocturna (tarea recalcular_estadisticas_clientes)
+  que corrige la deriva de todos los Cliente del inquilino con una consulta
+  agrupada y bulk_update de las filas que cambiaron.
+
+Un pedido que se cancela, o cuyo total cambia, después de sumado no se
+ajusta al momento: lo corrige la pasada nocturna.
+"""
+from django.db import connection, connections, router, transaction
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.ecommerce.pedidos.models import Pedido
+from apps.tenants.shards import alias_actual, atomic_tenant
+from .models import CAMPOS_ESTADISTICAS, UMBRAL_VIP, Cliente, pedidos_comprados
+
+
+def cuenta_como_compra(pedido):
+    return pedido.pagado and pedido.estado != Pedido.ESTADO_CANCELADO and pedido.cliente_id is not None
+
+
+def programar_suma(pedido):
+    """
+    Registra sumar_pedido() para cuando se confirme la transacción que
+    guardó el pedido: el serializer lo guarda pagado antes de crear sus
+    detalles y calcular el total, así que el total se lee al confirmar.
+    """
+    if pedido.sumado_a_cliente or not cuenta_como_compra(pedido):
+        return
+    # La confirmación puede llegar fuera del schema_context que guardó el pedido
+    schema, pedido_id = connection.schema_name, pedido.pk
+
+    def sumar():
+        with schema_context(schema):
+            sumar_pedido(pedido_id)
+
+    transaction.on_commit(sumar, using=alias_actual())
+
+
+def sumar_pedido(pedido_id):
+    """Suma a su Cliente un pedido pagado si aún no se sumó. Devuelve True si lo sumó."""
+    with atomic_tenant():
+        pedido = (
+            pedidos_comprados().select_for_update()
+            .filter(pk=pedido_id, sumado_a_cliente=False, cliente__isnull=False)
+            .only('id', 'cliente_id', 'total', 'fecha_creacion').first()
+        )
+        if pedido is None:
+            return False
+        Pedido.objects.filter(pk=pedido.pk).update(sumado_a_cliente=True)
+        Cliente.objects.filter(usuario_id=pedido.cliente_id).update(
+            total_gastado=F('total_gastado') + pedido.total,
+            total_pedidos=F('total_pedidos') + 1,
+            # En PostgreSQL GREATEST ignora el NULL de la primera compra
+            fecha_ultima_compra=Greatest('fecha_ultima_compra', Value(pedido.fecha_creacion)),
+            estado=Case(
+                When(total_gastado__gt=UMBRAL_VIP - pedido.total, then=Value(Cliente.EstadoCliente.VIP)),
+                default=Value(Cliente.EstadoCliente.ACTIVO),
+            ),
+            actualizado_en=timezone.now(),
+        )
+    return True
+
+
+def recalcular_clientes(lote=1000):
+    """
+    Recalcula las estadísticas de todos los Cliente del inquilino activo.
+    Devuelve {'clientes': revisados, 'corregidos': filas que cambiaron}.
+
+    Bloquea la escritura de la tabla de clientes mientras dura (las lecturas
+    siguen): un pago que llega a la vez espera y suma después sobre el valor
+    recalculado, en lugar de perderse bajo el bulk_update.
+    """
+    with atomic_tenant():
+        # Pedidos pagados por un camino que no pasó por sumar_pedido(): los cuenta este recálculo
+        pedidos_comprados().filter(sumado_a_cliente=False).update(sumado_a_cliente=True)
+        conexion = connections[router.db_for_write(Cliente)]
+        with conexion.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {conexion.ops.quote_name(Cliente._meta.db_table)} IN EXCLUSIVE MODE')
+
+        # Solo los marcados: uno pagado después de marcar lo suma su propio sumar_pedido()
+        compras = {
+            fila['cliente_id']: fila
+            for fila in pedidos_comprados().filter(sumado_a_cliente=True, cliente__isnull=False).order_by().values('cliente_id').annotate(
+                total=Sum('total'), conteo=Count('id'), ultima=Max('fecha_creacion'),
+            )
+        }
+        revisados = corregidos = 0
+        cambiados = []
+        clientes = Cliente.objects.only('id', 'usuario_id', *CAMPOS_ESTADISTICAS).order_by('id')
+        for cliente in clientes.iterator(chunk_size=lote):
+            revisados += 1
+            fila = compras.get(cliente.usuario_id, {})
+            cifras = (fila.get('total') or 0, fila.get('conteo', 0), fila.get('ultima'))
+            if cifras != (cliente.total_gastado, cliente.total_pedidos, cliente.fecha_ultima_compra):
+                cliente.total_gastado, cliente.total_pedidos, cliente.fecha_ultima_compra = cifras
+                # Solo si cambiaron las cifras: un estado puesto a mano (p. ej. RIESGO) se respeta
+                cliente.estado = cliente.estado_segun_compras()
+                cambiados.append(cliente)
+            if len(cambiados) >= lote:
+                Cliente.objects.bulk_update(cambiados, CAMPOS_ESTADISTICAS)
+                corregidos += len(cambiados)
+                cambiados = []
+        if cambiados:
+            Cliente.objects.bulk_update(cambiados, CAMPOS_ESTADISTICAS)
+            corregidos += len(cambiados)
+    return {'clientes': revisados, 'corregidos': corregidos}
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segmento',
+            name='acepta_marketing',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='automatico',
+            field=models.BooleanField(default=False, help_text='Si está activo, sus miembros los decide la regla y se reescriben en cada refresco.'),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='departamento',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='dias_sin_comprar_maximo',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='dias_sin_comprar_minimo',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='gasto_maximo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='gasto_minimo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='miembros',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='pedidos_maximo',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='pedidos_minimo',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='segmento',
+            name='refrescado_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
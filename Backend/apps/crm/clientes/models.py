@@ -1,18 +1,53 @@
 # apps/crm/clientes/models.py
+from decimal import Decimal
+
 from django.db import models
-from django.db.models import Sum, Count
+from django.db.models import Count, Max, Sum
 from django.conf import settings 
 
-from apps.ecommerce.pedidos.models import Pedido 
+from apps.ecommerce.pedidos.models import Pedido
+
+UMBRAL_VIP = Decimal('1000')  # Más de 1000 Bs gastados es VIP
+CAMPOS_ESTADISTICAS = ['total_gastado', 'total_pedidos', 'fecha_ultima_compra', 'estado']
+
+
+def pedidos_comprados():
+    """Pedidos que cuentan como compra: pagados y no cancelados."""
+    return Pedido.objects.filter(pagado=True).exclude(estado=Pedido.ESTADO_CANCELADO)
+
 
 class Segmento(models.Model):
     """
     Un segmento de clientes.
     Ej: "Clientes VIP", "Clientes Nuevos", "Clientes en Riesgo"
+
+    Los segmentos automáticos se definen con una regla: todas las condiciones
+    no vacías deben cumplirse. Sus miembros los recalcula la tarea
+    refrescar_segmentos_clientes (ver segmentacion.py); los manuales se
+    asignan a mano.
     """
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True, null=True)
 
+    # --- Regla (solo si es automático) ---
+    automatico = models.BooleanField(
+        default=False,
+        help_text="Si está activo, sus miembros los decide la regla y se reescriben en cada refresco."
+    )
+    gasto_minimo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    gasto_maximo = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    pedidos_minimo = models.PositiveIntegerField(null=True, blank=True)
+    pedidos_maximo = models.PositiveIntegerField(null=True, blank=True)
+    # Recencia: días desde la última compra (quien nunca compró cumple cualquier mínimo)
+    dias_sin_comprar_minimo = models.PositiveIntegerField(null=True, blank=True)
+    dias_sin_comprar_maximo = models.PositiveIntegerField(null=True, blank=True)
+    acepta_marketing = models.BooleanField(null=True, blank=True)
+    # Región: departamento de alguna de las direcciones del cliente
+    departamento = models.CharField(max_length=100, blank=True)
+
+    miembros = models.PositiveIntegerField(default=0)
+    refrescado_en = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = "Segmento"
         verbose_name_plural = "Segmentos"
@@ -74,33 +109,26 @@ class Cliente(models.Model):
     def __str__(self):
         return self.usuario.email
     
+    def estado_segun_compras(self):
+        """Segmentación simple: VIP por gasto, ACTIVO si ya compró."""
+        if self.total_gastado > UMBRAL_VIP:
+            return self.EstadoCliente.VIP
+        if self.total_pedidos > 0:
+            return self.EstadoCliente.ACTIVO
+        return self.estado
+
     def recalcular_estadisticas(self):
         """
-        Calcula y actualiza las estadísticas de compra de este cliente.
+        Recalcula desde cero las estadísticas de compra de este cliente.
+        El día a día lo lleva sumar_pedido() (apps.crm.clientes.estadisticas).
         """
-        pedidos_pagados = Pedido.objects.filter(
-            usuario=self.usuario,
-            estado=Pedido.EstadoPedido.PAGADO # O el estado que uses para 'completado'
-        )
-        
-        # 1. Calcular agregados
-        agregados = pedidos_pagados.aggregate(
-            total=Sum('total_pedido'),
-            conteo=Count('id')
+        agregados = pedidos_comprados().filter(cliente_id=self.usuario_id).aggregate(
+            total=Sum('total'),
+            conteo=Count('id'),
+            ultima=Max('fecha_creacion'),
         )
-        
-        # 2. Obtener última compra
-        ultimo_pedido = pedidos_pagados.order_by('-creado_en').first()
-        
-        # 3. Actualizar el objeto
         self.total_gastado = agregados['total'] or 0
-        self.total_pedidos = agregados['conteo'] or 0
-        self.fecha_ultima_compra = ultimo_pedido.creado_en if ultimo_pedido else None
-        
-        # 4. (Lógica de Segmentación simple)
-        if self.total_gastado > 1000: # Ej: Más de 1000 Bs es VIP
-            self.estado = self.EstadoCliente.VIP
-        elif self.total_pedidos > 0:
-            self.estado = self.EstadoCliente.ACTIVO
-        
-        self.save()
\ No newline at end of file
+        self.total_pedidos = agregados['conteo']
+        self.fecha_ultima_compra = agregados['ultima']
+        self.estado = self.estado_segun_compras()
+        self.save(update_fields=[*CAMPOS_ESTADISTICAS, 'actualizado_en'])
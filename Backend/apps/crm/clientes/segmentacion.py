@@ -0,0 +1,97 @@
+# apps/crm/clientes/segmentacion.py
+"""
+Segmentos automáticos: reglas sobre gasto, número de pedidos, recencia,
+acepta_marketing y región, aplicadas en bloque en la base.
+
+condiciones() traduce la regla de un Segmento a un Q sobre Cliente, y el
+ORM la compila a un SELECT de los ids que la cumplen. refrescar_segmento()
+lo envuelve en una sola sentencia que reescribe los miembros en la tabla
+de Cliente.segmentos: borra los que ya no cumplen, inserta los nuevos (las
+filas que no cambian no se tocan) y devuelve los conteos. Ningún Cliente
+pasa por Python, así que el coste es el de la consulta aunque haya cientos
+de miles.
+
+Las cifras de gasto y pedidos son las de Cliente (ver estadisticas.py).
+"""
+from datetime import timedelta
+
+from django.db import connections, router
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from apps.tenants.shards import atomic_tenant
+from apps.users.models import Direccion
+from .models import Cliente, Segmento
+
+
+def condiciones(segmento, ahora=None):
+    """Q sobre Cliente con las condiciones no vacías de la regla (todas a la vez)."""
+    ahora = ahora or timezone.now()
+    q = Q()
+    if segmento.gasto_minimo is not None:
+        q &= Q(total_gastado__gte=segmento.gasto_minimo)
+    if segmento.gasto_maximo is not None:
+        q &= Q(total_gastado__lte=segmento.gasto_maximo)
+    if segmento.pedidos_minimo is not None:
+        q &= Q(total_pedidos__gte=segmento.pedidos_minimo)
+    if segmento.pedidos_maximo is not None:
+        q &= Q(total_pedidos__lte=segmento.pedidos_maximo)
+    if segmento.dias_sin_comprar_minimo is not None:
+        limite = ahora - timedelta(days=segmento.dias_sin_comprar_minimo)
+        q &= Q(fecha_ultima_compra__lte=limite) | Q(fecha_ultima_compra__isnull=True)
+    if segmento.dias_sin_comprar_maximo is not None:
+        q &= Q(fecha_ultima_compra__gte=ahora - timedelta(days=segmento.dias_sin_comprar_maximo))
+    if segmento.acepta_marketing is not None:
+        q &= Q(usuario__acepta_marketing=segmento.acepta_marketing)
+    if segmento.departamento:
+        q &= Q(Exists(Direccion.objects.filter(
+            user_id=OuterRef('usuario_id'), departamento__iexact=segmento.departamento,
+        )))
+    return q
+
+
+def refrescar_segmento(segmento):
+    """
+    Reescribe los miembros de un segmento automático según su regla.
+    Devuelve {'miembros': n, 'altas': n, 'bajas': n}.
+    """
+    miembros = Cliente.segmentos.through
+    alias = router.db_for_write(miembros)
+    conexion = connections[alias]
+    q = conexion.ops.quote_name
+    tabla = q(miembros._meta.db_table)
+    sql_regla, params_regla = (
+        Cliente.objects.filter(condiciones(segmento)).order_by().values('id')
+        .query.get_compiler(using=alias).as_sql()
+    )
+    with atomic_tenant():
+        with conexion.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH regla AS ({sql_regla}),
+                bajas AS (
+                    DELETE FROM {tabla} m
+                    WHERE m.segmento_id = %s AND NOT EXISTS (SELECT 1 FROM regla r WHERE r.id = m.cliente_id)
+                    RETURNING 1
+                ),
+                altas AS (
+                    INSERT INTO {tabla} (cliente_id, segmento_id)
+                    SELECT r.id, %s FROM regla r
+                    WHERE NOT EXISTS (SELECT 1 FROM {tabla} m WHERE m.segmento_id = %s AND m.cliente_id = r.id)
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM regla), (SELECT count(*) FROM altas), (SELECT count(*) FROM bajas)
+                """,
+                [*params_regla, segmento.pk, segmento.pk, segmento.pk],
+            )
+            total, altas, bajas = cursor.fetchone()
+        segmento.miembros = total
+        segmento.refrescado_en = timezone.now()
+        segmento.save(update_fields=['miembros', 'refrescado_en'])
+    return {'miembros': total, 'altas': altas, 'bajas': bajas}
+
+
+def refrescar_segmentos():
+    """Refresca todos los segmentos automáticos del inquilino activo. Devuelve {nombre: resumen}."""
+    return {segmento.nombre: refrescar_segmento(segmento) for segmento in Segmento.objects.filter(automatico=True)}
@@ -10,7 +10,27 @@ class SegmentoSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Segmento
-        fields = ('id', 'nombre', 'descripcion')
+        fields = (
+            'id', 'nombre', 'descripcion',
+            # Regla de los segmentos automáticos
+            'automatico', 'gasto_minimo', 'gasto_maximo', 'pedidos_minimo', 'pedidos_maximo',
+            'dias_sin_comprar_minimo', 'dias_sin_comprar_maximo', 'acepta_marketing', 'departamento',
+            # Calculados al refrescar
+            'miembros', 'refrescado_en',
+        )
+        read_only_fields = ('miembros', 'refrescado_en')
+
+    def validate(self, attrs):
+        for minimo, maximo in (
+            ('gasto_minimo', 'gasto_maximo'),
+            ('pedidos_minimo', 'pedidos_maximo'),
+            ('dias_sin_comprar_minimo', 'dias_sin_comprar_maximo'),
+        ):
+            desde = attrs.get(minimo, getattr(self.instance, minimo, None))
+            hasta = attrs.get(maximo, getattr(self.instance, maximo, None))
+            if desde is not None and hasta is not None and desde > hasta:
+                raise serializers.ValidationError({maximo: f"Debe ser mayor o igual que {minimo}."})
+        return attrs
 
 class ClienteSerializer(serializers.ModelSerializer):
     """
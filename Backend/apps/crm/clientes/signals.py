@@ -3,6 +3,7 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.db import connection
+from .estadisticas import programar_suma
 from .models import Cliente
 
 from apps.ecommerce.pedidos.models import Pedido
@@ -22,18 +23,7 @@ def crear_perfil_cliente(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Pedido)
 def actualizar_perfil_cliente(sender, instance, **kwargs):
     """
-    Escucha cambios en el modelo Pedido.
-    Si un pedido se marca como PAGADO, recalcula las
-    estadísticas del perfil del cliente.
+    Cuando un pedido pasa a pagado, lo suma a las estadísticas de su
+    Cliente al confirmarse la transacción (un UPDATE, una sola vez por pedido).
     """
-    pedido = instance
-    
-    # Verificamos si el pedido se acaba de marcar como pagado
-    # (o el estado que uses para "completado")
-    if pedido.estado == Pedido.ESTADO_PAGADO and pedido.cliente:
-        # Usamos 'get' porque el signal 'crear_perfil_cliente'
-        # asegura que el perfil siempre exista.
-        cliente_perfil = Cliente.objects.get(usuario=pedido.cliente)
-        
-        # Llamamos al método que definimos en el modelo
-        cliente_perfil.recalcular_estadisticas()
\ No newline at end of file
+    programar_suma(instance)
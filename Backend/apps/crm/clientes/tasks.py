@@ -0,0 +1,59 @@
+# apps/crm/clientes/tasks.py
+"""
+Tareas asíncronas del CRM.
+- Recalcula cada noche las estadísticas de compra de los clientes de todos
+  los inquilinos, para corregir la deriva de la suma incremental (ver estadisticas.py).
+- Refresca los miembros de los segmentos automáticos (ver segmentacion.py).
+"""
+import logging
+
+from celery import shared_task
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from apps.tenants.models import Client
+from .estadisticas import recalcular_clientes
+from .segmentacion import refrescar_segmentos
+
+logger = logging.getLogger(__name__)
+
+
+def _schemas_listos():
+    return (
+        Client.objects.exclude(schema_name=get_public_schema_name())
+        .filter(estado=Client.ESTADO_LISTO).values_list('schema_name', flat=True)
+    )
+
+
+@shared_task
+def recalcular_estadisticas_clientes():
+    clientes = corregidos = 0
+    errores = []
+    for schema in _schemas_listos():
+        try:
+            with schema_context(schema):
+                resumen = recalcular_clientes()
+        except Exception:
+            logger.exception("No se pudieron recalcular los clientes de %s", schema)
+            errores.append(schema)
+            continue
+        clientes += resumen['clientes']
+        corregidos += resumen['corregidos']
+    return {'clientes': clientes, 'corregidos': corregidos, 'errores': errores}
+
+
+@shared_task
+def refrescar_segmentos_clientes():
+    segmentos = altas = bajas = 0
+    errores = []
+    for schema in _schemas_listos():
+        try:
+            with schema_context(schema):
+                resumenes = refrescar_segmentos()
+        except Exception:
+            logger.exception("No se pudieron refrescar los segmentos de %s", schema)
+            errores.append(schema)
+            continue
+        segmentos += len(resumenes)
+        altas += sum(r['altas'] for r in resumenes.values())
+        bajas += sum(r['bajas'] for r in resumenes.values())
+    return {'segmentos': segmentos, 'altas': altas, 'bajas': bajas, 'errores': errores}
@@ -1,6 +1,9 @@
 # apps/crm/clientes/views.py
-from rest_framework import generics, viewsets, permissions
+from rest_framework import generics, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from .models import Cliente, Segmento
+from .segmentacion import refrescar_segmento
 from .serializers import ClienteSerializer, SegmentoSerializer
 
 # --- Vista para el Cliente (Mi Perfil 360) ---
@@ -31,6 +34,17 @@ class AdminSegmentoViewSet(viewsets.ModelViewSet):
     serializer_class = SegmentoSerializer
     permission_classes = [permissions.IsAdminUser] # Solo staff/admin
 
+    @action(detail=True, methods=['post'])
+    def refrescar(self, request, pk=None):
+        """
+        Recalcula ya los miembros de un segmento automático (si no, lo hace
+        la tarea periódica). POST /api/clientes/admin/segmentos/{id}/refrescar/
+        """
+        segmento = self.get_object()
+        if not segmento.automatico:
+            return Response({'error': 'Solo los segmentos automáticos tienen regla.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(refrescar_segmento(segmento))
+
 class AdminClienteViewSet(viewsets.ModelViewSet):
     """
     (ADMIN) CRUD completo para gestionar todos los Perfiles 360.
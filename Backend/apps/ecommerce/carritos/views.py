@@ -4,7 +4,9 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
-from django.db import transaction
+
+from apps.core.throttling import grupo_limite
+from apps.tenants.shards import atomic_tenant
 
 from .models import Carrito, ItemCarrito
 from .serializers import CarritoSerializer, ItemCarritoWriteSerializer
@@ -81,7 +83,8 @@ class CarritoViewSet(viewsets.ViewSet):
             return Response({'error': 'Item no encontrado en el carrito.'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['post'])
-    @transaction.atomic
+    @grupo_limite('checkout')
+    @atomic_tenant()
     def crear_pedido(self, request):
         """
         Convierte el carrito actual en un nuevo pedido.
@@ -1,3 +1,44 @@
+# /apps/ecommerce/pagos/admin.py
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from .models import Pago, EventoPago
 
-# Register your models here.
+
+class EventoPagoInline(admin.TabularInline):
+    """Historial del proveedor: solo lectura y con el payload descomprimido bajo demanda."""
+    model = EventoPago
+    fields = ('tipo', 'creado_en', 'payload')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PagoChangeList(ChangeList):
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # El listado solo necesita las columnas que muestra; el formulario de edición carga el Pago entero
+        return super().get_queryset(request, exclude_parameters).only(
+            'id', 'id_transaccion_proveedor', 'monto', 'moneda', 'estado', 'creado_en', 'proveedor',
+            'pedido__id', 'pedido__codigo',
+        )
+
+
+@admin.register(Pago)
+class PagoAdmin(admin.ModelAdmin):
+    list_display = ('id_transaccion_proveedor', 'pedido_codigo', 'monto', 'moneda', 'estado', 'creado_en')
+    list_filter = ('estado', 'proveedor')
+    search_fields = ('id_transaccion_proveedor', 'pedido__codigo')
+    list_select_related = ('pedido',)
+    readonly_fields = ('creado_en', 'actualizado_en')
+    inlines = [EventoPagoInline]
+
+    def get_changelist(self, request, **kwargs):
+        return PagoChangeList
+
+    @admin.display(description='Pedido', ordering='pedido__codigo')
+    def pedido_codigo(self, obj):
+        # No Pedido.__str__: leería el cliente, que el listado no carga
+        return obj.pedido.codigo
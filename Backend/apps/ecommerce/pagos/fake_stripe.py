@@ -0,0 +1,190 @@
+# /apps/ecommerce/pagos/fake_stripe.py
+"""
+Servidor local que imita la parte de la API de Stripe que usa el backend,
+para pruebas de carga del checkout sin red ni cuenta de Stripe.
+
+Endpoints:
+- POST /v1/payment_intents                  crear
+- GET  /v1/payment_intents                  listar (limit, starting_after, created[gte])
+- GET  /v1/payment_intents/<id>             recuperar
+- POST /v1/payment_intents/<id>/confirm     confirmar (payment_method=pm_card_chargeDeclined falla)
+- POST /v1/payment_intents/<id>/cancel      cancelar
+
+Al confirmar envía el webhook firmado (cabecera Stripe-Signature, igual que
+Stripe) a la URL configurada, en un hilo aparte.
+Uso: python manage.py run_fake_stripe --webhook-url http://demo.localhost:8000/api/ecommerce/pagos/webhooks/stripe/
+y STRIPE_API_BASE=http://localhost:12111 en el backend.
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from apps.core import fake_http
+
+RUTA_PI = re.compile(r'^/v1/payment_intents/(?P<id>pi_[\w]+)(?:/(?P<accion>confirm|cancel))?$')
+
+
+def firmar_payload(payload, secreto, timestamp=None):
+    """Cabecera Stripe-Signature: t=<ts>,v1=HMAC-SHA256(secreto, '<ts>.<payload>')."""
+    timestamp = timestamp or int(time.time())
+    firmado = f"{timestamp}.{payload}".encode('utf-8')
+    firma = hmac.new(secreto.encode('utf-8'), firmado, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={firma}"
+
+
+def _parsear_form(cuerpo):
+    """Decodifica el form-encoding del SDK (metadata[clave]=valor, un nivel)."""
+    datos = {}
+    for clave, valor in parse_qsl(cuerpo, keep_blank_values=True):
+        m = re.match(r'^(\w+)\[(\w+)\]$', clave)
+        if m:
+            datos.setdefault(m.group(1), {})[m.group(2)] = valor
+        else:
+            datos[clave] = valor
+    return datos
+
+
+class FakeStripe:
+    """Estado en memoria del servidor (PaymentIntents por id, en orden de creación)."""
+
+    def __init__(self, webhook_url=None, webhook_secret=None, latencia_ms=0):
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret or ''
+        self.latencia = latencia_ms / 1000.0
+        self.payment_intents = {}
+        self.lock = threading.Lock()
+        self.webhooks = requests.Session()
+
+    def crear(self, datos):
+        pi_id = f"pi_fake_{uuid.uuid4().hex[:24]}"
+        payment_intent = {
+            'id': pi_id,
+            'object': 'payment_intent',
+            'amount': int(datos.get('amount', 0)),
+            'amount_received': 0,
+            'currency': datos.get('currency', 'usd'),
+            'description': datos.get('description'),
+            'metadata': datos.get('metadata', {}),
+            'status': 'requires_payment_method',
+            'client_secret': f"{pi_id}_secret_{uuid.uuid4().hex[:24]}",
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        with self.lock:
+            self.payment_intents[pi_id] = payment_intent
+        return payment_intent
+
+    def listar(self, filtros):
+        limite = min(int(filtros.get('limit', 10)), 100)
+        desde = int(filtros.get('created[gte]', 0))
+        with self.lock:
+            # Stripe lista del más reciente al más antiguo
+            todos = [pi for pi in reversed(self.payment_intents.values()) if pi['created'] >= desde]
+        if filtros.get('starting_after'):
+            ids = [pi['id'] for pi in todos]
+            inicio = ids.index(filtros['starting_after']) + 1 if filtros['starting_after'] in ids else len(ids)
+            todos = todos[inicio:]
+        return {
+            'object': 'list',
+            'url': '/v1/payment_intents',
+            'data': todos[:limite],
+            'has_more': len(todos) > limite,
+        }
+
+    def confirmar(self, payment_intent, datos):
+        if datos.get('payment_method') == 'pm_card_chargeDeclined':
+            payment_intent['status'] = 'requires_payment_method'
+            payment_intent['last_payment_error'] = {'code': 'card_declined', 'message': 'Your card was declined.'}
+            tipo = 'payment_intent.payment_failed'
+        else:
+            payment_intent['status'] = 'succeeded'
+            payment_intent['amount_received'] = payment_intent['amount']
+            tipo = 'payment_intent.succeeded'
+        self.enviar_webhook(tipo, dict(payment_intent))
+        return payment_intent
+
+    def enviar_webhook(self, tipo, objeto):
+        if not self.webhook_url:
+            return
+        evento = {
+            'id': f"evt_fake_{uuid.uuid4().hex[:24]}",
+            'object': 'event',
+            'type': tipo,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': objeto},
+        }
+        payload = json.dumps(evento)
+
+        def _enviar():
+            try:
+                self.webhooks.post(
+                    self.webhook_url,
+                    data=payload,
+                    headers={
+                        'Content-Type': 'application/json',
+                        'Stripe-Signature': firmar_payload(payload, self.webhook_secret),
+                    },
+                    timeout=10,
+                )
+            except requests.RequestException:
+                pass
+
+        threading.Thread(target=_enviar, daemon=True).start()
+
+
+class FakeStripeHandler(fake_http.ManejadorFake):
+
+    def cabeceras_extra(self):
+        return {'Request-Id': f"req_fake_{uuid.uuid4().hex[:14]}"}
+
+    def _no_encontrado(self, recurso):
+        self._responder(404, {'error': {
+            'type': 'invalid_request_error',
+            'code': 'resource_missing',
+            'message': f"No such payment_intent: '{recurso}'",
+        }})
+
+    def do_GET(self):
+        self._esperar()
+        url = urlsplit(self.path)
+        if url.path == '/v1/payment_intents':
+            return self._responder(200, self.estado.listar(dict(parse_qsl(url.query))))
+        m = RUTA_PI.match(url.path)
+        if not m or m.group('accion'):
+            return self._responder(404, {'error': {'type': 'invalid_request_error', 'message': 'Unrecognized request URL'}})
+        payment_intent = self.estado.payment_intents.get(m.group('id'))
+        if not payment_intent:
+            return self._no_encontrado(m.group('id'))
+        self._responder(200, payment_intent)
+
+    def do_POST(self):
+        self._esperar()
+        datos = _parsear_form(self._leer_cuerpo())
+        url = urlsplit(self.path)
+
+        if url.path == '/v1/payment_intents':
+            return self._responder(200, self.estado.crear(datos))
+
+        m = RUTA_PI.match(url.path)
+        if not m or not m.group('accion'):
+            return self._responder(404, {'error': {'type': 'invalid_request_error', 'message': 'Unrecognized request URL'}})
+        payment_intent = self.estado.payment_intents.get(m.group('id'))
+        if not payment_intent:
+            return self._no_encontrado(m.group('id'))
+
+        if m.group('accion') == 'confirm':
+            return self._responder(200, self.estado.confirmar(payment_intent, datos))
+        payment_intent['status'] = 'canceled'
+        self._responder(200, payment_intent)
+
+
+def crear_servidor(host='127.0.0.1', puerto=12111, **opciones):
+    return fake_http.crear_servidor(FakeStripeHandler, FakeStripe(**opciones), host, puerto)
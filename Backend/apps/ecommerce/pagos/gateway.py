@@ -0,0 +1,105 @@
+# /apps/ecommerce/pagos/gateway.py
+"""
+Pasarela de pagos: único punto desde el que el backend habla con Stripe.
+
+- Una sola sesión HTTP keep-alive (pool de conexiones) por proceso, en lugar
+  del cliente por defecto del SDK.
+- Timeouts cortos de conexión/lectura y un presupuesto de reintentos acotado
+  (el SDK reintenta con idempotency keys, así los POST no se duplican).
+- Lecturas de PaymentIntent cacheadas unos segundos por id, para que los
+  sondeos del cliente no pasen todos por la API de Stripe.
+- STRIPE_API_BASE permite apuntar al servidor local (manage.py run_fake_stripe).
+"""
+import threading
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+
+class StripeGateway:
+    CACHE_PREFIX = 'stripe:pi:'
+
+    def __init__(self):
+        self._configurado = False
+        self._lock = threading.Lock()
+
+    def _configurar(self):
+        """Configura el SDK una vez por proceso (perezoso, tras cargar settings)."""
+        if self._configurado:
+            return
+        with self._lock:
+            if self._configurado:
+                return
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.STRIPE_POOL_CONEXIONES,
+                pool_maxsize=settings.STRIPE_POOL_CONEXIONES,
+                max_retries=0,  # los reintentos los hace el SDK (con idempotency key)
+            )
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            stripe.api_key = settings.STRIPE_SECRET_KEY
+            stripe.max_network_retries = settings.STRIPE_MAX_REINTENTOS
+            stripe.default_http_client = stripe.RequestsClient(
+                timeout=(settings.STRIPE_TIMEOUT_CONEXION, settings.STRIPE_TIMEOUT_LECTURA),
+                session=session,
+            )
+            if settings.STRIPE_API_BASE:
+                stripe.api_base = settings.STRIPE_API_BASE
+            self._configurado = True
+
+    @property
+    def configurado(self):
+        return bool(settings.STRIPE_SECRET_KEY)
+
+    def crear_payment_intent(self, monto_centavos, moneda, metadata, descripcion):
+        self._configurar()
+        return stripe.PaymentIntent.create(
+            amount=monto_centavos,
+            currency=moneda,
+            metadata=metadata,
+            description=descripcion,
+        )
+
+    def obtener_payment_intent(self, payment_intent_id, usar_cache=True):
+        """
+        Recupera un PaymentIntent. Con usar_cache=True la respuesta se reutiliza
+        durante STRIPE_CACHE_PAYMENT_INTENT_SEGUNDOS (los ids son globales en
+        Stripe, así que la clave no depende del inquilino).
+        """
+        clave = f"{self.CACHE_PREFIX}{payment_intent_id}"
+        if usar_cache:
+            payment_intent = caches['compartida'].get(clave)
+            if payment_intent is not None:
+                return payment_intent
+
+        self._configurar()
+        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        caches['compartida'].set(clave, payment_intent, settings.STRIPE_CACHE_PAYMENT_INTENT_SEGUNDOS)
+        return payment_intent
+
+    def listar_payment_intents(self, creado_desde, por_pagina=100):
+        """
+        Itera los PaymentIntents creados desde `creado_desde` (datetime),
+        página por página (lista de objetos por página), del más reciente al más antiguo.
+        """
+        self._configurar()
+        params = {'limit': por_pagina, 'created': {'gte': int(creado_desde.timestamp())}}
+        while True:
+            pagina = stripe.PaymentIntent.list(**params)
+            if pagina.data:
+                yield pagina.data
+            if not pagina.has_more or not pagina.data:
+                return
+            params['starting_after'] = pagina.data[-1].id
+
+    def construir_evento(self, payload, firma):
+        """Verifica la firma del webhook; no hace llamadas de red."""
+        return stripe.Webhook.construct_event(payload, firma, settings.STRIPE_WEBHOOK_SECRET)
+
+
+gateway = StripeGateway()
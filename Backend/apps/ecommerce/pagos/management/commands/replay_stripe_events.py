@@ -0,0 +1,48 @@
+import json
+import uuid
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.ecommerce.pagos.views import registrar_evento_webhook
+from apps.ecommerce.pagos.tasks import procesar_eventos_webhook
+
+EVENTOS_DIR = Path(__file__).resolve().parents[2] / 'eventos_prueba'
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay recorded Stripe webhook events through the webhook inbox without network access. '
+        'Signature verification is skipped; events are processed synchronously.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Event JSON files (defaults to every file in pagos/eventos_prueba)')
+        parser.add_argument('--schema', type=str, help='Override the tenant schema taken from the event metadata')
+        parser.add_argument('--pedido', type=int, help='Override metadata.pedido_id in every event')
+        parser.add_argument('--new-ids', action='store_true', help='Assign fresh event ids so duplicates are not dropped')
+
+    def handle(self, *args, **options):
+        files = [Path(f) for f in options['files']] or sorted(EVENTOS_DIR.glob('*.json'))
+        if not files:
+            raise CommandError(f"No event files found in {EVENTOS_DIR}")
+
+        for path in files:
+            try:
+                evento = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {path}: {e}")
+
+            metadata = evento['data']['object'].setdefault('metadata', {})
+            if options['schema']:
+                metadata['tenant_schema'] = options['schema']
+            if options['pedido']:
+                metadata['pedido_id'] = str(options['pedido'])
+            if options['new_ids']:
+                evento['id'] = f"evt_replay_{uuid.uuid4().hex[:16]}"
+
+            registrar_evento_webhook(evento)
+            self.stdout.write(f"Queued {evento['type']} ({evento['id']}) from {path.name}")
+
+        resultado = procesar_eventos_webhook()
+        self.stdout.write(self.style.SUCCESS(f"Processed {resultado['procesados']} event(s)"))
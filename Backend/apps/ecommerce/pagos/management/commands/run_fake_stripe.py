@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.ecommerce.pagos.fake_stripe import crear_servidor
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a local Stripe stand-in implementing the PaymentIntent endpoints used by the backend '
+        'and sending signed webhooks. Point STRIPE_API_BASE at it for offline checkout load tests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--webhook-url', help='URL that receives payment_intent.* webhooks')
+        parser.add_argument('--webhook-secret', default=None, help='Defaults to STRIPE_WEBHOOK_SECRET')
+        parser.add_argument('--latency-ms', type=int, default=0, help='Artificial latency per request')
+
+    def handle(self, *args, **options):
+        servidor = crear_servidor(
+            host=options['host'],
+            puerto=options['port'],
+            webhook_url=options['webhook_url'],
+            webhook_secret=options['webhook_secret'] or settings.STRIPE_WEBHOOK_SECRET,
+            latencia_ms=options['latency_ms'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Stripe listening on http://{options['host']}:{options['port']} "
+            f"(webhooks -> {options['webhook_url'] or 'disabled'})"
+        ))
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            servidor.server_close()
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:22
+
+import json
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mover_datos_respuesta(apps, schema_editor):
+    """Copia cada datos_respuesta existente a EventoPago (comprimido) antes de borrar la columna."""
+    Pago = apps.get_model('pagos', 'Pago')
+    EventoPago = apps.get_model('pagos', 'EventoPago')
+    db = schema_editor.connection.alias
+
+    lote = []
+    pagos = Pago.objects.using(db).filter(datos_respuesta__isnull=False).values_list('id', 'estado', 'datos_respuesta')
+    for pago_id, estado, datos in pagos.iterator(chunk_size=500):
+        lote.append(EventoPago(
+            pago_id=pago_id,
+            tipo=f'migrado.{estado}',
+            payload_comprimido=zlib.compress(json.dumps(datos, separators=(',', ':')).encode('utf-8')),
+        ))
+        if len(lote) >= 500:
+            EventoPago.objects.using(db).bulk_create(lote)
+            lote = []
+    EventoPago.objects.using(db).bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(help_text='Ej: payment_intent.created, payment_intent.succeeded', max_length=100)),
+                ('payload_comprimido', models.BinaryField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('pago', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='pagos.pago')),
+            ],
+            options={
+                'ordering': ['creado_en'],
+            },
+        ),
+        migrations.RunPython(mover_datos_respuesta, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='pago',
+            name='datos_respuesta',
+        ),
+    ]
@@ -1,4 +1,7 @@
 # /apps/ecommerce/pagos/models.py
+import json
+import zlib
+
 from django.db import models
 from ..pedidos.models import Pedido
 
@@ -18,12 +21,45 @@ class Pago(models.Model):
     monto = models.DecimalField(max_digits=12, decimal_places=2)
     moneda = models.CharField(max_length=10, default='USD')
     estado = models.CharField(max_length=20, choices=ESTADOS, default=ESTADO_PENDIENTE)
-    
-    # Guarda la respuesta completa del proveedor para auditoría
-    datos_respuesta = models.JSONField(blank=True, null=True)
 
+    # Las respuestas completas del proveedor se guardan aparte, en EventoPago
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"Pago {self.id_transaccion_proveedor} para Pedido {self.pedido.codigo} - {self.estado}"
\ No newline at end of file
+        return f"Pago {self.id_transaccion_proveedor} para Pedido {self.pedido.codigo} - {self.estado}"
+
+
+class EventoPago(models.Model):
+    """
+    Historial append-only de las respuestas del proveedor para un Pago
+    (auditoría). El JSON se guarda comprimido con zlib para que la tabla de
+    pagos y sus listados no crezcan con el tamaño de los payloads.
+    """
+    pago = models.ForeignKey(Pago, on_delete=models.CASCADE, related_name='eventos')
+    tipo = models.CharField(max_length=100, help_text="Ej: payment_intent.created, payment_intent.succeeded")
+    payload_comprimido = models.BinaryField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['creado_en']
+
+    def __str__(self):
+        return f"{self.tipo} ({self.creado_en:%Y-%m-%d %H:%M})"
+
+    @staticmethod
+    def comprimir(payload):
+        return zlib.compress(json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8'))
+
+    @property
+    def payload(self):
+        return json.loads(zlib.decompress(bytes(self.payload_comprimido)))
+
+    @classmethod
+    def registrar(cls, pago, tipo, payload):
+        return cls.objects.create(pago=pago, tipo=tipo, payload_comprimido=cls.comprimir(payload))
+
+    def save(self, *args, **kwargs):
+        if self.pk:
+            raise ValueError("EventoPago es de solo inserción")
+        super().save(*args, **kwargs)
@@ -0,0 +1,197 @@
+# /apps/ecommerce/pagos/services.py
+"""
+Lógica de negocio de pagos, independiente de las vistas HTTP.
+Las funciones de este módulo asumen que la conexión ya apunta al
+esquema del inquilino correcto.
+"""
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from apps.tenants.shards import atomic_tenant
+
+from .models import Pago, EventoPago
+from ..pedidos.models import Pedido
+from ..productos.models import ArticuloAlmacen, StockMovimiento
+
+
+class EventoInvalido(Exception):
+    """El evento no se puede procesar y no tiene sentido reintentarlo."""
+
+
+class ReservaInsuficiente(Exception):
+    """El stock reservado no cubre el pedido: no se liquida a medias."""
+
+
+def procesar_evento_stripe(evento):
+    """
+    Aplica un evento de Stripe ya verificado (dict con 'type' y 'data').
+    Los tipos que no nos interesan se ignoran sin error.
+    """
+    tipo = evento['type']
+    payment_intent = evento['data']['object']
+    pedido_id = payment_intent.get('metadata', {}).get('pedido_id')
+
+    if tipo == 'payment_intent.succeeded':
+        if not pedido_id:
+            raise EventoInvalido('No se encontró pedido_id en metadata')
+
+        try:
+            liquidar_pago(payment_intent)
+        except Pedido.DoesNotExist:
+            raise EventoInvalido(f'Pedido {pedido_id} no encontrado')
+
+    elif tipo == 'payment_intent.payment_failed':
+        if pedido_id:
+            # Solo se marca el Pago creado al iniciar el cobro; sin él no hay
+            # pedido ni monto con los que crear uno nuevo.
+            marcar_fallidos({payment_intent['id']: payment_intent})
+
+
+@atomic_tenant()
+def liquidar_pago(payment_intent, cliente=None):
+    """
+    Marca como pagado el pedido de un PaymentIntent exitoso y mueve su stock
+    de reservado a salida definitiva. Es el único punto de liquidación: lo
+    usan el webhook y VerificarEstadoPagoView.
+
+    - Bloquea la fila del Pedido (SELECT ... FOR UPDATE), así dos caminos
+      concurrentes no pueden liquidar el mismo pedido dos veces.
+    - Es idempotente por PaymentIntent: si ya hay un Pago exitoso con ese id,
+      o el pedido ya está pagado, no hace nada.
+
+    `payment_intent` puede ser el dict del evento o el objeto del SDK.
+    Si se pasa `cliente`, el pedido debe pertenecerle (Pedido.DoesNotExist si no).
+    EventoInvalido si el PaymentIntent es de otro inquilino o su monto no es
+    el total del pedido: los pedido_id se repiten entre tiendas.
+    Devuelve (pedido, liquidado_ahora).
+    """
+    metadata = payment_intent['metadata']
+    if metadata.get('tenant_schema') != connection.schema_name:
+        raise EventoInvalido(f"El PaymentIntent {payment_intent['id']} no es de este inquilino")
+
+    pedidos = Pedido.objects.select_for_update()
+    if cliente is not None:
+        pedidos = pedidos.filter(cliente=cliente)
+    pedido = pedidos.get(id=metadata['pedido_id'])
+
+    # Mismo redondeo que al crear el PaymentIntent
+    if payment_intent['amount'] != int(pedido.total * 100):
+        raise EventoInvalido(
+            f"El monto de {payment_intent['id']} ({payment_intent['amount']}) no coincide con el pedido {pedido.codigo}"
+        )
+
+    ya_liquidado = Pago.objects.filter(
+        id_transaccion_proveedor=payment_intent['id'],
+        estado=Pago.ESTADO_EXITOSO,
+    ).exists()
+    if pedido.pagado or ya_liquidado:
+        return pedido, False
+
+    # 1. Actualizar o crear el registro de Pago (y guardar la respuesta en su historial)
+    pago, _ = Pago.objects.update_or_create(
+        id_transaccion_proveedor=payment_intent['id'],
+        defaults={
+            'pedido': pedido,
+            'monto': payment_intent['amount'] / 100.0,  # Stripe usa centavos
+            'moneda': payment_intent['currency'].upper(),
+            'estado': Pago.ESTADO_EXITOSO,
+        }
+    )
+    EventoPago.registrar(pago, 'payment_intent.succeeded', payment_intent)
+
+    # 2. Actualizar el Pedido
+    pedido.pagado = True
+    pedido.estado = Pedido.ESTADO_PAGADO
+    pedido.save()
+
+    # 3. Mover stock: de reservado a salida definitiva
+    finalizar_reservas(pedido)
+    return pedido, True
+
+
+def marcar_fallidos(payment_intents):
+    """
+    Marca como fallidos los Pagos pendientes de los PaymentIntents dados
+    ({id: payment_intent}) con un solo UPDATE y guarda sus respuestas.
+    Solo se marcan Pagos ya creados al iniciar el cobro; sin ellos no hay
+    pedido ni monto con los que crear uno nuevo. Devuelve cuántos marcó.
+    """
+    pagos = list(Pago.objects.filter(
+        estado=Pago.ESTADO_PENDIENTE,
+        id_transaccion_proveedor__in=list(payment_intents),
+    ).only('id', 'id_transaccion_proveedor'))
+    if not pagos:
+        return 0
+
+    Pago.objects.filter(id__in=[p.id for p in pagos]).update(estado=Pago.ESTADO_FALLIDO)
+    EventoPago.objects.bulk_create([
+        EventoPago(
+            pago=pago,
+            tipo='payment_intent.payment_failed',
+            payload_comprimido=EventoPago.comprimir(payment_intents[pago.id_transaccion_proveedor]),
+        )
+        for pago in pagos
+    ])
+    return len(pagos)
+
+
+def finalizar_reservas(pedido):
+    """
+    Descuenta cantidad y reserva de los artículos del pedido con un UPDATE
+    condicional por almacén (solo filas con reserva y existencias
+    suficientes; ReservaInsuficiente si falta alguna) y registra los
+    movimientos con bulk_create.
+    Usa el mismo artículo que eligió la reserva en crear_pedido: el primero
+    del producto según el orden por defecto (-actualizado_en).
+    """
+    detalles = list(pedido.detalles.all())
+    if not detalles:
+        return
+
+    articulos = {
+        a['producto_id']: a
+        for a in ArticuloAlmacen.objects.filter(producto_id__in={d.producto_id for d in detalles})
+        .order_by('producto_id', '-actualizado_en')
+        .distinct('producto_id')
+        .values('id', 'producto_id', 'almacen_id')
+    }
+
+    por_almacen = defaultdict(lambda: defaultdict(int))  # almacen_id -> {articulo_id: cantidad}
+    movimientos = []
+    for detalle in detalles:
+        articulo = articulos.get(detalle.producto_id)
+        if not articulo:
+            # Sin artículo en almacén no hubo reserva ni hay almacén que registrar
+            continue
+        por_almacen[articulo['almacen_id']][articulo['id']] += detalle.cantidad
+        movimientos.append(StockMovimiento(
+            producto_id=detalle.producto_id,
+            almacen_id=articulo['almacen_id'],
+            cantidad=detalle.cantidad,
+            tipo='salida',
+            referencia=f"Venta Pedido {pedido.codigo}",
+            usuario_id=pedido.cliente_id,
+        ))
+
+    ahora = timezone.now()
+    for cantidades in por_almacen.values():
+        descuento = Case(
+            *[When(id=articulo_id, then=Value(cantidad)) for articulo_id, cantidad in cantidades.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        # Solo si hay reserva y existencias para todo: ninguna queda negativa
+        actualizados = ArticuloAlmacen.objects.filter(
+            id__in=list(cantidades), reservado__gte=descuento, cantidad__gte=descuento,
+        ).update(
+            cantidad=F('cantidad') - descuento,
+            reservado=F('reservado') - descuento,
+            actualizado_en=ahora,
+        )
+        if actualizados != len(cantidades):
+            raise ReservaInsuficiente(f"Reserva o existencias insuficientes para el pedido {pedido.codigo}")
+
+    StockMovimiento.objects.bulk_create(movimientos)
@@ -0,0 +1,173 @@
+# /apps/ecommerce/pagos/tasks.py
+"""
+Tareas asíncronas de pagos.
+- Drena la bandeja de webhooks de Stripe (apps.core.EventoWebhook) por lotes,
+  enrutando cada evento al esquema del inquilino indicado en su metadata.
+- Concilia periódicamente los Pagos pendientes contra Stripe, por si se
+  perdió algún webhook.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_tenants.utils import schema_context, get_public_schema_name
+
+from apps.core.models import EventoWebhook
+from apps.tenants.models import Client
+from apps.tenants.shards import atomic_tenant
+from .gateway import gateway
+from .models import Pago
+from .services import procesar_evento_stripe, liquidar_pago, marcar_fallidos, EventoInvalido
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 5
+
+
+@shared_task
+def procesar_eventos_webhook(lote=None, max_lotes=20):
+    """
+    Procesa eventos pendientes de la bandeja en lotes de `lote`.
+    Usa SKIP LOCKED para que varios workers puedan drenar en paralelo sin
+    tomar el mismo evento. Los fallos se reintentan con backoff exponencial.
+    """
+    lote = lote or getattr(settings, 'STRIPE_WEBHOOK_LOTE', 100)
+    total = 0
+
+    for _ in range(max_lotes):
+        with transaction.atomic():
+            ahora = timezone.now()
+            eventos = list(
+                EventoWebhook.objects.select_for_update(skip_locked=True)
+                .filter(estado=EventoWebhook.ESTADO_PENDIENTE, disponible_en__lte=ahora)
+                .order_by('recibido_en')[:lote]
+            )
+            if not eventos:
+                break
+
+            por_tenant = defaultdict(list)
+            for evento in eventos:
+                por_tenant[evento.tenant_schema].append(evento)
+
+            for schema, eventos_tenant in por_tenant.items():
+                if not schema or schema == get_public_schema_name():
+                    for evento in eventos_tenant:
+                        evento.estado = EventoWebhook.ESTADO_IGNORADO
+                        evento.error = 'Evento sin inquilino asociado'
+                    continue
+
+                with schema_context(schema):
+                    for evento in eventos_tenant:
+                        _aplicar_evento(evento, ahora)
+
+            EventoWebhook.objects.bulk_update(
+                eventos, ['estado', 'intentos', 'error', 'disponible_en', 'procesado_en']
+            )
+        total += len(eventos)
+        if len(eventos) < lote:
+            break
+
+    return {'procesados': total}
+
+
+def _aplicar_evento(evento, ahora):
+    """Aplica un evento dentro de un savepoint para aislar sus fallos del lote."""
+    try:
+        # En el shard del inquilino: si es 'default' es un savepoint dentro del lote
+        with atomic_tenant():
+            procesar_evento_stripe(evento.payload)
+    except EventoInvalido as exc:
+        evento.estado = EventoWebhook.ESTADO_ERROR
+        evento.error = str(exc)
+    except Exception as exc:
+        logger.exception("Error procesando evento %s", evento.id_evento)
+        evento.intentos += 1
+        evento.error = str(exc)
+        if evento.intentos >= MAX_INTENTOS:
+            evento.estado = EventoWebhook.ESTADO_ERROR
+        else:
+            evento.disponible_en = ahora + timedelta(minutes=2 ** evento.intentos)
+        return
+    else:
+        evento.estado = EventoWebhook.ESTADO_PROCESADO
+        evento.error = ''
+    evento.procesado_en = ahora
+
+
+@shared_task
+def conciliar_pagos(ventana_horas=None):
+    """
+    Recorre los PaymentIntents recientes de Stripe página por página y los
+    cruza en bloque con los Pagos pendientes de cada inquilino (por
+    id_transaccion_proveedor). Los exitosos se liquidan con el mismo servicio
+    que el webhook; los cancelados o rechazados se marcan fallidos en bloque
+    por página e inquilino.
+
+    Devuelve un resumen con el retraso de conciliación: segundos entre la
+    creación del PaymentIntent y su liquidación aquí (p. ej. webhook perdido).
+    """
+    ventana_horas = ventana_horas or settings.PAGOS_CONCILIACION_VENTANA_HORAS
+    desde = timezone.now() - timedelta(hours=ventana_horas)
+    schemas_validos = set(Client.objects.exclude(schema_name=get_public_schema_name())
+                          .values_list('schema_name', flat=True))
+
+    revisados = liquidados = fallidos = 0
+    retrasos = []
+
+    for pagina in gateway.listar_payment_intents(creado_desde=desde):
+        revisados += len(pagina)
+        por_tenant = defaultdict(dict)
+        for payment_intent in pagina:
+            schema = payment_intent.metadata.get('tenant_schema')
+            if schema in schemas_validos and _es_final(payment_intent):
+                por_tenant[schema][payment_intent.id] = payment_intent
+
+        for schema, payment_intents in por_tenant.items():
+            with schema_context(schema):
+                pendientes = Pago.objects.filter(
+                    estado=Pago.ESTADO_PENDIENTE,
+                    id_transaccion_proveedor__in=list(payment_intents),
+                ).values_list('id_transaccion_proveedor', flat=True)
+
+                rechazados = []
+                for pi_id in pendientes:
+                    payment_intent = payment_intents[pi_id]
+                    if payment_intent.status != 'succeeded':
+                        rechazados.append(pi_id)
+                        continue
+                    try:
+                        _, liquidado = liquidar_pago(payment_intent)
+                    except Exception:
+                        logger.exception("No se pudo liquidar %s en %s", pi_id, schema)
+                        continue
+                    if liquidado:
+                        liquidados += 1
+                        retrasos.append(time.time() - payment_intent.created)
+
+                if rechazados:
+                    fallidos += marcar_fallidos({pi_id: payment_intents[pi_id] for pi_id in rechazados})
+
+    resumen = {
+        'revisados': revisados,
+        'liquidados': liquidados,
+        'fallidos': fallidos,
+        'retraso_max_segundos': round(max(retrasos), 1) if retrasos else 0,
+        'retraso_medio_segundos': round(sum(retrasos) / len(retrasos), 1) if retrasos else 0,
+    }
+    if liquidados:
+        logger.warning("Conciliación liquidó pagos sin webhook: %s", resumen)
+    else:
+        logger.info("Conciliación de pagos: %s", resumen)
+    return resumen
+
+
+def _es_final(payment_intent):
+    """Estados que cierran un Pago pendiente: exitoso, cancelado o tarjeta rechazada."""
+    if payment_intent.status in ('succeeded', 'canceled'):
+        return True
+    return payment_intent.status == 'requires_payment_method' and bool(payment_intent.get('last_payment_error'))
@@ -1,3 +1,110 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.db import connection
+from django.test import TransactionTestCase
+from django_tenants.utils import schema_context
+
+from apps.tenants.models import Client
+from ..pedidos.models import Pedido, DetallePedido
+from ..productos.models import Producto, Almacen, ArticuloAlmacen, StockMovimiento
+from .models import Pago
+from .services import EventoInvalido, liquidar_pago, procesar_evento_stripe
+
+
+class LiquidacionConcurrenteTest(TransactionTestCase):
+    """
+    El webhook y la verificación del cliente llegan a la vez para el mismo
+    PaymentIntent: el pedido debe liquidarse una sola vez.
+    Necesita TransactionTestCase porque cada hilo usa su propia conexión.
+    """
+    schema = 'test_liquidacion'
+
+    def setUp(self):
+        self.tenant = Client(schema_name=self.schema, name='Test liquidación')
+        self.tenant.save()
+
+        with schema_context(self.schema):
+            producto = Producto.objects.create(codigo='SKU-1', nombre='Producto 1', precio=Decimal('50.00'))
+            almacen = Almacen.objects.create(nombre='Principal', codigo='MAIN')
+            self.articulo = ArticuloAlmacen.objects.create(producto=producto, almacen=almacen, cantidad=10, reservado=3)
+            self.pedido = Pedido.objects.create(codigo='PED-TEST0001', total=Decimal('150.00'))
+            DetallePedido.objects.create(
+                pedido=self.pedido, producto=producto, nombre_producto=producto.nombre,
+                cantidad=3, precio_unitario=Decimal('50.00'), subtotal=Decimal('150.00'),
+            )
+            Pago.objects.create(
+                pedido=self.pedido, id_transaccion_proveedor='pi_test_concurrente',
+                monto=Decimal('150.00'), estado=Pago.ESTADO_PENDIENTE,
+            )
+
+        self.payment_intent = {
+            'id': 'pi_test_concurrente',
+            'amount': 15000,
+            'currency': 'usd',
+            'status': 'succeeded',
+            'metadata': {'pedido_id': str(self.pedido.id), 'tenant_schema': self.schema},
+        }
+
+    def tearDown(self):
+        connection.set_schema_to_public()
+        self.tenant.delete(force_drop=True)
+
+    def test_webhook_y_verificacion_simultaneos(self):
+        barrera = threading.Barrier(2)
+        errores = []
+
+        def en_hilo(funcion):
+            def ejecutar():
+                try:
+                    with schema_context(self.schema):
+                        barrera.wait()
+                        funcion()
+                except Exception as exc:
+                    errores.append(exc)
+                finally:
+                    connection.close()
+            return threading.Thread(target=ejecutar)
+
+        webhook = en_hilo(lambda: procesar_evento_stripe({
+            'type': 'payment_intent.succeeded',
+            'data': {'object': self.payment_intent},
+        }))
+        verificacion = en_hilo(lambda: liquidar_pago(self.payment_intent))
+
+        webhook.start()
+        verificacion.start()
+        webhook.join()
+        verificacion.join()
+
+        self.assertEqual(errores, [])
+        with schema_context(self.schema):
+            self.articulo.refresh_from_db()
+            self.assertEqual(self.articulo.cantidad, 7)
+            self.assertEqual(self.articulo.reservado, 0)
+            self.assertEqual(StockMovimiento.objects.filter(tipo='salida').count(), 1)
+            self.assertEqual(Pago.objects.filter(estado=Pago.ESTADO_EXITOSO).count(), 1)
+            self.assertTrue(Pedido.objects.get(id=self.pedido.id).pagado)
+
+    def test_liquidar_dos_veces_es_idempotente(self):
+        with schema_context(self.schema):
+            _, primera = liquidar_pago(self.payment_intent)
+            _, segunda = liquidar_pago(self.payment_intent)
+
+            self.assertTrue(primera)
+            self.assertFalse(segunda)
+            self.articulo.refresh_from_db()
+            self.assertEqual(self.articulo.cantidad, 7)
+            self.assertEqual(StockMovimiento.objects.count(), 1)
+
+    def test_rechaza_payment_intent_de_otro_inquilino_o_monto(self):
+        with schema_context(self.schema):
+            otro_inquilino = {**self.payment_intent, 'metadata': {**self.payment_intent['metadata'], 'tenant_schema': 'otra'}}
+            with self.assertRaises(EventoInvalido):
+                liquidar_pago(otro_inquilino)
+            with self.assertRaises(EventoInvalido):
+                liquidar_pago({**self.payment_intent, 'amount': 100})
+
+            self.assertFalse(Pedido.objects.get(id=self.pedido.id).pagado)
+            self.articulo.refresh_from_db()
+            self.assertEqual(self.articulo.reservado, 3)
@@ -4,17 +4,22 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.conf import settings
-from django.db import transaction
+from django.db import transaction, connection
 
-from .models import Pago
+from apps.core.models import EventoWebhook
+
+from .models import Pago, EventoPago
 from .serializers import PagoSerializer
 from ..pedidos.models import Pedido
-from ..productos.models import ArticuloAlmacen, StockMovimiento
+from .services import EventoInvalido, liquidar_pago
+from .tasks import procesar_eventos_webhook
+
+from .gateway import gateway
 
+import logging
 import stripe
 
-# Configura tu clave secreta de Stripe
-stripe.api_key = settings.STRIPE_SECRET_KEY
+logger = logging.getLogger(__name__)
 
 class PagoViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -44,6 +49,7 @@ class CrearPaymentIntentView(APIView):
     }
     """
     permission_classes = [permissions.IsAuthenticated]
+    throttle_scope = 'checkout'
 
     def post(self, request):
         pedido_id = request.data.get('pedido_id')
@@ -74,27 +80,29 @@ class CrearPaymentIntentView(APIView):
             # El monto debe estar en centavos (multiplicar por 100)
             monto_centavos = int(float(pedido.total) * 100)
             
-            payment_intent = stripe.PaymentIntent.create(
-                amount=monto_centavos,
-                currency='usd',  # Puedes hacerlo configurable
+            payment_intent = gateway.crear_payment_intent(
+                monto_centavos=monto_centavos,
+                moneda='usd',  # Puedes hacerlo configurable
                 metadata={
                     'pedido_id': pedido.id,
                     'pedido_codigo': pedido.codigo,
-                    'usuario_email': request.user.email
+                    'usuario_email': request.user.email,
+                    # El webhook usa este dato para enrutar el evento a la tienda
+                    'tenant_schema': connection.schema_name,
                 },
-                description=f'Pago para pedido {pedido.codigo}'
+                descripcion=f'Pago para pedido {pedido.codigo}'
             )
             
             # Opcional: Crear registro de pago en estado pendiente
-            Pago.objects.create(
+            pago = Pago.objects.create(
                 pedido=pedido,
                 proveedor='stripe',
                 id_transaccion_proveedor=payment_intent.id,
                 monto=pedido.total,
                 moneda='USD',
                 estado=Pago.ESTADO_PENDIENTE,
-                datos_respuesta={'payment_intent_created': payment_intent}
             )
+            EventoPago.registrar(pago, 'payment_intent.created', payment_intent)
             
             return Response({
                 'client_secret': payment_intent.client_secret,
@@ -138,7 +146,6 @@ class VerificarEstadoPagoView(APIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         payment_intent_id = request.data.get('payment_intent_id')
         
@@ -148,9 +155,25 @@ class VerificarEstadoPagoView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Si el webhook o la conciliación ya liquidaron el pago, no hace falta consultar a Stripe
+        pago = (Pago.objects.select_related('pedido')
+                .filter(id_transaccion_proveedor=payment_intent_id,
+                        pedido__cliente=request.user,
+                        estado=Pago.ESTADO_EXITOSO)
+                .first())
+        if pago:
+            return Response({
+                'status': 'succeeded',
+                'pedido_id': pago.pedido.id,
+                'pedido_codigo': pago.pedido.codigo,
+                'pedido_estado': pago.pedido.estado,
+                'pagado': pago.pedido.pagado,
+                'mensaje': 'Pago confirmado exitosamente'
+            }, status=status.HTTP_200_OK)
+
         try:
-            # Recuperar el PaymentIntent desde Stripe
-            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            # Recuperar el PaymentIntent (cacheado unos segundos por id)
+            payment_intent = gateway.obtener_payment_intent(payment_intent_id)
             
             # Obtener el pedido_id desde los metadata
             pedido_id = payment_intent.metadata.get('pedido_id')
@@ -171,43 +194,8 @@ class VerificarEstadoPagoView(APIView):
             
             # Verificar el estado del PaymentIntent
             if payment_intent.status == 'succeeded':
-                # Solo actualizar si el pedido no está ya marcado como pagado
-                if not pedido.pagado:
-                    # 1. Actualizar o crear el registro de Pago
-                    pago, created = Pago.objects.update_or_create(
-                        id_transaccion_proveedor=payment_intent.id,
-                        defaults={
-                            'pedido': pedido,
-                            'monto': payment_intent.amount / 100.0,  # Stripe usa centavos
-                            'moneda': payment_intent.currency.upper(),
-                            'estado': Pago.ESTADO_EXITOSO,
-                            'datos_respuesta': dict(payment_intent),
-                        }
-                    )
-                    
-                    # 2. Actualizar el Pedido
-                    pedido.pagado = True
-                    pedido.estado = 'pagado'
-                    pedido.save()
-
-                    # 3. Mover stock: de reservado a salida definitiva
-                    for detalle in pedido.detalles.all():
-                        articulo_almacen = ArticuloAlmacen.objects.filter(producto=detalle.producto).first()
-                        if articulo_almacen:
-                            # Reducir cantidad y reserva
-                            articulo_almacen.cantidad -= detalle.cantidad
-                            articulo_almacen.reservado -= detalle.cantidad
-                            articulo_almacen.save()
-                        
-                        # Crear movimiento de stock para auditoría
-                        StockMovimiento.objects.create(
-                            producto=detalle.producto,
-                            almacen=articulo_almacen.almacen if articulo_almacen else None,
-                            cantidad=detalle.cantidad,
-                            tipo='salida',
-                            referencia=f"Venta Pedido {pedido.codigo}",
-                            usuario=pedido.cliente
-                        )
+                # Misma liquidación que el webhook: bloquea el pedido y es idempotente
+                pedido, _ = liquidar_pago(payment_intent, cliente=request.user)
                 
                 return Response({
                     'status': 'succeeded',
@@ -244,6 +232,8 @@ class VerificarEstadoPagoView(APIView):
                 {'error': f'Error de Stripe: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except EventoInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response(
                 {'error': f'Error inesperado: {str(e)}'},
@@ -254,6 +244,9 @@ class VerificarEstadoPagoView(APIView):
 class StripeWebhookView(APIView):
     """
     Escucha los webhooks de Stripe para actualizar el estado de los pagos y pedidos.
+    Solo verifica la firma y guarda el evento en la bandeja (EventoWebhook);
+    la liquidación la hace un worker de Celery, así Stripe recibe el 200 en
+    milisegundos y sus reintentos no duplican el procesamiento.
     
     Para desarrollo local, usa Stripe CLI:
     stripe listen --forward-to localhost:8000/api/ecommerce/pagos/webhooks/stripe/
@@ -261,99 +254,58 @@ class StripeWebhookView(APIView):
     Para producción, configura el webhook en: https://dashboard.stripe.com/webhooks
     """
     permission_classes = [permissions.AllowAny]  # Stripe no se autenticará
+    throttle_classes = []  # Stripe reintenta y no debe gastar el cupo de la tienda
 
-    @transaction.atomic
     def post(self, request):
         payload = request.body
         sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
-        endpoint_secret = settings.STRIPE_WEBHOOK_SECRET
         
         # Si no hay secret configurado, retornar error
-        if not endpoint_secret:
+        if not settings.STRIPE_WEBHOOK_SECRET:
             return Response(
                 {'error': 'STRIPE_WEBHOOK_SECRET no configurado'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
-        event = None
-
         try:
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, endpoint_secret
-            )
-        except ValueError as e:
+            event = gateway.construir_evento(payload, sig_header)
+        except ValueError:
             # Payload inválido
             return Response({'error': 'Payload inválido'}, status=status.HTTP_400_BAD_REQUEST)
-        except stripe.error.SignatureVerificationError as e:
+        except stripe.SignatureVerificationError:
             # Firma inválida
             return Response({'error': 'Firma inválida'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Manejar el evento `payment_intent.succeeded`
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            pedido_id = payment_intent['metadata'].get('pedido_id')
-            
-            if not pedido_id:
-                return Response({'error': 'No se encontró pedido_id en metadata'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            try:
-                pedido = Pedido.objects.get(id=pedido_id)
-                
-                # Solo actualizar si el pedido no está ya marcado como pagado
-                if not pedido.pagado:
-                    # 1. Actualizar o crear el registro de Pago
-                    Pago.objects.update_or_create(
-                        id_transaccion_proveedor=payment_intent['id'],
-                        defaults={
-                            'pedido': pedido,
-                            'monto': payment_intent['amount'] / 100.0,  # Stripe usa centavos
-                            'moneda': payment_intent['currency'].upper(),
-                            'estado': Pago.ESTADO_EXITOSO,
-                            'datos_respuesta': payment_intent,
-                        }
-                    )
-                    
-                    # 2. Actualizar el Pedido
-                    pedido.pagado = True
-                    pedido.estado = 'pagado'
-                    pedido.save()
+        # Guardar el evento ya verificado en la bandeja y responder de inmediato.
+        # El worker (pagos.tasks.procesar_eventos_webhook) hace la liquidación.
+        registrar_evento_webhook(event.to_dict(), tenant_schema_por_defecto=connection.schema_name)
+        return Response(status=status.HTTP_200_OK)
 
-                    # 3. Mover stock: de reservado a salida definitiva
-                    for detalle in pedido.detalles.all():
-                        articulo_almacen = ArticuloAlmacen.objects.filter(producto=detalle.producto).first()
-                        if articulo_almacen:
-                            # Reducir cantidad y reserva
-                            articulo_almacen.cantidad -= detalle.cantidad
-                            articulo_almacen.reservado -= detalle.cantidad
-                            articulo_almacen.save()
-                        
-                        # Crear movimiento de stock para auditoría
-                        StockMovimiento.objects.create(
-                            producto=detalle.producto,
-                            almacen=articulo_almacen.almacen if articulo_almacen else None,
-                            cantidad=detalle.cantidad,
-                            tipo='salida',
-                            referencia=f"Venta Pedido {pedido.codigo}",
-                            usuario=pedido.cliente
-                        )
 
-            except Pedido.DoesNotExist:
-                return Response({'error': 'Pedido no encontrado'}, status=status.HTTP_404_NOT_FOUND)
-        
-        elif event['type'] == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            pedido_id = payment_intent['metadata'].get('pedido_id')
-            
-            if pedido_id:
-                try:
-                    Pago.objects.update_or_create(
-                        id_transaccion_proveedor=payment_intent['id'],
-                        defaults={
-                            'estado': Pago.ESTADO_FALLIDO,
-                            'datos_respuesta': payment_intent,
-                        }
-                    )
-                except Exception:
-                    pass  # No es crítico si falla
-        
-        return Response(status=status.HTTP_200_OK)
\ No newline at end of file
+def registrar_evento_webhook(evento, tenant_schema_por_defecto=None):
+    """
+    Inserta un evento de Stripe en la bandeja (ON CONFLICT DO NOTHING por id)
+    y avisa al worker. El inquilino se toma de la metadata del PaymentIntent;
+    si no viene, del esquema por el que entró el webhook.
+    """
+    objeto = evento.get('data', {}).get('object', {}) or {}
+    tenant_schema = (objeto.get('metadata') or {}).get('tenant_schema') or tenant_schema_por_defecto or ''
+
+    EventoWebhook.objects.bulk_create([
+        EventoWebhook(
+            id_evento=evento['id'],
+            proveedor='stripe',
+            tipo=evento['type'],
+            tenant_schema=tenant_schema,
+            payload=evento,
+        )
+    ], ignore_conflicts=True)
+
+    def _encolar():
+        try:
+            procesar_eventos_webhook.delay()
+        except Exception:
+            # Sin broker disponible: la tarea periódica drenará la bandeja
+            logger.warning("No se pudo encolar procesar_eventos_webhook", exc_info=True)
+
+    transaction.on_commit(_encolar)
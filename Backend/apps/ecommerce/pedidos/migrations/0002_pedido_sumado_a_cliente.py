@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+def marcar_pagados(apps, schema_editor):
+    """Los pedidos ya pagados no se suman de nuevo: sus clientes los recalcula recalcular_estadisticas_clientes."""
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    Pedido.objects.using(schema_editor.connection.alias).filter(pagado=True).exclude(
+        estado='cancelado',
+    ).update(sumado_a_cliente=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='sumado_a_cliente',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(marcar_pagados, migrations.RunPython.noop),
+    ]
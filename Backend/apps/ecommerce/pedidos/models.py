@@ -50,12 +50,23 @@ class Pedido(models.Model):
     comentario = models.TextField(blank=True, null=True)
     enviado = models.BooleanField(default=False)
     pagado = models.BooleanField(default=False)
+    # Ya sumado a las estadísticas de su Cliente (apps.crm.clientes.estadisticas): evita contarlo dos veces
+    sumado_a_cliente = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['-fecha_creacion']
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
 
+    def save(self, *args, **kwargs):
+        # sumado_a_cliente solo lo escribe estadisticas con un UPDATE condicionado:
+        # guardar una instancia leída antes de que se marcara no debe desmarcarlo
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'sumado_a_cliente'
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.codigo} - {self.cliente or 'Anónimo'}"
 
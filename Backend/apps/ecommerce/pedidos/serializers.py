@@ -1,11 +1,12 @@
 # backend/apps/ecommerce/pedidos/serializers.py
 from rest_framework import serializers
-from django.db import transaction
 from .models import Pedido, DetallePedido
 from ..productos.models import Producto
 from django.conf import settings
 from django.contrib.auth import get_user_model
 
+from apps.tenants.shards import atomic_tenant
+
 User = get_user_model()
 
 class DetallePedidoSerializer(serializers.ModelSerializer):
@@ -54,7 +55,7 @@ class PedidoSerializer(serializers.ModelSerializer):
         import uuid
         return f"PED-{uuid.uuid4().hex[:8].upper()}"
 
-    @transaction.atomic
+    @atomic_tenant()
     def create(self, validated_data):
         detalles_data = validated_data.pop('detalles', [])
         # Si no viene codigo, generar
@@ -82,7 +83,7 @@ class PedidoSerializer(serializers.ModelSerializer):
         pedido.save()
         return pedido
 
-    @transaction.atomic
+    @atomic_tenant()
     def update(self, instance, validated_data):
         detalles_data = validated_data.pop('detalles', None)
         # actualizar campos simples
@@ -5,11 +5,10 @@ from rest_framework.response import Response
 from .models import Pedido, DetallePedido
 from .serializers import PedidoSerializer, DetallePedidoSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-import stripe
-from django.conf import settings
-
-# Configurar Stripe
-stripe.api_key = getattr(settings, 'STRIPE_SECRET_KEY', '')
+from django.db import connection
+from apps.core.throttling import grupo_limite
+from ..pagos.gateway import gateway
+from ..pagos.models import EventoPago, Pago
 
 class EsPropietarioOPermisoAdmin(permissions.BasePermission):
     """
@@ -52,6 +51,7 @@ class PedidoViewSet(viewsets.ModelViewSet):
         return Response({'status': 'pedido marcado como pagado'})
 
     @action(detail=True, methods=['post'], url_path='iniciar-pago')
+    @grupo_limite('checkout')
     def iniciar_pago(self, request, pk=None):
         """
         Crea un PaymentIntent de Stripe para el pedido.
@@ -61,7 +61,7 @@ class PedidoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Este pedido ya ha sido pagado.'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Verificar que Stripe esté configurado
-        if not stripe.api_key or stripe.api_key == '':
+        if not gateway.configurado:
             return Response({
                 'error': 'Stripe no está configurado correctamente. Por favor, agrega tu STRIPE_SECRET_KEY en el archivo .env'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -71,26 +71,29 @@ class PedidoViewSet(viewsets.ModelViewSet):
             monto_en_centavos = int(pedido.total * 100)
             
             # Crear PaymentIntent de Stripe
-            intent = stripe.PaymentIntent.create(
-                amount=monto_en_centavos,
-                currency='usd',
+            intent = gateway.crear_payment_intent(
+                monto_centavos=monto_en_centavos,
+                moneda='usd',
                 metadata={
                     'pedido_id': pedido.id,
                     'pedido_codigo': pedido.codigo,
                     'cliente_username': pedido.cliente.username if pedido.cliente else 'Anónimo',
                     'cliente_email': pedido.cliente.email if pedido.cliente else '',
+                    'tenant_schema': connection.schema_name,
                 },
-                description=f'Pedido {pedido.codigo}',
+                descripcion=f'Pedido {pedido.codigo}',
             )
             
-            # Opcional: Crear un registro de pago preliminar si tienes el modelo Pago
-            # from ..pagos.models import Pago
-            # Pago.objects.create(
-            #     pedido=pedido,
-            #     id_transaccion_proveedor=intent.id,
-            #     monto=pedido.total,
-            #     moneda='USD'
-            # )
+            # Pago pendiente: sin él, conciliar_pagos no liquida el pedido si se pierde el webhook
+            pago = Pago.objects.create(
+                pedido=pedido,
+                proveedor='stripe',
+                id_transaccion_proveedor=intent.id,
+                monto=pedido.total,
+                moneda='USD',
+                estado=Pago.ESTADO_PENDIENTE,
+            )
+            EventoPago.registrar(pago, 'payment_intent.created', intent)
             
             return Response({
                 'clientSecret': intent.client_secret,
@@ -1,7 +1,7 @@
 # apps/ecommerce/productos/serializers.py
 from rest_framework import serializers
 from .models import Producto, Categoria, Almacen, ArticuloAlmacen, ImagenProducto, StockMovimiento
-from django.db import transaction
+from apps.tenants.shards import atomic_tenant
 
 class CategoriaSerializer(serializers.ModelSerializer):
     class Meta:
@@ -103,7 +103,7 @@ class ProductoDetailSerializer(serializers.ModelSerializer):
         imagenes_payload = validated_data.pop("imagenes_payload", [])
         almacenes_stock = validated_data.pop("almacenes_stock", [])
 
-        with transaction.atomic():
+        with atomic_tenant():
             producto = Producto.objects.create(**validated_data)
             if categorias:
                 producto.categorias.set(categorias)
@@ -191,8 +191,7 @@ class StockMovimientoSerializer(serializers.ModelSerializer):
             validated_data["usuario"] = request.user
         movimiento = super().create(validated_data)
 
-        from django.db import transaction
-        with transaction.atomic():
+        with atomic_tenant():
             art, created = ArticuloAlmacen.objects.select_for_update().get_or_create(producto=movimiento.producto, almacen=movimiento.almacen, defaults={"cantidad": 0})
             art.cantidad = (art.cantidad or 0) + movimiento.cantidad
             if art.cantidad < 0:
@@ -7,12 +7,16 @@ from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from django.db import connection # <--- CORRECCIÓN 1: Importación completa
 
+from apps.core.consumo import medir_servicio
+from apps.core.throttling import limitar
+
 # Define tus URLs aquí o impórtalas de settings.py
 URL_SERVICIO_REPORTES = "http://127.0.0.1:8001/generar-reporte-ia"
 URL_SERVICIO_PREDICCION = "http://127.0.0.1:8002/predecir"
 
 @csrf_exempt
 @require_POST
+@limitar('predicciones')
 def llamar_servicio_prediccion(request):
     """
     Vista "puente" que llama al microservicio de predicción.
@@ -32,7 +36,8 @@ def llamar_servicio_prediccion(request):
 
         # 3. ¡LA LLAMADA! Usamos requests.post()
         # Le pasamos el JSON (payload) y un timeout
-        response = requests.post(URL_SERVICIO_PREDICCION, json=payload, timeout=10)
+        with medir_servicio():
+            response = requests.post(URL_SERVICIO_PREDICCION, json=payload, timeout=10)
 
         # 4. Verificamos si el microservicio dio un error
         response.raise_for_status() # Lanza un error si la respuesta es 4xx o 5xx
@@ -57,6 +62,7 @@ def llamar_servicio_prediccion(request):
 
 @csrf_exempt
 @require_POST
+@limitar('exportaciones')
 def llamar_servicio_reporte(request):
     """
     Vista "puente" que llama al microservicio de reportes
@@ -80,12 +86,16 @@ def llamar_servicio_reporte(request):
         payload = {
             'prompt': prompt,
             'format': formato,
-            'schema_name': schema_name  # <--- ¡CRUCIAL!
+            # El servicio (ReportRequest) espera tenant_schema; 'schema_name' lo ignoraba
+            'tenant_schema': schema_name,  # <--- ¡CRUCIAL!
+            # Base donde vive ese esquema: el servicio la resuelve con su TENANT_SHARDS_URLS
+            'tenant_shard': request.tenant.shard,
         }
 
         # 4. Llamar al Microservicio
         # Usamos stream=True para manejar archivos binarios (Excel/PDF) sin saturar memoria
-        response = requests.post(URL_SERVICIO_REPORTES, json=payload, stream=True, timeout=60)
+        with medir_servicio():
+            response = requests.post(URL_SERVICIO_REPORTES, json=payload, stream=True, timeout=60)
         
         # 5. Verificar errores del microservicio (4xx o 5xx)
         response.raise_for_status()
@@ -5,9 +5,12 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from django.conf import settings
 
+from apps.core.consumo import medir_servicio
+
 
 class PredictionView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'predicciones'
 
     def post(self, request):
         try:
@@ -19,15 +22,16 @@ class PredictionView(APIView):
             data = request.data.copy()
             data['tenant_schema'] = tenant_schema
             
-            response = requests.post(
-                f"{settings.PREDICTION_SERVICE_URL}/predecir",
-                json=data,
-                headers={
-                    'Authorization': request.META.get('HTTP_AUTHORIZATION'),
-                    'Content-Type': 'application/json'
-                },
-                timeout=30
-            )
+            with medir_servicio():
+                response = requests.post(
+                    f"{settings.PREDICTION_SERVICE_URL}/predecir",
+                    json=data,
+                    headers={
+                        'Authorization': request.META.get('HTTP_AUTHORIZATION'),
+                        'Content-Type': 'application/json'
+                    },
+                    timeout=30
+                )
             return Response(response.json(), status=response.status_code)
         except requests.exceptions.RequestException as e:
             return Response(
@@ -6,9 +6,12 @@ from rest_framework import status
 from django.http import HttpResponse
 from django.conf import settings
 
+from apps.core.consumo import medir_servicio
+
 
 class ReportView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'reportes'
 
     def post(self, request):
         try:
@@ -19,13 +22,16 @@ class ReportView(APIView):
             # Agregar tenant_schema al payload
             data = request.data.copy()
             data['tenant_schema'] = tenant_schema
+            # Base donde vive ese esquema: el servicio la resuelve con su TENANT_SHARDS_URLS
+            data['tenant_shard'] = request.tenant.shard
             
             # Forward request to reports microservice
             print(f"DEBUG: Requesting report from {settings.REPORTS_SERVICE_URL}/generar-reporte-ia")
-            response = requests.post(
-                f"{settings.REPORTS_SERVICE_URL}/generar-reporte-ia",
-                json=data
-            )
+            with medir_servicio():
+                response = requests.post(
+                    f"{settings.REPORTS_SERVICE_URL}/generar-reporte-ia",
+                    json=data
+                )
             
             print(f"DEBUG: Microservice response status: {response.status_code}")
             print(f"DEBUG: Microservice headers: {response.headers}")
@@ -0,0 +1,175 @@
+# apps/tenants/analitica.py
+"""
+Analítica de la plataforma: GMV, pedidos y usuarios de todos los inquilinos.
+
+Consultar cada esquema al abrir el dashboard no escala con miles de
+inquilinos. En su lugar, la tarea actualizar_metricas_plataforma guarda las
+cifras de cada inquilino en MetricaTenant (esquema público) y el dashboard
+solo agrega esa tabla.
+
+Para no recorrer todos los esquemas en cada pasada, la marca de agua de un
+esquema es la suma de filas insertadas, actualizadas y borradas en sus
+tablas de pedidos y usuarios según pg_stat_user_tables (una sola consulta
+por shard para todos sus esquemas). Solo se vuelven a calcular los esquemas cuya marca
+cambió, más los que llevan ANALITICA_MAX_EDAD_SEGUNDOS sin calcularse (los
+usuarios activos dependen de la fecha aunque nadie escriba). Los cálculos
+van en ANALITICA_HILOS hilos, cada uno con su conexión.
+
+La marca se lee antes de calcular: una escritura durante el cálculo, o que
+las estadísticas de PostgreSQL aún no reflejan, cambia la marca y el esquema
+se recalcula en la pasada siguiente.
+"""
+import logging
+import queue
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from apps.ecommerce.pedidos.models import Pedido
+from .models import Client, MetricaTenant
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = ['pedidos', 'gmv', 'usuarios', 'usuarios_activos', 'ultimo_pedido', 'marca', 'actualizado_en']
+
+
+def marcas_de_agua():
+    """{(shard, schema): marca} de todos los esquemas, a partir de pg_stat_user_tables."""
+    tablas = [Pedido._meta.db_table, get_user_model()._meta.db_table]
+    marcas = {}
+    for alias in settings.TENANT_SHARDS:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT schemaname, sum(n_tup_ins + n_tup_upd + n_tup_del)::bigint
+                FROM pg_stat_user_tables WHERE relname = ANY(%s) GROUP BY schemaname
+                """,
+                [tablas],
+            )
+            marcas.update(((alias, schema), marca) for schema, marca in cursor.fetchall())
+    return marcas
+
+
+def metricas_esquema(schema):
+    """Cifras de un inquilino (dos consultas dentro de su esquema)."""
+    User = get_user_model()
+    desde = timezone.now() - timedelta(days=settings.ANALITICA_DIAS_ACTIVO)
+    with schema_context(schema):
+        pedidos = Pedido.objects.exclude(estado=Pedido.ESTADO_CANCELADO).aggregate(
+            pedidos=Count('id'),
+            gmv=Sum('total', filter=Q(pagado=True)),
+            ultimo_pedido=Max('fecha_creacion'),
+        )
+        usuarios = User.objects.aggregate(
+            usuarios=Count('id'),
+            usuarios_activos=Count('id', filter=Q(is_active=True, last_login__gte=desde)),
+        )
+    return {**pedidos, 'gmv': pedidos['gmv'] or 0, **usuarios}
+
+
+def _calcular(pendientes, resultados, errores):
+    """Hilo de trabajo: calcula esquemas de la cola hasta vaciarla."""
+    try:
+        while True:
+            try:
+                tenant = pendientes.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                resultados.append((tenant, metricas_esquema(tenant.schema_name)))
+            except Exception:
+                logger.exception("No se pudieron calcular las métricas de %s", tenant.schema_name)
+                errores.append(tenant.schema_name)
+    finally:
+        connections.close_all()
+
+
+def actualizar_metricas(forzar=False, hilos=None):
+    """
+    Recalcula las métricas de los inquilinos que cambiaron (o todos con
+    `forzar`). Devuelve un resumen con cuántos se actualizaron.
+    """
+    marcas = marcas_de_agua()
+    ahora = timezone.now()
+    caducadas = ahora - timedelta(seconds=settings.ANALITICA_MAX_EDAD_SEGUNDOS)
+    guardadas = {m.tenant_id: m for m in MetricaTenant.objects.all()}
+    tenants = Client.objects.exclude(schema_name=get_public_schema_name()).filter(estado=Client.ESTADO_LISTO)
+
+    pendientes = queue.Queue()
+    for tenant in tenants:
+        metrica = guardadas.get(tenant.pk)
+        if (forzar or metrica is None or metrica.marca != marcas.get((tenant.shard, tenant.schema_name), 0)
+                or metrica.actualizado_en < caducadas):
+            pendientes.put(tenant)
+    total = pendientes.qsize()
+
+    resultados, errores = [], []
+    trabajadores = [
+        threading.Thread(target=_calcular, args=(pendientes, resultados, errores), daemon=True)
+        for _ in range(min(hilos or settings.ANALITICA_HILOS, total))
+    ]
+    for hilo in trabajadores:
+        hilo.start()
+    for hilo in trabajadores:
+        hilo.join()
+
+    nuevas, cambiadas = [], []
+    for tenant, cifras in resultados:
+        cifras.update(marca=marcas.get((tenant.shard, tenant.schema_name), 0), actualizado_en=ahora)
+        metrica = guardadas.get(tenant.pk)
+        if metrica is None:
+            nuevas.append(MetricaTenant(tenant=tenant, **cifras))
+        else:
+            for campo, valor in cifras.items():
+                setattr(metrica, campo, valor)
+            cambiadas.append(metrica)
+    MetricaTenant.objects.bulk_create(nuevas, batch_size=500)
+    MetricaTenant.objects.bulk_update(cambiadas, CAMPOS, batch_size=500)
+
+    return {
+        'actualizados': len(resultados),
+        'sin_cambios': len(tenants) - total,
+        'errores': errores,
+    }
+
+
+def resumen_plataforma(limite=20):
+    """Totales de la plataforma y los `limite` inquilinos con más GMV (solo lee MetricaTenant)."""
+    totales = MetricaTenant.objects.aggregate(
+        tenants=Count('id'),
+        pedidos=Sum('pedidos'),
+        gmv=Sum('gmv'),
+        usuarios=Sum('usuarios'),
+        usuarios_activos=Sum('usuarios_activos'),
+        actualizado_desde=Min('actualizado_en'),
+        actualizado_hasta=Max('actualizado_en'),
+    )
+    top = MetricaTenant.objects.select_related('tenant').order_by('-gmv')[:limite]
+    return {
+        'totales': {
+            **totales,
+            'pedidos': totales['pedidos'] or 0,
+            'gmv': totales['gmv'] or 0,
+            'usuarios': totales['usuarios'] or 0,
+            'usuarios_activos': totales['usuarios_activos'] or 0,
+        },
+        'tenants': [
+            {
+                'schema_name': m.tenant.schema_name,
+                'name': m.tenant.name,
+                'pedidos': m.pedidos,
+                'gmv': m.gmv,
+                'usuarios': m.usuarios,
+                'usuarios_activos': m.usuarios_activos,
+                'ultimo_pedido': m.ultimo_pedido,
+                'actualizado_en': m.actualizado_en,
+            }
+            for m in top
+        ],
+    }
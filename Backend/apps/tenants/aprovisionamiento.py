@@ -0,0 +1,206 @@
+# apps/tenants/aprovisionamiento.py
+"""
+Alta de inquilinos sin migrar dentro de la petición.
+
+Client.save() de django-tenants crea el esquema y aplica todas las
+migraciones de TENANT_APPS (decenas de segundos). Aquí el esquema sale de:
+1. Una reserva: esquemas `reserva_*` clonados de antemano por
+   reponer_reservas (tarea periódica). Se toman con ALTER SCHEMA ... RENAME,
+   que es instantáneo; si dos altas compiten por la misma, la segunda pasa
+   a la siguiente.
+2. Si no quedan reservas, una copia de la plantilla (TENANT_PLANTILLA_SCHEMA:
+   un esquema migrado, con los grupos de rol y sin usuarios) mediante
+   clone_schema de django-tenants.
+3. Si aún no hay plantilla, la tarea provisionar_tenant hace el alta clásica
+   en segundo plano y el frontend consulta Client.estado en
+   /api/tenants/status/<schema>/.
+
+Si la plantilla quedó atrás respecto a las migraciones del código, lo que
+falte se aplica tras renombrar (normalmente no hay nada pendiente).
+
+Cada shard (ver shards.py) tiene su propia plantilla y sus reservas; el alta
+va al shard que elige shards.elegir_shard().
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django_tenants.clone import CLONE_SCHEMA_FUNCTION
+from django_tenants.utils import schema_context, schema_exists, tenant_context
+
+from apps.users.roles import ROLES_ASIGNABLES
+from .models import Client, Domain
+from .shards import elegir_shard
+
+logger = logging.getLogger(__name__)
+
+
+def esquema_reservado(nombre):
+    """Nombres que no puede usar un inquilino (plantilla y reservas)."""
+    return nombre == settings.TENANT_PLANTILLA_SCHEMA or nombre.startswith(settings.TENANT_RESERVA_PREFIJO)
+
+
+def reservas_disponibles(alias=DEFAULT_DB_ALIAS):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT nspname FROM pg_namespace WHERE starts_with(nspname, %s) ORDER BY nspname",
+            [settings.TENANT_RESERVA_PREFIJO],
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def _migrar(schema, alias=DEFAULT_DB_ALIAS):
+    call_command(
+        'migrate_schemas', tenant=True, schema_name=schema, database=alias, interactive=False, verbosity=0,
+    )
+
+
+def migraciones_pendientes(schema, alias=DEFAULT_DB_ALIAS):
+    """Migraciones que le faltan al esquema, según su tabla django_migrations."""
+    with schema_context(schema, database=alias):
+        executor = MigrationExecutor(connections[alias])
+        return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def _migrar_pendientes(schema, alias=DEFAULT_DB_ALIAS):
+    """Aplica las migraciones que le falten al esquema (sin cargar migrate_schemas si no hay ninguna)."""
+    if migraciones_pendientes(schema, alias):
+        _migrar(schema, alias)
+
+
+def crear_esquema(schema, alias=DEFAULT_DB_ALIAS):
+    """Alta clásica: esquema vacío más todas las migraciones de TENANT_APPS."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+    _migrar(schema, alias)
+
+
+def descartar_esquema(schema, alias=DEFAULT_DB_ALIAS):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+
+
+def _clonar(origen, destino, alias):
+    """CloneSchema de django-tenants, pero en la conexión del shard (aquella usa siempre 'default')."""
+    conexion = connections[alias]
+    conexion.set_schema_to_public()
+    with conexion.cursor() as cursor:
+        cursor.execute(CLONE_SCHEMA_FUNCTION.format(db_user=conexion.settings_dict.get('USER') or 'postgres'))
+        cursor.execute("SELECT clone_schema(%s, %s, 'DATA')", [origen, destino])
+
+
+def preparar_plantilla(alias=DEFAULT_DB_ALIAS):
+    """Crea (si falta) y migra la plantilla del shard, con los grupos de rol. Idempotente."""
+    plantilla = settings.TENANT_PLANTILLA_SCHEMA
+    crear_esquema(plantilla, alias)
+    with schema_context(plantilla, database=alias):
+        for nombre in ROLES_ASIGNABLES:
+            Group.objects.using(alias).get_or_create(name=nombre)
+
+
+def reponer_reservas(cantidad=None, alias=DEFAULT_DB_ALIAS):
+    """Clona la plantilla hasta tener `cantidad` reservas (TENANT_RESERVAS) en el shard. Devuelve cuántas creó."""
+    cantidad = settings.TENANT_RESERVAS if cantidad is None else cantidad
+    plantilla = settings.TENANT_PLANTILLA_SCHEMA
+    if not schema_exists(plantilla, alias):
+        return 0
+    creadas = 0
+    for _ in range(cantidad - len(reservas_disponibles(alias))):
+        _clonar(plantilla, f"{settings.TENANT_RESERVA_PREFIJO}{uuid.uuid4().hex[:16]}", alias)
+        creadas += 1
+    return creadas
+
+
+def _tomar_reserva(schema, alias):
+    for reserva in reservas_disponibles(alias):
+        try:
+            with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+                cursor.execute(f'ALTER SCHEMA "{reserva}" RENAME TO "{schema}"')
+            return True
+        except DatabaseError:
+            # Otra alta la renombró antes
+            continue
+    return False
+
+
+def preparar_esquema(schema, alias=DEFAULT_DB_ALIAS):
+    """
+    Deja el esquema creado y migrado en el shard desde una reserva o la
+    plantilla. Devuelve False si no hay ninguna de las dos (toca el alta clásica).
+    """
+    if _tomar_reserva(schema, alias):
+        origen = 'reserva'
+    elif schema_exists(settings.TENANT_PLANTILLA_SCHEMA, alias):
+        # clone_schema hace commit: no puede ir dentro de un atomic
+        _clonar(settings.TENANT_PLANTILLA_SCHEMA, schema, alias)
+        origen = 'plantilla'
+    else:
+        return False
+    _migrar_pendientes(schema, alias)
+    logger.info("Esquema %s creado en %s desde %s", schema, alias, origen)
+    return True
+
+
+def completar_tenant(tenant, admin):
+    """
+    Crea el administrador en el esquema ya migrado y marca el inquilino como
+    listo. `admin`: email, password (ya hasheada), first_name, last_name.
+    """
+    User = get_user_model()
+    with tenant_context(tenant):
+        # Como create_user, pero con la contraseña ya hasheada
+        user = User(
+            email=User.objects.normalize_email(admin['email']),
+            username=admin['email'],  # Username igual a email
+            password=admin['password'],
+            first_name=admin['first_name'],
+            last_name=admin['last_name'],
+            is_active=True,
+            is_staff=True,
+            is_superuser=True,  # Admin total de su tienda
+        )
+        user.save()
+        admin_group, _ = Group.objects.get_or_create(name='administrador')
+        user.groups.add(admin_group)
+    tenant.estado = Client.ESTADO_LISTO
+    tenant.error = ''
+    tenant.save(update_fields=['estado', 'error'])
+
+
+def crear_tenant(schema, nombre, dominio, admin):
+    """
+    Registra el inquilino y su dominio y, si hay reserva o plantilla, deja la
+    tienda lista antes de volver. Si no, encola el alta en segundo plano y
+    devuelve el inquilino en estado pendiente.
+    """
+    with transaction.atomic():
+        tenant = Client(schema_name=schema, name=nombre, estado=Client.ESTADO_PENDIENTE, shard=elegir_shard())
+        tenant.auto_create_schema = False
+        tenant.save()
+        Domain.objects.create(domain=dominio, tenant=tenant, is_primary=True)
+
+    try:
+        listo = preparar_esquema(schema, tenant.shard)
+    except Exception:
+        logger.exception("No se pudo preparar el esquema %s; se hará en segundo plano", schema)
+        descartar_esquema(schema, tenant.shard)
+        listo = False
+
+    if listo:
+        completar_tenant(tenant, admin)
+        return tenant
+
+    from .tasks import provisionar_tenant
+    try:
+        provisionar_tenant.delay(tenant.id, admin)
+    except Exception:
+        # Sin broker: alta clásica en la propia petición
+        logger.warning("No se pudo encolar provisionar_tenant", exc_info=True)
+        provisionar_tenant(tenant.id, admin)
+        tenant.refresh_from_db()
+    return tenant
@@ -0,0 +1,54 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tenants.models import Domain
+from apps.tenants.respaldo import importar_tenant, registrar_tenant
+from apps.tenants.shards import elegir_shard
+
+
+class Command(BaseCommand):
+    help = (
+        'Restore an archive written by export_tenant into a new schema. The schema is created like a new '
+        'tenant (spare, template or migrations) and must end up on the same migrations as the archive; '
+        'tables are then loaded with COPY in parallel and row counts are checked. Pass --domain to also '
+        'register the tenant.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive')
+        parser.add_argument('schema_name', help='New schema name')
+        parser.add_argument('--shard', help='Target database alias (default: least loaded shard)')
+        parser.add_argument('--domain', help='Register the tenant with this primary domain')
+        parser.add_argument('--name', help="Tenant name (default: the exported tenant's name)")
+        parser.add_argument('--workers', type=int, help='Tables loaded at once (default RESPALDO_HILOS)')
+
+    def handle(self, *args, **options):
+        alias = options['shard'] or elegir_shard()
+        if alias not in settings.TENANT_SHARDS:
+            raise CommandError(f"Unknown shard {alias}. Shards: {', '.join(settings.TENANT_SHARDS)}")
+        if options['domain'] and Domain.objects.filter(domain=options['domain']).exists():
+            raise CommandError(f"Domain {options['domain']} is already in use.")
+
+        inicio = time.monotonic()
+        self.stdout.write(f"Importing into {alias}/{options['schema_name']}...")
+        try:
+            manifiesto = importar_tenant(
+                options['archive'], options['schema_name'], alias=alias, hilos=options['workers'],
+                al_terminar_tabla=lambda tabla, filas: self.stdout.write(f"  {tabla}: {filas} row(s)"),
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        filas = sum(t['filas'] for t in manifiesto['tablas'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {filas} row(s) from {manifiesto['schema']} in {time.monotonic() - inicio:.1f}s."
+        ))
+
+        if options['domain']:
+            origen = manifiesto['tenant'] or {}
+            tenant = registrar_tenant(
+                options['schema_name'], options['domain'], alias=alias,
+                nombre=options['name'] or origen.get('name'), plan=origen.get('plan'),
+            )
+            self.stdout.write(self.style.SUCCESS(f"Registered tenant {tenant.schema_name} at {options['domain']}."))
@@ -0,0 +1,65 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tenants.migracion import MigradorTenants
+from apps.tenants.models import MigracionEsquema
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply tenant migrations to every tenant schema using a process pool. The template schema runs '
+        'first, then spares and tenants, slowest first. Schemas with nothing pending are skipped. '
+        'Per-schema timings and lock waits are stored in MigracionEsquema. Pass --resume to retry '
+        'only the schemas that failed in a run. Run migrate_schemas --shared first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Parallel schemas (default MIGRACION_PROCESOS); each uses two DB connections')
+        parser.add_argument('--lock-timeout', default='30s', help='PostgreSQL lock_timeout per schema (e.g. 10s, 2min)')
+        parser.add_argument('--resume', metavar='RUN_ID', help="Run id to resume, or 'last'")
+        parser.add_argument('--schema', action='append', dest='schemas', help='Only these schemas (repeatable)')
+
+    def handle(self, *args, **options):
+        reanudar = options['resume']
+        if reanudar == 'last':
+            ultima = MigracionEsquema.objects.order_by('-creado_en').first()
+            if ultima is None:
+                raise CommandError('There is no previous run to resume.')
+            reanudar = ultima.ejecucion
+        elif reanudar:
+            try:
+                reanudar = uuid.UUID(reanudar)
+            except ValueError:
+                raise CommandError(f'Invalid run id: {reanudar}')
+
+        def al_terminar(resultado):
+            linea = (
+                f"{resultado['shard']}/{resultado['schema_name']}: {resultado['migraciones']} migration(s) in "
+                f"{resultado['segundos']:.2f}s (lock wait {resultado['espera_locks']:.1f}s)"
+            )
+            if resultado['estado'] == MigracionEsquema.ESTADO_OK:
+                self.stdout.write(linea)
+            else:
+                self.stderr.write(self.style.ERROR(f"{linea} FAILED\n{resultado['error']}"))
+
+        migrador = MigradorTenants(
+            procesos=options['workers'],
+            lock_timeout=options['lock_timeout'],
+            reanudar=reanudar,
+            esquemas=options['schemas'],
+            al_terminar=al_terminar,
+        )
+        self.stdout.write(f"Run {migrador.ejecucion}")
+        resultados = migrador.ejecutar()
+
+        fallidos = [f"{r['shard']}/{r['schema_name']}" for r in resultados if r['estado'] != MigracionEsquema.ESTADO_OK]
+        total = sum(r['segundos'] for r in resultados)
+        if fallidos:
+            raise CommandError(
+                f"{len(fallidos)} schema(s) failed: {', '.join(fallidos)}. "
+                f"Resume with --resume {migrador.ejecucion}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Migrated {len(resultados)} schema(s); {total:.1f}s of schema time"
+        ))
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tenants.models import Client
+from apps.tenants.shards import mover_tenant
+
+
+class Command(BaseCommand):
+    help = (
+        'Move a tenant schema to another shard database with pg_dump/pg_restore. The tenant answers 503 '
+        'while it is copied. The move is aborted if the schema receives writes during the copy or the row '
+        'counts differ. Prepare the target first with migrate_schemas --shared --database=<shard>.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema_name')
+        parser.add_argument('shard', help="Target shard alias")
+        parser.add_argument('--keep-source', action='store_true', help='Do not drop the schema from the old shard')
+
+    def handle(self, *args, **options):
+        try:
+            tenant = Client.objects.get(schema_name=options['schema_name'])
+        except Client.DoesNotExist:
+            raise CommandError(f"Tenant {options['schema_name']} does not exist.")
+        if options['shard'] not in settings.TENANT_SHARDS:
+            raise CommandError(f"Unknown shard {options['shard']}. Shards: {', '.join(settings.TENANT_SHARDS)}")
+
+        origen = tenant.shard
+        self.stdout.write(f"Moving {tenant.schema_name} from {origen} to {options['shard']}...")
+        try:
+            mover_tenant(tenant, options['shard'], conservar_origen=options['keep_source'])
+        except Exception as exc:
+            raise CommandError(f"Move failed; {tenant.schema_name} stays on {origen}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"{tenant.schema_name} is now on {tenant.shard}."))
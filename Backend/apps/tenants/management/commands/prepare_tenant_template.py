@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.tenants.aprovisionamiento import preparar_plantilla, reponer_reservas, reservas_disponibles
+
+
+class Command(BaseCommand):
+    help = (
+        'Create and migrate the template schema that new tenants are cloned from, and top up the pool '
+        'of spare schemas, on every shard. Run it after migrate_schemas on each deploy.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spares', type=int, default=None, help='Spare schemas to keep (default TENANT_RESERVAS)')
+        parser.add_argument('--shard', action='append', dest='shards', help='Only these shards (repeatable)')
+
+    def handle(self, *args, **options):
+        shards = options['shards'] or settings.TENANT_SHARDS
+        desconocidos = set(shards) - set(settings.TENANT_SHARDS)
+        if desconocidos:
+            raise CommandError(f"Unknown shard(s): {', '.join(sorted(desconocidos))}")
+        for alias in shards:
+            preparar_plantilla(alias)
+            self.stdout.write(f"[{alias}] Template schema '{settings.TENANT_PLANTILLA_SCHEMA}' is up to date.")
+            creadas = reponer_reservas(options['spares'], alias)
+            self.stdout.write(self.style.SUCCESS(
+                f"[{alias}] Created {creadas} spare schema(s); {len(reservas_disponibles(alias))} available."
+            ))
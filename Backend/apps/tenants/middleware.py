@@ -0,0 +1,26 @@
+# apps/tenants/middleware.py
+from django.http import JsonResponse
+from django_tenants.middleware.main import TenantMainMiddleware
+
+from .resolucion import resolucion
+
+
+class TenantCacheMiddleware(TenantMainMiddleware):
+    """
+    TenantMainMiddleware que resuelve el hostname desde el LRU del proceso
+    (apps.tenants.resolucion) en lugar de consultar Domain/Client en cada petición.
+    """
+
+    def get_tenant(self, domain_model, hostname):
+        return resolucion.obtener(hostname)
+
+    def process_request(self, request):
+        respuesta = super().process_request(request)
+        if respuesta is None and getattr(request, 'tenant', None) is not None \
+                and request.tenant.estado != request.tenant.ESTADO_LISTO:
+            # Alta todavía en curso (ver aprovisionamiento.py): el esquema puede no existir aún
+            return JsonResponse(
+                {'detail': 'La tienda se está preparando.', 'estado': request.tenant.estado},
+                status=503, headers={'Retry-After': '2'},
+            )
+        return respuesta
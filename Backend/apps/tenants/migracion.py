@@ -0,0 +1,164 @@
+# apps/tenants/migracion.py
+"""
+Migración de los esquemas de inquilinos en paralelo (manage.py migrate_tenants_parallel).
+
+migrate_schemas recorre los esquemas uno tras otro. Aquí:
+- Primero la plantilla (TENANT_PLANTILLA_SCHEMA), sola: si falla no tiene
+  sentido seguir con sus copias. Después las reservas y los inquilinos en un
+  pool de `procesos` procesos, que es el límite de concurrencia contra la BD
+  (cada proceso usa una conexión más otra para medir esperas de locks).
+- Los esquemas que más tardaron en ejecuciones anteriores salen primero,
+  para que uno lento no quede para el final.
+- Un esquema sin migraciones pendientes no llega a lanzar migrate_schemas.
+- Cada esquema corre con lock_timeout: si una tabla está bloqueada falla ese
+  esquema en vez de frenar a los demás, y se reintenta reanudando.
+- Cada resultado (tiempo, migraciones aplicadas, segundos esperando locks,
+  error) queda en MigracionEsquema; reanudar una ejecución salta los
+  esquemas que ya terminaron bien.
+- Con varios shards (ver shards.py) cada esquema se migra en su base; cada
+  shard tiene su plantilla, y todas van antes que el resto.
+"""
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max
+from django_tenants.utils import get_public_schema_name, schema_exists
+
+from .aprovisionamiento import migraciones_pendientes, reservas_disponibles
+from .models import Client, MigracionEsquema
+
+MUESTREO_LOCKS = 0.2  # segundos entre muestras de pg_stat_activity
+
+
+def _medir_locks(pid, fin, medicion, alias):
+    """Hilo aparte (con su propia conexión): suma el tiempo que `pid` pasa esperando un lock."""
+    try:
+        with connections[alias].cursor() as cursor:
+            while not fin.wait(MUESTREO_LOCKS):
+                cursor.execute("SELECT wait_event_type FROM pg_stat_activity WHERE pid = %s", [pid])
+                fila = cursor.fetchone()
+                if fila and fila[0] == 'Lock':
+                    medicion['espera_locks'] += MUESTREO_LOCKS
+    finally:
+        connections.close_all()
+
+
+def migrar_esquema(schema, lock_timeout='30s', alias=DEFAULT_DB_ALIAS):
+    """Se ejecuta en el pool. Devuelve el resultado del esquema como dict."""
+    resultado = {'shard': alias, 'schema_name': schema, 'migraciones': 0, 'espera_locks': 0.0, 'error': ''}
+    inicio = time.monotonic()
+    try:
+        pendientes = migraciones_pendientes(schema, alias)
+        resultado['migraciones'] = len(pendientes)
+        if pendientes:
+            with connections[alias].cursor() as cursor:
+                cursor.execute("SELECT set_config('lock_timeout', %s, false), pg_backend_pid()", [lock_timeout])
+                pid = cursor.fetchone()[1]
+            fin = threading.Event()
+            medidor = threading.Thread(target=_medir_locks, args=(pid, fin, resultado, alias), daemon=True)
+            medidor.start()
+            try:
+                call_command(
+                    'migrate_schemas', tenant=True, schema_name=schema, database=alias, interactive=False,
+                    verbosity=0, stdout=StringIO(),
+                )
+            finally:
+                fin.set()
+                medidor.join()
+        resultado['estado'] = MigracionEsquema.ESTADO_OK
+    except Exception:
+        resultado['estado'] = MigracionEsquema.ESTADO_ERROR
+        resultado['error'] = traceback.format_exc(limit=5)
+    finally:
+        connections.close_all()
+    resultado['segundos'] = round(time.monotonic() - inicio, 3)
+    return resultado
+
+
+class MigradorTenants:
+
+    def __init__(self, procesos=None, lock_timeout='30s', reanudar=None, esquemas=None, al_terminar=None):
+        self.procesos = procesos or settings.MIGRACION_PROCESOS
+        self.lock_timeout = lock_timeout
+        self.reanudar = reanudar
+        self.esquemas = esquemas
+        self.al_terminar = al_terminar or (lambda resultado: None)
+        self.ejecucion = reanudar or uuid.uuid4()
+
+    def _esquemas(self):
+        """
+        (plantillas, resto) como pares (shard, schema); el resto ordenado por la
+        mayor duración registrada, más lentos primero.
+        """
+        plantilla = settings.TENANT_PLANTILLA_SCHEMA
+        clientes = Client.objects.exclude(schema_name=get_public_schema_name())
+        if self.reanudar:
+            # Lo que en esa ejecución quedó pendiente o falló
+            pares = list(
+                MigracionEsquema.objects.filter(ejecucion=self.reanudar)
+                .exclude(estado=MigracionEsquema.ESTADO_OK).values_list('shard', 'schema_name')
+            )
+        elif self.esquemas:
+            shards = dict(clientes.filter(schema_name__in=self.esquemas).values_list('schema_name', 'shard'))
+            pares = [(shards.get(n, DEFAULT_DB_ALIAS), n) for n in self.esquemas]
+        else:
+            pares = list(clientes.filter(estado=Client.ESTADO_LISTO).values_list('shard', 'schema_name'))
+            for alias in settings.TENANT_SHARDS:
+                pares += [(alias, n) for n in reservas_disponibles(alias)]
+                if schema_exists(plantilla, alias):
+                    pares.append((alias, plantilla))
+
+        plantillas = [p for p in pares if p[1] == plantilla]
+        resto = [p for p in pares if p[1] != plantilla]
+
+        duraciones = {
+            (alias, nombre): maximo for alias, nombre, maximo in
+            MigracionEsquema.objects.filter(schema_name__in=[n for _, n in resto], segundos__isnull=False)
+            .values('shard', 'schema_name').annotate(maximo=Max('segundos'))
+            .values_list('shard', 'schema_name', 'maximo')
+        }
+        resto.sort(key=lambda p: duraciones.get(p, 0), reverse=True)
+        return plantillas, resto
+
+    def _registrar(self, resultado):
+        MigracionEsquema.objects.update_or_create(
+            ejecucion=self.ejecucion, shard=resultado['shard'], schema_name=resultado['schema_name'],
+            defaults={k: v for k, v in resultado.items() if k not in ('shard', 'schema_name')},
+        )
+        self.al_terminar(resultado)
+
+    def ejecutar(self):
+        """Migra todo y devuelve la lista de resultados (ver migrar_esquema)."""
+        plantillas, resto = self._esquemas()
+        MigracionEsquema.objects.bulk_create(
+            [MigracionEsquema(ejecucion=self.ejecucion, shard=alias, schema_name=n) for alias, n in plantillas + resto],
+            ignore_conflicts=True,
+        )
+        resultados = []
+
+        for alias, plantilla in plantillas:
+            resultado = migrar_esquema(plantilla, self.lock_timeout, alias)
+            self._registrar(resultado)
+            resultados.append(resultado)
+            if resultado['estado'] != MigracionEsquema.ESTADO_OK:
+                # Las copias de una plantilla rota fallarían igual
+                return resultados
+
+        if not resto:
+            return resultados
+        # Los procesos se crean con fork: no deben heredar conexiones abiertas
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=min(self.procesos, len(resto))) as pool:
+            futuros = [pool.submit(migrar_esquema, schema, self.lock_timeout, alias) for alias, schema in resto]
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                self._registrar(resultado)
+                resultados.append(resultado)
+        return resultados
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_client_estado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MigracionEsquema',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ejecucion', models.UUIDField(db_index=True)),
+                ('schema_name', models.CharField(max_length=63)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('ok', 'OK'), ('error', 'Error')], default='pendiente', max_length=10)),
+                ('migraciones', models.PositiveIntegerField(default=0)),
+                ('segundos', models.FloatField(blank=True, null=True)),
+                ('espera_locks', models.FloatField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'constraints': [models.UniqueConstraint(fields=('ejecucion', 'schema_name'), name='migracion_esquema_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_migracionesquema'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaTenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('gmv', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('usuarios', models.PositiveIntegerField(default=0)),
+                ('usuarios_activos', models.PositiveIntegerField(default=0)),
+                ('ultimo_pedido', models.DateTimeField(blank=True, null=True)),
+                ('marca', models.BigIntegerField(default=0)),
+                ('actualizado_en', models.DateTimeField()),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='metrica', to='tenants.client')),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0004_metricatenant'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='migracionesquema',
+            name='migracion_esquema_unica',
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='shard',
+            field=models.CharField(db_index=True, default='default', max_length=63),
+        ),
+        migrations.AddField(
+            model_name='migracionesquema',
+            name='shard',
+            field=models.CharField(default='default', max_length=63),
+        ),
+        migrations.AddConstraint(
+            model_name='migracionesquema',
+            constraint=models.UniqueConstraint(fields=('ejecucion', 'shard', 'schema_name'), name='migracion_esquema_unica'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0005_client_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='plan',
+            field=models.CharField(choices=[('basico', 'Básico'), ('profesional', 'Profesional'), ('empresarial', 'Empresarial')], default='basico', max_length=20),
+        ),
+    ]
@@ -7,9 +7,33 @@ class Client(TenantMixin):
     Representa al Ecommerce (El Inquilino).
     Cada cliente tendrá su propio ESQUEMA en la BD.
     """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_LISTO = 'listo'
+    ESTADO_ERROR = 'error'
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_LISTO, 'Listo'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+    PLAN_BASICO = 'basico'
+    PLAN_PROFESIONAL = 'profesional'
+    PLAN_EMPRESARIAL = 'empresarial'
+    PLANES = [
+        (PLAN_BASICO, 'Básico'),
+        (PLAN_PROFESIONAL, 'Profesional'),
+        (PLAN_EMPRESARIAL, 'Empresarial'),
+    ]
+
     name = models.CharField(max_length=100)
     created_on = models.DateField(auto_now_add=True)
-    # Aquí puedes agregar campos extra como 'plan_de_pago', 'logo', etc.
+    # Aprovisionamiento (ver aprovisionamiento.py): el esquema existe y está migrado cuando es 'listo'
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=ESTADO_LISTO)
+    error = models.TextField(blank=True, default='')
+    # Alias de DATABASES donde vive el esquema (ver shards.py)
+    shard = models.CharField(max_length=63, default='default', db_index=True)
+    # Límites de peticiones por inquilino (THROTTLE_PLANES, ver apps.core.throttling)
+    plan = models.CharField(max_length=20, choices=PLANES, default=PLAN_BASICO)
+    # Aquí puedes agregar campos extra como 'logo', etc.
     # auto_create_schema = True (Por defecto es True)
 
     def __str__(self):
@@ -20,4 +44,57 @@ class Domain(DomainMixin):
     Representa el dominio web asociado al cliente. Ej: pepita.mitienda.com
     """
     def __str__(self):
-        return self.domain
\ No newline at end of file
+        return self.domain
+
+
+class MigracionEsquema(models.Model):
+    """
+    Resultado de migrar un esquema en una ejecución de migrate_tenants_parallel
+    (tiempos por esquema y reanudación tras fallos). Vive en el esquema público.
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_OK = 'ok'
+    ESTADO_ERROR = 'error'
+    ESTADOS = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_OK, 'OK'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    ejecucion = models.UUIDField(db_index=True)
+    shard = models.CharField(max_length=63, default='default')
+    schema_name = models.CharField(max_length=63)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=ESTADO_PENDIENTE)
+    migraciones = models.PositiveIntegerField(default=0)  # aplicadas en este esquema
+    segundos = models.FloatField(null=True, blank=True)
+    espera_locks = models.FloatField(default=0)  # segundos bloqueado esperando locks
+    error = models.TextField(blank=True, default='')
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-creado_en']
+        constraints = [
+            models.UniqueConstraint(fields=['ejecucion', 'shard', 'schema_name'], name='migracion_esquema_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.shard}/{self.schema_name} ({self.estado})"
+
+
+class MetricaTenant(models.Model):
+    """
+    Cifras de un inquilino para la analítica de la plataforma (ver analitica.py).
+    `marca` es la marca de agua del esquema al calcularlas: mientras no cambie,
+    no hace falta volver a consultar el esquema.
+    """
+    tenant = models.OneToOneField(Client, on_delete=models.CASCADE, related_name='metrica')
+    pedidos = models.PositiveIntegerField(default=0)  # sin cancelados
+    gmv = models.DecimalField(max_digits=16, decimal_places=2, default=0)  # total de pedidos pagados
+    usuarios = models.PositiveIntegerField(default=0)
+    usuarios_activos = models.PositiveIntegerField(default=0)  # con login en ANALITICA_DIAS_ACTIVO días
+    ultimo_pedido = models.DateTimeField(null=True, blank=True)
+    marca = models.BigIntegerField(default=0)
+    actualizado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.tenant_id}: {self.pedidos} pedidos"
@@ -0,0 +1,114 @@
+# apps/tenants/resolucion.py
+"""
+Caché de resolución hostname -> inquilino para TenantCacheMiddleware.
+
+TenantMainMiddleware consulta Domain + Client en el esquema público en cada
+petición. Aquí cada proceso guarda un LRU en memoria (TENANT_CACHE_MAX
+hostnames, incluidos los que no existen) y lo vacía cuando cambia la versión
+global `tenants:version` de la caché compartida. signals.py cambia la versión
+al guardar o borrar un Domain o un Client.
+
+Todo va en la caché 'compartida' (sin prefijo de inquilino): la versión es
+global y las claves de info ya llevan el esquema.
+
+La versión se consulta como mucho cada TENANT_CACHE_VERSION_SEGUNDOS, así que
+otro proceso puede tardar hasta ese intervalo en ver un cambio; el proceso
+que hizo el cambio lo ve enseguida.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django_tenants.utils import get_tenant_domain_model
+
+from .serializers import TenantPublicSerializer
+
+CACHE_VERSION = 'tenants:version'
+CACHE_INFO = 'tenants:info:'
+
+NO_EXISTE = object()
+
+
+def version_actual():
+    cache = caches['compartida']
+    version = cache.get(CACHE_VERSION)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add: si otro proceso la creó a la vez, se queda la suya
+        if not cache.add(CACHE_VERSION, version, None):
+            version = cache.get(CACHE_VERSION, version)
+    return version
+
+
+class ResolucionTenants:
+
+    def __init__(self, maximo=None):
+        self.maximo = maximo
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._proxima_revision = 0.0
+
+    def _revisar_version(self):
+        ahora = time.monotonic()
+        if ahora < self._proxima_revision:
+            return
+        version = version_actual()
+        with self._lock:
+            if version != self._version:
+                self._entradas.clear()
+                self._version = version
+            self._proxima_revision = ahora + settings.TENANT_CACHE_VERSION_SEGUNDOS
+
+    def obtener(self, hostname):
+        """
+        Inquilino del hostname (una copia por petición, el middleware le asigna
+        domain_url). Lanza Domain.DoesNotExist como TenantMainMiddleware.get_tenant.
+        """
+        domain_model = get_tenant_domain_model()
+        self._revisar_version()
+        with self._lock:
+            tenant = self._entradas.get(hostname)
+            if tenant is not None:
+                self._entradas.move_to_end(hostname)
+        if tenant is None:
+            try:
+                tenant = domain_model.objects.select_related('tenant').get(domain=hostname).tenant
+            except domain_model.DoesNotExist:
+                tenant = NO_EXISTE
+            with self._lock:
+                self._entradas[hostname] = tenant
+                while len(self._entradas) > (self.maximo or settings.TENANT_CACHE_MAX):
+                    self._entradas.popitem(last=False)
+        if tenant is NO_EXISTE:
+            raise domain_model.DoesNotExist(f'No tenant for hostname "{hostname}"')
+        return copy.copy(tenant)
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._proxima_revision = 0.0
+
+
+resolucion = ResolucionTenants()
+
+
+def invalidar_tenants():
+    """Nueva versión global: todos los procesos descartan su LRU y la info pública cacheada."""
+    caches['compartida'].set(CACHE_VERSION, uuid.uuid4().hex, None)
+    resolucion.vaciar()
+
+
+def info_publica(tenant):
+    """
+    Datos de TenantInfoView del inquilino, cacheados por versión (un cambio en
+    Domain/Client los invalida sin borrarlos uno a uno).
+    """
+    clave = f"{CACHE_INFO}{tenant.schema_name}:{version_actual()}"
+    return caches['compartida'].obtener_o_calcular(
+        clave, lambda: dict(TenantPublicSerializer(tenant).data), settings.TENANT_INFO_CACHE_SEGUNDOS,
+    )
@@ -0,0 +1,303 @@
+# apps/tenants/respaldo.py
+"""
+Respaldo y restauración de un solo inquilino (manage.py export_tenant / import_tenant).
+
+pg_dump de la base entera tarda con miles de esquemas, y pg_restore de un
+esquema a otro nombre no es posible. Aquí solo viajan los datos:
+
+Exportar
+- Un archivo .tar (portable, sin compresión) con `manifiesto.json` (esquema,
+  nombre y plan del inquilino, migraciones aplicadas, tablas con sus
+  columnas y filas) y un `datos/<tabla>.csv.gz` por tabla.
+- Cada tabla se copia con COPY ... TO STDOUT (CSV) directamente a un gzip,
+  en RESPALDO_HILOS hilos con su propia conexión. Todos importan el mismo
+  snapshot (pg_export_snapshot) en REPEATABLE READ, así el archivo es una
+  foto coherente aunque la tienda siga recibiendo pedidos.
+- Las tablas grandes salen primero; la memoria no depende del tamaño: los
+  datos pasan de la conexión al gzip en bloques.
+
+Importar
+- El esquema nuevo se crea como en un alta (reserva, plantilla o
+  migraciones: ver aprovisionamiento.py) y sus migraciones deben coincidir
+  con las del manifiesto: la estructura la ponen las migraciones del
+  código, el archivo solo trae filas.
+- Se vacían las tablas (la plantilla trae los grupos de rol), se quitan
+  las claves foráneas del esquema, se cargan las tablas en paralelo con
+  COPY ... FROM STDIN leyendo cada gzip directamente del .tar, y después se
+  vuelven a crear las claves (PostgreSQL las valida), se ajustan las
+  secuencias y se comparan las filas con el manifiesto.
+- Si algo falla se borra el esquema a medio cargar.
+"""
+import gzip
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from django_tenants.postgresql_backend.base import is_valid_schema_name
+from django_tenants.utils import schema_exists
+
+from .aprovisionamiento import crear_esquema, descartar_esquema, esquema_reservado, preparar_esquema
+from .models import Client, Domain
+
+FORMATO = 1
+MANIFIESTO = 'manifiesto.json'
+MIGRACIONES = 'django_migrations'
+BLOQUE = 1 << 20  # bytes por lectura al cargar con COPY FROM STDIN
+
+
+def _conexion(alias):
+    """Conexión psycopg2 aparte de las de Django (sin search_path de inquilino: todo va con el esquema delante)."""
+    conexion = connections[alias]
+    cruda = conexion.get_new_connection(conexion.get_connection_params())
+    with cruda.cursor() as cursor:
+        cursor.execute("SET TIME ZONE 'UTC'")
+    cruda.commit()
+    return cruda
+
+
+def _q(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def _tablas(cursor, schema):
+    """[(tabla, [columnas])] del esquema, las más grandes primero (sin columnas generadas)."""
+    cursor.execute(
+        """
+        SELECT c.relname, array_agg(a.attname ORDER BY a.attnum)
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped AND a.attgenerated = ''
+        WHERE n.nspname = %s AND c.relkind = 'r'
+        GROUP BY c.relname, c.oid
+        ORDER BY pg_total_relation_size(c.oid) DESC, c.relname
+        """,
+        [schema],
+    )
+    return [(tabla, list(columnas)) for tabla, columnas in cursor.fetchall()]
+
+
+def _migraciones(cursor, schema):
+    cursor.execute(f"SELECT app, name FROM {_q(schema)}.{MIGRACIONES} ORDER BY app, name")
+    return [list(fila) for fila in cursor.fetchall()]
+
+
+def _de_tenant(migraciones):
+    """Solo las de TENANT_APPS: las de apps compartidas no cambian tablas del esquema."""
+    etiquetas = {config.label for config in apps.get_app_configs() if config.name in settings.TENANT_APPS}
+    return [m for m in migraciones if m[0] in etiquetas]
+
+
+# --- Exportar ---------------------------------------------------------------
+
+def _exportar_tabla(alias, snapshot, schema, tabla, columnas, ruta):
+    """Hilo de trabajo: COPY de una tabla al gzip `ruta` dentro del snapshot. Devuelve las filas copiadas."""
+    conexion = _conexion(alias)
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cursor.execute("SET TRANSACTION SNAPSHOT %s", [snapshot])
+            with gzip.open(ruta, 'wb', compresslevel=settings.RESPALDO_COMPRESION) as destino:
+                cursor.copy_expert(
+                    f"COPY {_q(schema)}.{_q(tabla)} ({', '.join(map(_q, columnas))}) TO STDOUT WITH (FORMAT csv)",
+                    destino,
+                )
+            return cursor.rowcount
+    finally:
+        conexion.close()
+
+
+def exportar_tenant(schema, ruta, alias=None, hilos=None, al_terminar_tabla=None):
+    """
+    Escribe el archivo de respaldo de `schema` en `ruta`. El shard sale de
+    Client si existe. Devuelve el manifiesto.
+    """
+    tenant = Client.objects.filter(schema_name=schema).first()
+    alias = alias or (tenant.shard if tenant else DEFAULT_DB_ALIAS)
+    if not schema_exists(schema, alias):
+        raise ValueError(f"El esquema {schema} no existe en {alias}")
+    al_terminar_tabla = al_terminar_tabla or (lambda tabla, filas: None)
+
+    coordinadora = _conexion(alias)
+    temporal = tempfile.mkdtemp(prefix=f'respaldo_{schema}_')
+    try:
+        with coordinadora.cursor() as cursor:
+            # El snapshot vale mientras esta transacción siga abierta
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            cursor.execute("SELECT pg_export_snapshot()")
+            snapshot = cursor.fetchone()[0]
+            tablas = _tablas(cursor, schema)
+            migraciones = _migraciones(cursor, schema)
+
+        with ThreadPoolExecutor(max_workers=hilos or settings.RESPALDO_HILOS) as pool:
+            futuros = {
+                tabla: pool.submit(
+                    _exportar_tabla, alias, snapshot, schema, tabla, columnas, os.path.join(temporal, f"{tabla}.csv.gz"),
+                )
+                for tabla, columnas in tablas
+            }
+            filas = {}
+            for tabla, futuro in futuros.items():
+                filas[tabla] = futuro.result()
+                al_terminar_tabla(tabla, filas[tabla])
+        coordinadora.rollback()
+
+        manifiesto = {
+            'formato': FORMATO,
+            'schema': schema,
+            'creado_en': timezone.now().isoformat(),
+            'tenant': {'name': tenant.name, 'plan': tenant.plan} if tenant else None,
+            'migraciones': migraciones,
+            'tablas': [
+                {'nombre': tabla, 'columnas': columnas, 'filas': filas[tabla], 'archivo': f"datos/{tabla}.csv.gz"}
+                for tabla, columnas in tablas
+            ],
+        }
+        with open(os.path.join(temporal, MANIFIESTO), 'w', encoding='utf-8') as f:
+            json.dump(manifiesto, f, indent=1)
+        with tarfile.open(ruta, 'w') as tar:
+            tar.add(os.path.join(temporal, MANIFIESTO), arcname=MANIFIESTO)
+            for tabla, _ in tablas:
+                tar.add(os.path.join(temporal, f"{tabla}.csv.gz"), arcname=f"datos/{tabla}.csv.gz")
+        return manifiesto
+    finally:
+        coordinadora.close()
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+# --- Importar ---------------------------------------------------------------
+
+def leer_manifiesto(ruta):
+    with tarfile.open(ruta) as tar:
+        manifiesto = json.load(tar.extractfile(MANIFIESTO))
+    if manifiesto.get('formato') != FORMATO:
+        raise ValueError(f"Formato de respaldo no soportado: {manifiesto.get('formato')}")
+    return manifiesto
+
+
+def _importar_tabla(alias, ruta, schema, tabla):
+    """Hilo de trabajo: COPY FROM STDIN de una tabla leyendo su gzip del .tar. Devuelve las filas cargadas."""
+    conexion = _conexion(alias)
+    try:
+        with tarfile.open(ruta) as tar, conexion.cursor() as cursor:
+            origen = gzip.GzipFile(fileobj=tar.extractfile(tabla['archivo']))
+            cursor.copy_expert(
+                f"COPY {_q(schema)}.{_q(tabla['nombre'])} ({', '.join(map(_q, tabla['columnas']))}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                origen,
+                size=BLOQUE,
+            )
+            filas = cursor.rowcount
+        conexion.commit()
+        return filas
+    finally:
+        conexion.close()
+
+
+def _claves_foraneas(cursor, schema):
+    cursor.execute(
+        """
+        SELECT c.relname, con.conname, pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_class c ON c.oid = con.conrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = %s AND con.contype = 'f'
+        """,
+        [schema],
+    )
+    return cursor.fetchall()
+
+
+def _ajustar_secuencias(cursor, schema, tablas):
+    for tabla in tablas:
+        for columna in tabla['columnas']:
+            cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [f"{_q(schema)}.{_q(tabla['nombre'])}", columna])
+            secuencia = cursor.fetchone()[0]
+            if secuencia:
+                cursor.execute(
+                    f"SELECT setval(%s, coalesce(max({_q(columna)}), 0) + 1, false) "
+                    f"FROM {_q(schema)}.{_q(tabla['nombre'])}",
+                    [secuencia],
+                )
+
+
+def importar_tenant(ruta, schema, alias=DEFAULT_DB_ALIAS, hilos=None, al_terminar_tabla=None):
+    """
+    Crea `schema` en el shard `alias` con los datos del archivo. No registra
+    el inquilino (ver registrar_tenant). Devuelve el manifiesto.
+    """
+    manifiesto = leer_manifiesto(ruta)
+    if not is_valid_schema_name(schema) or esquema_reservado(schema):
+        raise ValueError(f"Nombre de esquema inválido: {schema}")
+    if schema_exists(schema, alias):
+        raise ValueError(f"El esquema {schema} ya existe en {alias}")
+    al_terminar_tabla = al_terminar_tabla or (lambda tabla, filas: None)
+
+    # Estructura como en un alta: reserva, plantilla o migraciones
+    if not preparar_esquema(schema, alias):
+        crear_esquema(schema, alias)
+
+    conexion = _conexion(alias)
+    try:
+        with conexion.cursor() as cursor:
+            if _de_tenant(_migraciones(cursor, schema)) != _de_tenant(manifiesto['migraciones']):
+                raise ValueError(
+                    "Las migraciones del respaldo no coinciden con las de este código: "
+                    "migre el origen o este entorno a la misma versión"
+                )
+            existentes = dict(_tablas(cursor, schema))
+            tablas = [t for t in manifiesto['tablas'] if t['nombre'] != MIGRACIONES]
+            for tabla in tablas:
+                if existentes.get(tabla['nombre']) != tabla['columnas']:
+                    raise ValueError(f"La tabla {tabla['nombre']} no tiene las mismas columnas que en el respaldo")
+
+            claves = _claves_foraneas(cursor, schema)
+            for tabla, nombre, _ in claves:
+                cursor.execute(f"ALTER TABLE {_q(schema)}.{_q(tabla)} DROP CONSTRAINT {_q(nombre)}")
+            if tablas:
+                cursor.execute("TRUNCATE " + ', '.join(f"{_q(schema)}.{_q(t['nombre'])}" for t in tablas))
+        conexion.commit()
+
+        with ThreadPoolExecutor(max_workers=hilos or settings.RESPALDO_HILOS) as pool:
+            futuros = {t['nombre']: pool.submit(_importar_tabla, alias, ruta, schema, t) for t in tablas}
+            for tabla in tablas:
+                filas = futuros[tabla['nombre']].result()
+                if filas != tabla['filas']:
+                    raise ValueError(f"{tabla['nombre']}: {filas} filas cargadas, el respaldo tiene {tabla['filas']}")
+                al_terminar_tabla(tabla['nombre'], filas)
+
+        with conexion.cursor() as cursor:
+            for tabla, nombre, definicion in claves:
+                cursor.execute(f"ALTER TABLE {_q(schema)}.{_q(tabla)} ADD CONSTRAINT {_q(nombre)} {definicion}")
+            _ajustar_secuencias(cursor, schema, tablas)
+        conexion.commit()
+        conexion.autocommit = True
+        with conexion.cursor() as cursor:
+            for tabla in tablas:
+                cursor.execute(f"ANALYZE {_q(schema)}.{_q(tabla['nombre'])}")
+    except BaseException:
+        conexion.rollback()
+        descartar_esquema(schema, alias)
+        raise
+    finally:
+        conexion.close()
+    return manifiesto
+
+
+def registrar_tenant(schema, dominio, alias=DEFAULT_DB_ALIAS, nombre=None, plan=None):
+    """Da de alta el inquilino de un esquema ya importado (listo, sin crear ni migrar nada)."""
+    with transaction.atomic():
+        tenant = Client(
+            schema_name=schema, name=nombre or schema, shard=alias, plan=plan or Client.PLAN_BASICO,
+            estado=Client.ESTADO_LISTO,
+        )
+        tenant.auto_create_schema = False
+        tenant.save()
+        Domain.objects.create(domain=dominio, tenant=tenant, is_primary=True)
+    return tenant
@@ -1,9 +1,7 @@
 from rest_framework import serializers
-from django.db import transaction
+from django.contrib.auth.hashers import make_password
+from .aprovisionamiento import crear_tenant, esquema_reservado
 from .models import Client, Domain
-from django.contrib.auth import get_user_model
-
-User = get_user_model()
 
 class TenantRegisterSerializer(serializers.Serializer):
     # Datos de la tienda
@@ -17,62 +15,37 @@ class TenantRegisterSerializer(serializers.Serializer):
     last_name = serializers.CharField(max_length=150)
 
     def validate_subdominio(self, value):
-        # Evitar subdominios reservados
+        value = value.lower()
+        # Evitar subdominios reservados (y los esquemas de plantilla/reserva del aprovisionamiento)
         reservados = ['www', 'api', 'admin', 'public']
-        if value in reservados:
+        if value in reservados or esquema_reservado(value):
             raise serializers.ValidationError("Este subdominio no está disponible.")
         
         # Verificar si ya existe el esquema o dominio
         if Client.objects.filter(schema_name=value).exists():
             raise serializers.ValidationError("Este nombre de tienda ya está registrado.")
-        return value.lower()
+        return value
 
     def create(self, validated_data):
         schema_name = validated_data['subdominio']
-        tienda_name = validated_data['tienda_nombre']
-        
-        with transaction.atomic():
-            # 1. Crear el Cliente (Tenant)
-            # Esto dispara la creación del ESQUEMA en Postgres
-            tenant = Client.objects.create(
-                schema_name=schema_name,
-                name=tienda_name
-            )
-
-            # 2. Crear el Dominio asociado
-            # IMPORTANTE: Ajustar según tu entorno (localhost o producción)
-            domain_url = f"{schema_name}.localhost" # Para desarrollo
-            # domain_url = f"{schema_name}.tudominio.com" # Para producción
-            
-            Domain.objects.create(
-                domain=domain_url,
-                tenant=tenant,
-                is_primary=True
-            )
-
-            # 3. Crear el Usuario Admin DENTRO del nuevo esquema
-            # Usamos tenant_context para cambiar temporalmente a la nueva BD
-            from django_tenants.utils import tenant_context
-            from django.contrib.auth.models import Group
 
-            with tenant_context(tenant):
-                # Estamos ahora en el esquema 'pepita'
-                user = User.objects.create_user(
-                    email=validated_data['email'],
-                    username=validated_data['email'], # Username igual a email
-                    password=validated_data['password'],
-                    first_name=validated_data['first_name'],
-                    last_name=validated_data['last_name'],
-                    is_active=True,
-                    is_staff=True,
-                    is_superuser=True # Admin total de su tienda
-                )
-                
-                # Asignar rol 'administrador' si usas grupos
-                admin_group, _ = Group.objects.get_or_create(name='administrador')
-                user.groups.add(admin_group)
-                
-        return tenant
+        # IMPORTANTE: Ajustar según tu entorno (localhost o producción)
+        domain_url = f"{schema_name}.localhost" # Para desarrollo
+        # domain_url = f"{schema_name}.tudominio.com" # Para producción
+
+        # El esquema sale de una reserva o de la plantilla (ver aprovisionamiento.py);
+        # la contraseña viaja ya hasheada por si el alta sigue en segundo plano
+        return crear_tenant(
+            schema_name,
+            validated_data['tienda_nombre'],
+            domain_url,
+            {
+                'email': validated_data['email'],
+                'password': make_password(validated_data['password']),
+                'first_name': validated_data['first_name'],
+                'last_name': validated_data['last_name'],
+            },
+        )
 
 class TenantPublicSerializer(serializers.ModelSerializer):
     domain_url = serializers.SerializerMethodField()
@@ -0,0 +1,278 @@
+# apps/tenants/shards.py
+"""
+Reparto de los esquemas de inquilinos entre varias bases de PostgreSQL.
+
+Cada alias de DATABASES es un shard (TENANT_SHARDS). 'default' guarda el
+esquema público (Client, Domain y el resto de SHARED_APPS) y además
+inquilinos; Client.shard dice en qué base está el esquema de cada uno.
+
+- ShardRouter manda las consultas de los modelos de TENANT_APPS a la base
+  del inquilino activo en `connection` (el que fijan el middleware,
+  tenant_context o schema_context), y fija el mismo esquema en la conexión
+  de ese shard. Los modelos del esquema público van siempre a 'default'.
+  Para un schema_context sin Client (p. ej. la plantilla), el shard sale
+  de un mapa schema -> shard por proceso, que se vacía con la versión de
+  apps.tenants.resolucion.
+- transaction.atomic() sin `using` abre la transacción en 'default': el
+  código de inquilino usa atomic_tenant(), que la abre en su shard.
+- elegir_shard() coloca las altas nuevas en el shard con menos inquilinos.
+- mover_tenant() (manage.py move_tenant_shard) copia un esquema a otro shard
+  con pg_dump/pg_restore mientras el inquilino responde 503.
+
+Un shard nuevo se prepara con `migrate_schemas --shared --database=<alias>`
+(esquema public con sus extensiones) y `prepare_tenant_template` lo llena de
+reservas.
+"""
+import logging
+import os
+import subprocess
+import threading
+import time
+from contextlib import ContextDecorator
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count
+from django_tenants.routers import TenantSyncRouter
+from django_tenants.utils import get_public_schema_name, schema_exists
+
+logger = logging.getLogger(__name__)
+
+
+class MapaShards:
+    """schema -> alias de los esquemas con Client, revalidado como el LRU de resolucion."""
+
+    def __init__(self):
+        self._shards = {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._proxima_revision = 0.0
+
+    def _revisar_version(self):
+        from .resolucion import version_actual
+
+        ahora = time.monotonic()
+        if ahora < self._proxima_revision:
+            return
+        version = version_actual()
+        with self._lock:
+            if version != self._version:
+                self._shards.clear()
+                self._version = version
+            self._proxima_revision = ahora + settings.TENANT_CACHE_VERSION_SEGUNDOS
+
+    def obtener(self, schema):
+        from .models import Client
+
+        self._revisar_version()
+        alias = self._shards.get(schema)
+        if alias is None:
+            # Esquemas sin Client (plantilla, reservas) quedan en 'default'
+            alias = (
+                Client.objects.using(DEFAULT_DB_ALIAS).filter(schema_name=schema)
+                .values_list('shard', flat=True).first()
+            ) or DEFAULT_DB_ALIAS
+            with self._lock:
+                self._shards[schema] = alias
+        return alias
+
+    def vaciar(self):
+        with self._lock:
+            self._shards.clear()
+            self._proxima_revision = 0.0
+
+
+mapa = MapaShards()
+_etiquetas_tenant = None
+
+
+def es_modelo_de_tenant(model):
+    global _etiquetas_tenant
+    if _etiquetas_tenant is None:
+        _etiquetas_tenant = {
+            config.label for config in apps.get_app_configs() if config.name in settings.TENANT_APPS
+        }
+    return model._meta.app_label in _etiquetas_tenant
+
+
+def alias_actual():
+    """Shard del inquilino activo en `connection` ('default' en el esquema público)."""
+    conexion = connections[DEFAULT_DB_ALIAS]
+    if conexion.schema_name == get_public_schema_name():
+        return DEFAULT_DB_ALIAS
+    return getattr(conexion.tenant, 'shard', None) or mapa.obtener(conexion.schema_name)
+
+
+class ShardRouter:
+
+    def _alias(self, model):
+        if not es_modelo_de_tenant(model):
+            return None
+        alias = alias_actual()
+        if alias == DEFAULT_DB_ALIAS:
+            return None
+        principal = connections[DEFAULT_DB_ALIAS]
+        destino = connections[alias]
+        if (destino.schema_name != principal.schema_name
+                or destino.include_public_schema != principal.include_public_schema):
+            destino.set_tenant(principal.tenant, principal.include_public_schema)
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return self._alias(model)
+
+    def db_for_write(self, model, **hints):
+        return self._alias(model)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # TenantSyncRouter solo migra en 'default'; en los demás shards se
+        # decide igual, según el esquema activo en la conexión de ese shard
+        if db == DEFAULT_DB_ALIAS or db not in settings.TENANT_SHARDS:
+            return None
+        if connections[db].schema_name == get_public_schema_name():
+            return TenantSyncRouter().app_in_list(app_label, settings.SHARED_APPS)
+        return TenantSyncRouter().app_in_list(app_label, settings.TENANT_APPS)
+
+
+class atomic_tenant(ContextDecorator):
+    """transaction.atomic() en el shard del inquilino activo (decorador o bloque with)."""
+
+    def __init__(self, savepoint=True):
+        self.savepoint = savepoint
+        self._abiertos = threading.local()
+
+    def __enter__(self):
+        atomic = transaction.atomic(using=alias_actual(), savepoint=self.savepoint)
+        pila = self._abiertos.__dict__.setdefault('pila', [])
+        pila.append(atomic)
+        return atomic.__enter__()
+
+    def __exit__(self, *exc):
+        return self._abiertos.pila.pop().__exit__(*exc)
+
+
+def elegir_shard():
+    """Shard con menos inquilinos (a igualdad, el primero de TENANT_SHARDS)."""
+    from .models import Client
+
+    ocupacion = dict(
+        Client.objects.exclude(schema_name=get_public_schema_name())
+        .values('shard').annotate(total=Count('id')).values_list('shard', 'total')
+    )
+    return min(settings.TENANT_SHARDS, key=lambda alias: ocupacion.get(alias, 0))
+
+
+def _conexion_libpq(alias):
+    """(dsn sin contraseña, entorno con PGPASSWORD) para pg_dump/pg_restore."""
+    datos = settings.DATABASES[alias]
+    partes = {
+        'host': datos.get('HOST'),
+        'port': datos.get('PORT'),
+        'dbname': datos.get('NAME'),
+        'user': datos.get('USER'),
+        'sslmode': datos.get('OPTIONS', {}).get('sslmode'),
+    }
+    dsn = ' '.join(f"{clave}='{valor}'" for clave, valor in partes.items() if valor)
+    entorno = dict(os.environ)
+    if datos.get('PASSWORD'):
+        entorno['PGPASSWORD'] = datos['PASSWORD']
+    return dsn, entorno
+
+
+def _escrituras(schema, alias):
+    """Filas escritas en el esquema según pg_stat_user_tables (para detectar cambios durante la copia)."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(sum(n_tup_ins + n_tup_upd + n_tup_del), 0) FROM pg_stat_user_tables WHERE schemaname = %s",
+            [schema],
+        )
+        return cursor.fetchone()[0]
+
+
+def _conteos(schema, alias):
+    """{tabla: filas} exactas del esquema."""
+    conexion = connections[alias]
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = %s AND table_type = 'BASE TABLE'",
+            [schema],
+        )
+        tablas = sorted(fila[0] for fila in cursor.fetchall())
+        if not tablas:
+            return {}
+        q = conexion.ops.quote_name
+        cursor.execute(' UNION ALL '.join(
+            f"SELECT %s, count(*) FROM {q(schema)}.{q(tabla)}" for tabla in tablas
+        ), tablas)
+        return dict(cursor.fetchall())
+
+
+def _copiar_esquema(schema, origen, destino):
+    dsn_origen, entorno_origen = _conexion_libpq(origen)
+    dsn_destino, entorno_destino = _conexion_libpq(destino)
+    volcado = subprocess.Popen(
+        [settings.PG_DUMP, '--format=custom', '--no-owner', '--no-privileges', '--schema', schema, '--dbname', dsn_origen],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=entorno_origen,
+    )
+    restauracion = subprocess.run(
+        [settings.PG_RESTORE, '--no-owner', '--no-privileges', '--exit-on-error', '--dbname', dsn_destino],
+        stdin=volcado.stdout, capture_output=True, env=entorno_destino,
+    )
+    volcado.stdout.close()
+    error_volcado = volcado.stderr.read()
+    if volcado.wait() != 0:
+        raise RuntimeError(f"pg_dump falló: {error_volcado.decode(errors='replace')[-1000:]}")
+    if restauracion.returncode != 0:
+        raise RuntimeError(f"pg_restore falló: {restauracion.stderr.decode(errors='replace')[-1000:]}")
+
+
+def mover_tenant(tenant, destino, conservar_origen=False):
+    """
+    Copia el esquema del inquilino al shard `destino` y lo apunta allí.
+
+    Mientras dura, el inquilino queda en estado pendiente (el middleware
+    responde 503). Se espera a que todos los procesos lo vean antes de
+    copiar; si aun así hubo escrituras durante la copia, o las filas no
+    coinciden, se descarta la copia y el inquilino sigue donde estaba.
+    """
+    from .aprovisionamiento import descartar_esquema
+    from .models import Client
+
+    schema, origen = tenant.schema_name, tenant.shard
+    if destino not in settings.TENANT_SHARDS:
+        raise ValueError(f"Shard desconocido: {destino}")
+    if destino == origen:
+        raise ValueError(f"{schema} ya está en {destino}")
+    if schema_exists(schema, destino):
+        raise ValueError(f"El esquema {schema} ya existe en {destino}")
+
+    # Client.save() no debe crear el esquema en 'default'
+    tenant.auto_create_schema = False
+    estado_previo = tenant.estado
+    tenant.estado = Client.ESTADO_PENDIENTE
+    tenant.save(update_fields=['estado'])
+    try:
+        # Los demás procesos revisan la versión de resolucion cada TENANT_CACHE_VERSION_SEGUNDOS
+        time.sleep(settings.TENANT_CACHE_VERSION_SEGUNDOS * 2)
+        escrituras = _escrituras(schema, origen)
+        _copiar_esquema(schema, origen, destino)
+        # Las estadísticas de PostgreSQL se publican con hasta un segundo de retraso
+        time.sleep(1)
+        if _escrituras(schema, origen) != escrituras:
+            raise RuntimeError(f"{schema} recibió escrituras durante la copia")
+        if _conteos(schema, origen) != _conteos(schema, destino):
+            raise RuntimeError(f"Las filas de {schema} no coinciden tras la copia")
+    except Exception:
+        descartar_esquema(schema, destino)
+        tenant.estado = estado_previo
+        tenant.save(update_fields=['estado'])
+        raise
+
+    tenant.shard = destino
+    tenant.estado = estado_previo
+    tenant.save(update_fields=['shard', 'estado'])
+    mapa.vaciar()
+    if not conservar_origen:
+        descartar_esquema(schema, origen)
+    logger.info("Inquilino %s movido de %s a %s", schema, origen, destino)
@@ -0,0 +1,27 @@
+# apps/tenants/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.cache import invalidar_tenant
+
+from .models import Client, Domain
+from .resolucion import invalidar_tenants
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def tenant_o_dominio_cambiado(sender, **kwargs):
+    """Invalida ahora y al confirmar, por si otra petición repobló el LRU con datos previos."""
+    invalidar_tenants()
+    transaction.on_commit(invalidar_tenants)
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def tenant_creado_o_borrado(sender, instance, created=True, **kwargs):
+    """Un esquema nuevo (o que reutiliza el nombre de uno borrado) empieza con la caché vacía."""
+    if created:
+        invalidar_tenant(instance.schema_name)
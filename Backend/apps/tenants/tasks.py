@@ -0,0 +1,58 @@
+# apps/tenants/tasks.py
+"""
+Tareas asíncronas de inquilinos.
+- Alta en segundo plano cuando no hay reserva ni plantilla (ver aprovisionamiento.py).
+- Mantiene la plantilla migrada y el cupo de esquemas de reserva.
+- Recalcula las métricas de la plataforma de los inquilinos que cambiaron (ver analitica.py).
+"""
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django_tenants.utils import schema_exists
+
+from .analitica import actualizar_metricas
+from .aprovisionamiento import (
+    completar_tenant, crear_esquema, descartar_esquema, preparar_esquema, preparar_plantilla, reponer_reservas,
+)
+from .models import Client
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def provisionar_tenant(tenant_id, admin):
+    tenant = Client.objects.get(pk=tenant_id)
+    if tenant.estado == Client.ESTADO_LISTO:
+        return {'estado': tenant.estado}
+    # Si no, Client.save() volvería a crear y migrar el esquema al guardar el estado
+    tenant.auto_create_schema = False
+    try:
+        if (not schema_exists(tenant.schema_name, tenant.shard)
+                and not preparar_esquema(tenant.schema_name, tenant.shard)):
+            # Alta clásica: CREATE SCHEMA + todas las migraciones
+            crear_esquema(tenant.schema_name, tenant.shard)
+        completar_tenant(tenant, admin)
+    except Exception as exc:
+        logger.exception("Falló el alta del inquilino %s", tenant.schema_name)
+        descartar_esquema(tenant.schema_name, tenant.shard)
+        tenant.estado = Client.ESTADO_ERROR
+        tenant.error = str(exc)
+        tenant.save(update_fields=['estado', 'error'])
+        return {'estado': tenant.estado}
+    return {'estado': tenant.estado}
+
+
+@shared_task
+def reponer_reservas_tenants():
+    """Migra la plantilla de cada shard (tras un despliegue) y repone las reservas consumidas."""
+    creadas = {}
+    for alias in settings.TENANT_SHARDS:
+        preparar_plantilla(alias)
+        creadas[alias] = reponer_reservas(alias=alias)
+    return {'creadas': creadas}
+
+
+@shared_task
+def actualizar_metricas_plataforma():
+    return actualizar_metricas()
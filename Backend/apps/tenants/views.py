@@ -1,9 +1,17 @@
+import hashlib
+import json
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from django.db import connection
-from .serializers import TenantPublicSerializer, TenantRegisterSerializer
+from django_tenants.utils import get_public_schema_name
+from django.urls import reverse
+from .serializers import TenantRegisterSerializer
 from .models import Client
+from .analitica import resumen_plataforma
+from .aprovisionamiento import esquema_reservado
+from .resolucion import info_publica
 
 from rest_framework import status
 from rest_framework.generics import CreateAPIView
@@ -12,23 +20,37 @@ class TenantInfoView(APIView):
     """
     Devuelve información pública del inquilino actual.
     Útil para que el frontend sepa nombre, logo, etc. antes del login.
+    La respuesta sale de caché (ver resolucion.info_publica) con ETag: si el
+    navegador ya la tiene (If-None-Match), se contesta 304 sin cuerpo.
     """
     permission_classes = [AllowAny]
+    authentication_classes = []
 
     def get(self, request):
         schema = connection.schema_name
         if schema == 'public':
-            return Response({'type': 'public', 'message': 'Estás en el dominio principal (Landing Page)'})
-        
-        # Si estamos en un tenant, obtenemos sus datos
-        tenant = request.tenant
-        serializer = TenantPublicSerializer(tenant)
-        return Response({'type': 'tenant', 'data': serializer.data})
+            cuerpo = {'type': 'public', 'message': 'Estás en el dominio principal (Landing Page)'}
+        else:
+            # Si estamos en un tenant, obtenemos sus datos
+            cuerpo = {'type': 'tenant', 'data': info_publica(request.tenant)}
+
+        etag = '"%s"' % hashlib.md5(
+            json.dumps(cuerpo, sort_keys=True, default=str).encode('utf-8'), usedforsecurity=False
+        ).hexdigest()
+        if etag in [e.strip() for e in request.headers.get('If-None-Match', '').split(',')]:
+            respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            respuesta = Response(cuerpo)
+        respuesta['ETag'] = etag
+        respuesta['Cache-Control'] = 'no-cache'  # el navegador revalida siempre, con el ETag
+        return respuesta
     
 
 class RegisterTenantView(CreateAPIView):
     """
     Crea una nueva tienda (inquilino) y su usuario administrador.
+    Normalmente la tienda queda lista en la misma petición (201). Si el alta
+    tuvo que seguir en segundo plano, responde 202 con la URL de estado.
     """
     permission_classes = [AllowAny] # Público
     serializer_class = TenantRegisterSerializer
@@ -41,8 +63,50 @@ class RegisterTenantView(CreateAPIView):
         # Construir la URL de redirección para el frontend
         # En desarrollo: http://pepita.localhost:5173/login
         redirect_url = f"http://{tenant.domains.first().domain}:4000/login"
+
+        if tenant.estado != Client.ESTADO_LISTO:
+            return Response({
+                "message": "Estamos preparando tu tienda",
+                "estado": tenant.estado,
+                "status_url": reverse('tenant-status', args=[tenant.schema_name]),
+                "redirect_url": redirect_url
+            }, status=status.HTTP_202_ACCEPTED)
         
         return Response({
             "message": "Tienda creada exitosamente",
             "redirect_url": redirect_url
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_201_CREATED)
+
+
+class TenantStatusView(APIView):
+    """Estado del alta de una tienda (para sondear tras un 202 de RegisterTenantView)."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, schema_name):
+        tenant = Client.objects.filter(schema_name=schema_name).only('schema_name', 'estado').first()
+        if tenant is None or esquema_reservado(schema_name):
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'schema_name': tenant.schema_name,
+            'estado': tenant.estado,
+            'listo': tenant.estado == Client.ESTADO_LISTO,
+        })
+
+
+class PlatformMetricsView(APIView):
+    """
+    Dashboard del operador de la plataforma: GMV, pedidos y usuarios de todos
+    los inquilinos. Solo en el dominio principal y para staff del esquema
+    público. Lee MetricaTenant (ver analitica.py), no los esquemas.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if connection.schema_name != get_public_schema_name():
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limite = min(max(int(request.query_params.get('limit', 20)), 0), 200)
+        except ValueError:
+            limite = 20
+        return Response(resumen_plataforma(limite))
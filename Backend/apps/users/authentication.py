@@ -0,0 +1,165 @@
+# apps/users/authentication.py
+"""
+Autenticación JWT sin consulta a la base de datos.
+
+Los tokens emitidos por LoginView (ver `emitir_tokens`) llevan firmados el
+id, is_staff, los roles y el esquema del inquilino. ClaimsJWTAuthentication
+confía en esos claims y devuelve un UsuarioToken: las comprobaciones
+habituales (is_authenticated, is_staff, id, roles) no tocan la BD, y solo si
+la vista necesita otro atributo se carga el User completo desde una caché
+corta por inquilino (invalidada en signals.py al guardar o borrar el usuario).
+Si cambian is_staff, is_superuser o los grupos, revocar_claims() anula los
+access tokens ya emitidos y el refresh relee los claims de la base.
+
+Los tokens antiguos, sin claim de inquilino, siguen el camino normal de
+simplejwt (una consulta por petición) hasta que caduquen.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .roles import nombres_grupos
+from .tokens import RedisRefreshToken
+
+CLAIM_TENANT = 'tenant'
+CLAIM_ROLES = 'roles'
+CLAIM_STAFF = 'is_staff'
+
+CACHE_USUARIO = 'auth:usuario:'
+CACHE_INACTIVO = 'auth:inactivo:'
+CACHE_CLAIMS = 'auth:claims:'
+
+
+def emitir_tokens(user):
+    """RefreshToken del usuario con los claims que usa ClaimsJWTAuthentication (el access los hereda)."""
+    refresh = RedisRefreshToken.for_user(user)
+    refresh[CLAIM_TENANT] = connection.schema_name
+    refresh[CLAIM_STAFF] = user.is_staff
+    refresh[CLAIM_ROLES] = nombres_grupos(user)
+    return refresh
+
+
+def _clave_usuario(user_id, schema=None):
+    return f"{CACHE_USUARIO}{schema or connection.schema_name}:{user_id}"
+
+
+def _clave_inactivo(user_id, schema=None):
+    return f"{CACHE_INACTIVO}{schema or connection.schema_name}:{user_id}"
+
+
+def _clave_claims(user_id, schema=None):
+    return f"{CACHE_CLAIMS}{schema or connection.schema_name}:{user_id}"
+
+
+def obtener_usuario(user_id):
+    """User completo del inquilino actual, cacheado AUTH_USUARIO_CACHE_SEGUNDOS."""
+    clave = _clave_usuario(user_id)
+    user = cache.get(clave)
+    if user is None:
+        try:
+            user = get_user_model().objects.get(**{jwt_settings.USER_ID_FIELD: user_id})
+        except get_user_model().DoesNotExist:
+            # Borrado con el token aún vigente: 401, no un 500 en mitad de la vista
+            raise AuthenticationFailed('Usuario no encontrado.', code='user_not_found')
+        cache.set(clave, user, settings.AUTH_USUARIO_CACHE_SEGUNDOS)
+    return user
+
+
+def invalidar_usuario(user_id, activo=True):
+    """
+    Olvida el User cacheado. Si quedó inactivo (o se borró), lo marca para
+    que sus access tokens vigentes se rechacen sin esperar a que caduquen.
+    """
+    cache.delete(_clave_usuario(user_id))
+    # La marca de inactivo va en la caché compartida: invalidar la del inquilino no debe borrarla
+    if activo:
+        caches['compartida'].delete(_clave_inactivo(user_id))
+    else:
+        caches['compartida'].set(_clave_inactivo(user_id), True, int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()))
+
+
+def revocar_claims(user_id):
+    """
+    Cambiaron is_staff, is_superuser o los grupos del usuario: sus access
+    tokens emitidos hasta ahora se rechazan (el refresh emite unos con los
+    claims releídos de la base).
+    """
+    caches['compartida'].set(
+        _clave_claims(user_id), time.time(), int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds()),
+    )
+
+
+class UsuarioToken(SimpleLazyObject):
+    """
+    Usuario respaldado por los claims del token. Los atributos propios se
+    responden sin BD; cualquier otro carga el User real (desde la caché).
+    """
+
+    def __init__(self, token):
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+        super().__init__(lambda: obtener_usuario(user_id))
+        # __setattr__ de LazyObject reenvía al objeto envuelto; se escribe directo
+        self.__dict__['_token'] = token
+        self.__dict__['_user_id'] = user_id
+
+    @property
+    def id(self):
+        return self._user_id
+
+    pk = id
+
+    @property
+    def is_staff(self):
+        return bool(self._token.get(CLAIM_STAFF, False))
+
+    @property
+    def roles(self):
+        return list(self._token.get(CLAIM_ROLES, []))
+
+    @property
+    def tenant(self):
+        return self._token.get(CLAIM_TENANT)
+
+    @property
+    def is_active(self):
+        # Las cuentas desactivadas se rechazan en la autenticación
+        return True
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __bool__(self):
+        return True
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication que no consulta la BD si el token trae claims de inquilino."""
+
+    def get_user(self, validated_token):
+        if CLAIM_TENANT not in validated_token:
+            return super().get_user(validated_token)
+
+        if validated_token[CLAIM_TENANT] != connection.schema_name:
+            # Mismo SIGNING_KEY en todos los inquilinos: un id válido en otro esquema no sirve aquí
+            raise AuthenticationFailed('El token no pertenece a este inquilino.', code='tenant_mismatch')
+
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene identificación de usuario.')
+
+        marcas = caches['compartida'].get_many([_clave_inactivo(user_id), _clave_claims(user_id)])
+        if marcas.get(_clave_inactivo(user_id)):
+            raise AuthenticationFailed('Usuario inactivo.', code='user_inactive')
+        cambio_claims = marcas.get(_clave_claims(user_id))
+        if cambio_claims and validated_token.get('iat', 0) < cambio_claims:
+            raise AuthenticationFailed('Los permisos del usuario cambiaron; renueve el token.', code='claims_changed')
+
+        return UsuarioToken(validated_token)
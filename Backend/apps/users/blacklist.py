@@ -0,0 +1,108 @@
+# apps/users/blacklist.py
+"""
+Lista negra de refresh tokens en Redis (sustituye a las tablas de
+rest_framework_simplejwt.token_blacklist en el camino de refresh/logout).
+
+- Cada jti anulado es una clave `jwt:bl:<jti>` con TTL igual a lo que le
+  queda al token: Redis la borra sola cuando el token ya no sirve.
+- Filtro de Bloom opcional en memoria (JWT_BLACKLIST_BLOOM=True) para
+  responder "no está" sin ir a Redis. Se sincroniza de forma incremental
+  desde un sorted set cada JWT_BLACKLIST_BLOOM_SEGUNDOS, así que un token
+  anulado en otro proceso puede tardar hasta ese intervalo en verse aquí.
+  Los positivos del filtro siempre se confirman en Redis.
+"""
+import hashlib
+import math
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+PREFIJO = 'jwt:bl:'
+RECIENTES = 'jwt:bl:recientes'  # sorted set jti -> momento de anulación (solo para el filtro de Bloom)
+
+
+class FiltroBloom:
+    """Filtro de Bloom sobre un bytearray; k posiciones derivadas de un blake2b."""
+
+    def __init__(self, capacidad, tasa_error=0.01):
+        self.capacidad = capacidad
+        self.bits = max(8, int(-capacidad * math.log(tasa_error) / (math.log(2) ** 2)))
+        self.k = max(1, round(self.bits / capacidad * math.log(2)))
+        self.datos = bytearray((self.bits + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, valor):
+        digest = hashlib.blake2b(valor.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.k))
+
+    def agregar(self, valor):
+        for pos in self._posiciones(valor):
+            self.datos[pos >> 3] |= 1 << (pos & 7)
+        self.elementos += 1
+
+    def __contains__(self, valor):
+        return all(self.datos[pos >> 3] & (1 << (pos & 7)) for pos in self._posiciones(valor))
+
+
+class ListaNegraRedis:
+
+    def __init__(self):
+        self._cliente = None
+        self._bloom = None
+        self._sincronizado_hasta = 0.0
+        self._proxima_sync = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            self._cliente = redis.Redis.from_url(settings.JWT_BLACKLIST_REDIS_URL)
+        return self._cliente
+
+    def anular(self, jti, exp):
+        """Añade el jti hasta su expiración (exp en epoch). Los tokens ya caducados no se guardan."""
+        ahora = time.time()
+        ttl = int(exp - ahora)
+        if ttl <= 0:
+            return
+        pipe = self.cliente.pipeline(transaction=False)
+        pipe.set(f"{PREFIJO}{jti}", 1, ex=ttl)
+        if settings.JWT_BLACKLIST_BLOOM:
+            pipe.zadd(RECIENTES, {jti: ahora})
+            pipe.zremrangebyscore(RECIENTES, '-inf', ahora - settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'].total_seconds())
+        pipe.execute()
+        if self._bloom is not None:
+            with self._lock:
+                self._bloom.agregar(jti)
+
+    def esta_anulado(self, jti):
+        if settings.JWT_BLACKLIST_BLOOM:
+            self._sincronizar()
+            if jti not in self._bloom:
+                return False
+        return bool(self.cliente.exists(f"{PREFIJO}{jti}"))
+
+    def _sincronizar(self):
+        """Trae al filtro los jti anulados desde la última sincronización (o lo reconstruye si se llenó)."""
+        ahora = time.time()
+        if self._bloom is not None and ahora < self._proxima_sync:
+            return
+        with self._lock:
+            if self._bloom is not None and ahora < self._proxima_sync:
+                return
+            if self._bloom is None or self._bloom.elementos >= self._bloom.capacidad:
+                self._bloom = FiltroBloom(settings.JWT_BLACKLIST_BLOOM_CAPACIDAD)
+                self._sincronizado_hasta = 0.0
+            # Un segundo de solape por escrituras concurrentes con la lectura anterior
+            nuevos = self.cliente.zrangebyscore(RECIENTES, max(0.0, self._sincronizado_hasta - 1), '+inf')
+            for jti in nuevos:
+                self._bloom.agregar(jti.decode('utf-8'))
+            self._sincronizado_hasta = ahora
+            self._proxima_sync = ahora + settings.JWT_BLACKLIST_BLOOM_SEGUNDOS
+
+
+lista_negra = ListaNegraRedis()
@@ -0,0 +1,79 @@
+# apps/users/busqueda.py
+"""
+Autocompletado de usuarios para los selectores del staff (tickets,
+calendario, responsables en CRM), pensado para llamarse en cada tecla.
+
+Cada filtro usa exactamente la expresión de un índice de User.Meta:
+- 1-2 caracteres: prefijo sobre UPPER(email) y UPPER(username) (btree
+  text_pattern_ops); con tan pocas letras los trigramas no filtran.
+- 3 o más: contiene, sobre UPPER(email), UPPER(username) y el nombre
+  completo (GIN gin_trgm_ops).
+El orden prioriza coincidencias por prefijo y luego la similitud de
+trigramas. Todo sale en una consulta con LIMIT.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+from django.db.models.functions import Greatest, Upper
+
+from .models import NOMBRE_COMPLETO
+
+User = get_user_model()
+
+ROLES_STAFF = ['administrador', 'empleadonivel1', 'empleadonivel2']
+ROLES_CLIENTE = ['cliente']
+ALCANCES = ('todos', 'staff', 'clientes')
+MIN_TRIGRAMA = 3
+
+
+def _con_rol(roles):
+    return Exists(User.groups.through.objects.filter(user_id=OuterRef('pk'), group__name__in=roles))
+
+
+def filtrar_usuarios(texto, alcance='todos', queryset=None):
+    """Queryset filtrado y ordenado por relevancia (sin cortar)."""
+    texto = (texto or '').strip().upper()
+    queryset = (queryset if queryset is not None else User.objects.all()).annotate(
+        email_mayus=Upper('email'),
+        username_mayus=Upper('username'),
+        nombre_mayus=NOMBRE_COMPLETO,
+    )
+
+    if alcance == 'staff':
+        queryset = queryset.filter(Q(is_staff=True) | _con_rol(ROLES_STAFF))
+    elif alcance == 'clientes':
+        queryset = queryset.filter(_con_rol(ROLES_CLIENTE))
+
+    por_prefijo = Q(email_mayus__startswith=texto) | Q(username_mayus__startswith=texto)
+    if len(texto) < MIN_TRIGRAMA:
+        return queryset.filter(por_prefijo).order_by('username')
+
+    prefijo = Case(When(por_prefijo, then=Value(0)), default=Value(1), output_field=IntegerField())
+    return queryset.filter(
+        Q(email_mayus__contains=texto) | Q(username_mayus__contains=texto) | Q(nombre_mayus__contains=texto)
+    ).annotate(
+        prefijo=prefijo,
+        similitud=Greatest(
+            TrigramSimilarity('email_mayus', texto),
+            TrigramSimilarity('username_mayus', texto),
+            TrigramSimilarity('nombre_mayus', texto),
+        ),
+    ).order_by('prefijo', '-similitud', 'username')
+
+
+def autocompletar_usuarios(texto, alcance='todos', limite=10):
+    """Top-N como dicts compactos para el selector, en una consulta."""
+    if not (texto or '').strip():
+        return []
+    filas = filtrar_usuarios(texto, alcance).filter(is_active=True).values(
+        'id', 'username', 'email', 'first_name', 'last_name',
+    )[:limite]
+    return [
+        {
+            'id': fila['id'],
+            'username': fila['username'],
+            'email': fila['email'],
+            'full_name': f"{fila['first_name']} {fila['last_name']}".strip(),
+        }
+        for fila in filas
+    ]
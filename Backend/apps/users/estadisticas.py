@@ -0,0 +1,67 @@
+# apps/users/estadisticas.py
+"""
+Estadísticas de usuarios para el dashboard de administración.
+Todas las cifras salen de una sola consulta con agregación condicional y se
+cachean por inquilino (un solo proceso recalcula si caducan a la vez varias
+peticiones); signals.py borra la caché cuando cambian los usuarios
+o sus grupos (los logins no la invalidan: last_login espera al TTL).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Exists, Max, OuterRef, Q
+from django.utils import timezone
+
+from .roles import grupos_del_tenant
+
+User = get_user_model()
+
+CACHE_PREFIX = 'usuarios:stats:'
+
+
+def _clave_cache():
+    return f"{CACHE_PREFIX}{connection.schema_name}"
+
+
+def estadisticas_usuarios():
+    return cache.obtener_o_calcular(_clave_cache(), _calcular, settings.USUARIOS_STATS_CACHE_SEGUNDOS)
+
+
+def _calcular():
+    ahora = timezone.now()
+    grupos = grupos_del_tenant()
+    pertenece = User.groups.through.objects.filter(user_id=OuterRef('pk'))
+    por_grupo = {
+        f'rol_{grupo_id}': Count('id', filter=Exists(pertenece.filter(group_id=grupo_id)))
+        for grupo_id in grupos
+    }
+
+    fila = User.objects.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(is_active=True)),
+        ultimo_mes=Count('id', filter=Q(date_joined__gte=ahora - timedelta(days=30))),
+        hoy=Count('id', filter=Q(date_joined__date=timezone.localdate(ahora))),
+        ultimo_login=Max('last_login'),
+        **por_grupo,
+    )
+
+    return {
+        'total_users': fila['total'],
+        'active_users': fila['activos'],
+        'users_by_role': {
+            nombre: fila[f'rol_{grupo_id}']
+            for grupo_id, nombre in grupos.items()
+            if fila[f'rol_{grupo_id}'] > 0
+        },
+        'registered_last_month': fila['ultimo_mes'],
+        'last_login': fila['ultimo_login'],
+        'new_users_today': fila['hoy'],
+        'inactive_users': fila['total'] - fila['activos'],
+    }
+
+
+def invalidar_estadisticas():
+    cache.delete(_clave_cache())
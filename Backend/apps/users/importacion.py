@@ -0,0 +1,217 @@
+# apps/users/importacion.py
+"""
+Importación masiva de usuarios/clientes desde CSV.
+
+Sustituye la creación uno a uno (AdminCreateUserSerializer/UserSignupSerializer
+más los signals de carritos y clientes) por lotes:
+- El CSV se lee en streaming, `lote` filas a la vez.
+- Los hashes PBKDF2 se calculan en un pool de procesos, y el lote siguiente
+  se hashea mientras se inserta el actual. Con procesos=1 (la tarea de
+  Celery, cuyo worker no puede abrir procesos hijos) se hashea en línea. Se aceptan también hashes ya
+  calculados (columna password_hash, p. ej. al migrar desde otra tienda de
+  Django) y filas sin contraseña (quedan con contraseña inutilizable).
+- Usuarios, perfiles, carritos, perfiles de Cliente y grupos se insertan con
+  bulk_create, una transacción por lote. Como bulk_create no dispara
+  post_save, aquí se replica lo que hacen esos signals.
+
+Columnas: email, username, first_name, last_name, password | password_hash,
+role (por defecto 'cliente'), celular. Solo email es obligatoria.
+"""
+import csv
+import os
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import Group
+from django.db import DataError, IntegrityError, connection
+from django.db.models.functions import Lower
+
+from apps.crm.clientes.models import Cliente
+from apps.ecommerce.carritos.models import Carrito
+from apps.tenants.shards import atomic_tenant
+from .models import UserProfile
+from .roles import ROLES_ASIGNABLES
+
+User = get_user_model()
+
+MAX_ERRORES = 100
+MAX_EMAIL = User._meta.get_field('email').max_length
+MAX_USERNAME = User._meta.get_field('username').max_length
+
+
+def _hashear(passwords):
+    """Se ejecuta en el pool: un trozo del lote por tarea para amortizar el IPC."""
+    return [make_password(p) for p in passwords]
+
+
+def leer_csv(lineas):
+    """Itera filas (dicts) de un iterable de líneas de texto sin cargar el archivo completo."""
+    for fila in csv.DictReader(lineas):
+        yield {(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()}
+
+
+class ImportadorUsuarios:
+
+    def __init__(self, lote=1000, procesos=None, rol_por_defecto='cliente'):
+        self.lote = lote
+        self.procesos = procesos or settings.IMPORTACION_PROCESOS or os.cpu_count() or 1
+        self.rol_por_defecto = rol_por_defecto
+        self.resumen = {'creados': 0, 'omitidos': 0, 'errores': []}
+        self._grupos = {}
+        # Aceptados en todo el archivo: el lote siguiente se valida antes de insertar el actual
+        self._emails = set()
+        self._usernames = set()
+
+    def importar(self, filas):
+        """Importa un iterable de filas (ver leer_csv). Devuelve el resumen."""
+        self._grupos = {
+            nombre: Group.objects.get_or_create(name=nombre)[0]
+            for nombre in ROLES_ASIGNABLES
+        }
+        numeradas = enumerate(filas, start=2)  # la fila 1 es la cabecera
+        lotes = iter(lambda: list(islice(numeradas, self.lote)), [])
+        with ProcessPoolExecutor(max_workers=self.procesos) if self.procesos > 1 else nullcontext() as pool:
+            pendiente = None
+            for filas_lote in lotes:
+                lote = self._validar(filas_lote)
+                siguiente = (lote, self._hashear_lote(pool, lote)) if lote else None
+                if pendiente:
+                    self._insertar(*pendiente)
+                pendiente = siguiente
+            if pendiente:
+                self._insertar(*pendiente)
+        return self.resumen
+
+    def _error(self, numero, mensaje):
+        self.resumen['omitidos'] += 1
+        if len(self.resumen['errores']) < MAX_ERRORES:
+            self.resumen['errores'].append({'fila': numero, 'error': mensaje})
+
+    def _validar(self, numeradas):
+        """Normaliza y filtra un lote: campos obligatorios, rol y duplicados (en el archivo y en la BD)."""
+        candidatos = []
+        for numero, fila in numeradas:
+            email = User.objects.normalize_email(fila.get('email', ''))
+            if not email:
+                self._error(numero, 'Falta email')
+                continue
+            username = fila.get('username') or email.split('@')[0]
+            if len(email) > MAX_EMAIL or len(username) > MAX_USERNAME:
+                self._error(numero, f'Email o username demasiado largo (máx. {MAX_EMAIL} / {MAX_USERNAME})')
+                continue
+            rol = fila.get('role') or self.rol_por_defecto
+            if rol not in self._grupos:
+                self._error(numero, f'Rol inválido: {rol}')
+                continue
+            if email.lower() in self._emails or username in self._usernames:
+                self._error(numero, 'Duplicado en el archivo')
+                continue
+            self._emails.add(email.lower())
+            self._usernames.add(username)
+            candidatos.append((numero, fila, email, username, rol))
+
+        if not candidatos:
+            return []
+        # El email se compara sin distinguir mayúsculas, como en el registro
+        existentes = set(
+            User.objects.annotate(email_minusculas=Lower('email'))
+            .filter(email_minusculas__in=[c[2].lower() for c in candidatos])
+            .values_list('email_minusculas', flat=True)
+        )
+        usernames_existentes = set(
+            User.objects.filter(username__in=[c[3] for c in candidatos]).values_list('username', flat=True)
+        )
+
+        lote = []
+        for numero, fila, email, username, rol in candidatos:
+            if email.lower() in existentes or username in usernames_existentes:
+                self._error(numero, 'El usuario ya existe')
+                continue
+            lote.append((numero, fila, email, username, rol))
+        return lote
+
+    def _hashear_lote(self, pool, lote):
+        """
+        Devuelve una lista con, por fila, el hash ya resuelto o el índice de
+        su resultado en los futuros del pool.
+        """
+        hashes, a_calcular = [], []
+        for _, fila, *_ in lote:
+            previo = fila.get('password_hash')
+            if previo:
+                try:
+                    identify_hasher(previo)
+                    hashes.append(previo)
+                    continue
+                except ValueError:
+                    pass
+            if fila.get('password'):
+                hashes.append(len(a_calcular))
+                a_calcular.append(fila['password'])
+            else:
+                hashes.append(make_password(None))
+
+        if pool is None:
+            calculados = _hashear(a_calcular)
+            return [calculados[h] if isinstance(h, int) else h for h in hashes], []
+
+        tamaño = max(1, -(-len(a_calcular) // (self.procesos * 4)))
+        futuros = [pool.submit(_hashear, a_calcular[i:i + tamaño]) for i in range(0, len(a_calcular), tamaño)]
+        return hashes, futuros
+
+    def _insertar(self, lote, hasheo):
+        hashes, futuros = hasheo
+        calculados = [h for futuro in futuros for h in futuro.result()]
+
+        filas = []
+        for (numero, fila, email, username, rol), password in zip(lote, hashes):
+            es_admin = rol == 'administrador'
+            filas.append((numero, rol, User(
+                email=email,
+                username=username,
+                first_name=fila.get('first_name', ''),
+                last_name=fila.get('last_name', ''),
+                celular=fila.get('celular') or None,
+                password=calculados[password] if isinstance(password, int) else password,
+                is_active=True,
+                is_staff=es_admin,
+                is_superuser=es_admin,
+            )))
+
+        try:
+            self._crear(filas)
+        except (IntegrityError, DataError):
+            # Otra petición creó alguno entre la validación y el insert, o un
+            # valor que _validar no cubre (p. ej. un nombre demasiado largo):
+            # se reintenta fila a fila para no perder el resto del lote.
+            for numero, rol, usuario in filas:
+                usuario.pk = None
+                try:
+                    self._crear([(numero, rol, usuario)])
+                except (IntegrityError, DataError) as e:
+                    self._error(numero, f"No se pudo crear: {str(e).splitlines()[0]}")
+
+    def _crear(self, filas):
+        usuarios = [usuario for _, _, usuario in filas]
+        with atomic_tenant():
+            # PostgreSQL devuelve los ids de bulk_create
+            User.objects.bulk_create(usuarios)
+            UserProfile.objects.bulk_create([UserProfile(user=u) for u in usuarios])
+            User.groups.through.objects.bulk_create([
+                User.groups.through(user_id=u.id, group_id=self._grupos[rol].id)
+                for _, rol, u in filas
+            ])
+            # Lo que harían los signals de carritos y clientes (no en el esquema público)
+            if connection.schema_name != 'public':
+                Carrito.objects.bulk_create([Carrito(usuario=u) for u in usuarios])
+                Cliente.objects.bulk_create([Cliente(usuario=u) for u in usuarios])
+        self.resumen['creados'] += len(usuarios)
+
+
+def importar_usuarios_csv(lineas, **opciones):
+    """Atajo para la vista y el comando: `lineas` es un iterable de líneas de texto."""
+    return ImportadorUsuarios(**opciones).importar(leer_csv(lineas))
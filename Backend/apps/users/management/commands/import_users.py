@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import schema_context
+
+from apps.users.importacion import importar_usuarios_csv
+from apps.users.roles import ROLES_ASIGNABLES
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk import users from a CSV file into a tenant (columns: email, username, first_name, last_name, '
+        'password or password_hash, role, celular). Passwords are hashed in a process pool and rows are '
+        'inserted in batches together with profiles, carts, customer profiles and groups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='CSV file (UTF-8, header row required)')
+        parser.add_argument('--schema', type=str, required=True, help='Tenant schema to import into')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per insert batch')
+        parser.add_argument('--workers', type=int, help='Hashing processes (defaults to IMPORTACION_PROCESOS or CPU count)')
+        parser.add_argument('--role', default='cliente', choices=ROLES_ASIGNABLES, help='Role for rows without one')
+
+    def handle(self, *args, **options):
+        try:
+            archivo = open(options['file'], newline='', encoding='utf-8-sig')
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['file']}: {e}")
+
+        with archivo, schema_context(options['schema']):
+            resumen = importar_usuarios_csv(
+                archivo,
+                lote=options['batch_size'],
+                procesos=options['workers'],
+                rol_por_defecto=options['role'],
+            )
+
+        for error in resumen['errores']:
+            self.stdout.write(self.style.WARNING(json.dumps(error, ensure_ascii=False)))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {resumen['creados']} user(s), skipped {resumen['omitidos']}"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.users.tasks import podar_tokens_expirados
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired outstanding and blacklisted JWT refresh tokens from the token_blacklist tables '
+        'in batches. Active blacklist entries live in Redis and expire on their own.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired rows')
+
+    def handle(self, *args, **options):
+        resultado = podar_tokens_expirados(lote=options['batch_size'], simular=options['dry_run'])
+        verbo = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verbo} {resultado['outstanding']} outstanding and {resultado['blacklisted']} blacklisted token(s)"
+        ))
@@ -0,0 +1,14 @@
+# Generated by Django 5.2.6 on 2026-10-19 06:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_remove_user_is_verified_and_more'),
+        ('users', '0009_auto_20251119_0535'),
+    ]
+
+    operations = [
+    ]
@@ -1,11 +1,20 @@
 import uuid
-from django.db import models, transaction 
+from django.db import models
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models import Value
+from django.db.models.functions import Concat, Upper
 from django.conf import settings
 from django_countries.fields import CountryField
 from phonenumber_field.modelfields import PhoneNumberField
 
+from apps.tenants.shards import atomic_tenant
+
+# "NOMBRE APELLIDO" en mayúsculas: expresión compartida por el índice y el autocompletado
+NOMBRE_COMPLETO = Upper(Concat('first_name', Value(' '), 'last_name'))
+
+
 class UserManager(BaseUserManager):
     use_in_migrations = True
 
@@ -74,6 +83,18 @@ class User(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name']
 
+    class Meta(AbstractUser.Meta):
+        # Índices del autocompletado (ver busqueda.py): prefijo (btree) para
+        # búsquedas de 1-2 caracteres y trigramas (GIN, pg_trgm) para el resto.
+        # Las expresiones deben coincidir exactamente con las de las consultas.
+        indexes = [
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='users_email_prefijo_idx'),
+            models.Index(OpClass(Upper('username'), name='text_pattern_ops'), name='users_username_prefijo_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='users_email_trgm_idx'),
+            GinIndex(OpClass(Upper('username'), name='gin_trgm_ops'), name='users_username_trgm_idx'),
+            GinIndex(OpClass(NOMBRE_COMPLETO, name='gin_trgm_ops'), name='users_nombre_trgm_idx'),
+        ]
+
     def __str__(self):
        return self.get_full_name() if self.first_name else self.email
 
@@ -154,7 +175,7 @@ class Direccion(models.Model):
     def __str__(self):
         return f"Dirección de {self.user.email} - {self.linea1}"
     
-    @transaction.atomic
+    @atomic_tenant()
     def save(self, *args, **kwargs):
         """
         Sobrescribe 'save' para asegurar que solo una dirección de
@@ -0,0 +1,84 @@
+# apps/users/roles.py
+"""
+Resolución de roles (grupos) y permisos sin consultas por usuario.
+
+- Los codenames de permisos de cada grupo se cachean por inquilino (un solo
+  dict grupo_id -> codenames por esquema) y se invalidan en signals.py cuando
+  cambian grupos, permisos o la relación entre ambos.
+- Los helpers de rol leen `user.groups.all()`, así aprovechan un
+  prefetch_related('groups') del queryset, y memorizan el resultado en la
+  instancia para no repetir la consulta dentro de la misma petición.
+"""
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+
+CACHE_PREFIX = 'roles:permisos:'
+CACHE_GRUPOS = 'roles:grupos:'
+
+# Roles que un administrador puede asignar (alta por API e importación masiva)
+ROLES_ASIGNABLES = ['administrador', 'empleadonivel1', 'empleadonivel2', 'cliente']
+
+
+def _clave_cache():
+    return f"{CACHE_PREFIX}{connection.schema_name}"
+
+
+def permisos_por_grupo():
+    """Devuelve {grupo_id: [codenames]} del inquilino actual (una consulta si no está en caché)."""
+    clave = _clave_cache()
+    mapa = cache.get(clave)
+    if mapa is None:
+        mapa = {}
+        filas = Group.permissions.through.objects.values_list('group_id', 'permission__codename')
+        for grupo_id, codename in filas:
+            mapa.setdefault(grupo_id, []).append(codename)
+        cache.set(clave, mapa, settings.ROLES_CACHE_SEGUNDOS)
+    return mapa
+
+
+def grupos_del_tenant():
+    """Devuelve {grupo_id: nombre} del inquilino actual, cacheado igual que los permisos."""
+    clave = f"{CACHE_GRUPOS}{connection.schema_name}"
+    grupos = cache.get(clave)
+    if grupos is None:
+        grupos = dict(Group.objects.values_list('id', 'name'))
+        cache.set(clave, grupos, settings.ROLES_CACHE_SEGUNDOS)
+    return grupos
+
+
+def invalidar_permisos():
+    cache.delete_many([_clave_cache(), f"{CACHE_GRUPOS}{connection.schema_name}"])
+
+
+def grupos_de(user):
+    """Grupos del usuario ordenados por id (usa el prefetch si existe)."""
+    grupos = getattr(user, '_grupos_cache', None)
+    if grupos is None:
+        grupos = sorted(user.groups.all(), key=lambda g: g.id)
+        user._grupos_cache = grupos
+    return grupos
+
+
+def rol_principal(user):
+    """Primer grupo del usuario (equivale a groups.first()) o None."""
+    grupos = grupos_de(user)
+    return grupos[0] if grupos else None
+
+
+def nombres_grupos(user):
+    return [grupo.name for grupo in grupos_de(user)]
+
+
+def tiene_rol(user, nombre):
+    return nombre in nombres_grupos(user)
+
+
+def permisos_de(user):
+    """Codenames de todos los grupos del usuario, sin duplicados."""
+    mapa = permisos_por_grupo()
+    permisos = set()
+    for grupo in grupos_de(user):
+        permisos.update(mapa.get(grupo.id, ()))
+    return sorted(permisos)
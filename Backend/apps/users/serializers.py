@@ -14,7 +14,16 @@ from django.contrib.auth import authenticate, get_user_model
 from django.contrib.auth.models import Group, Permission
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import connection
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer, TokenVerifySerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import UntypedToken
 from .models import UserProfile, Direccion
+from .roles import ROLES_ASIGNABLES, nombres_grupos, rol_principal, tiene_rol
+from .blacklist import lista_negra
+from .tokens import RedisRefreshToken
+from .authentication import CLAIM_ROLES, CLAIM_STAFF, CLAIM_TENANT
 
 User = get_user_model()
 
@@ -121,7 +130,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
         Devuelve el primer grupo (rol) del usuario en formato simple.
         Si necesitas múltiples roles, cambia la lógica para devolver una lista.
         """
-        grupo = obj.groups.first()
+        grupo = rol_principal(obj)
         if grupo:
             return {'id': grupo.id, 'name': grupo.name}
         return None
@@ -133,7 +142,8 @@ class UserDetailSerializer(serializers.ModelSerializer):
         """
         request = self.context.get('request', None)
         if request and hasattr(request, 'user') and request.user.is_authenticated:
-            return request.user.groups.filter(name='administrador').exists()
+            # Memorizado en request.user: una sola consulta aunque se serialicen muchos usuarios
+            return tiene_rol(request.user, 'administrador')
         return False
 
     def update(self, instance, validated_data):
@@ -262,7 +272,7 @@ class UserSignupSerializer(serializers.ModelSerializer):
         return user
 
     def get_assigned_role(self, obj):
-        grupo = obj.groups.first()
+        grupo = rol_principal(obj)
         if grupo:
             return {'id': grupo.id, 'name': grupo.name}
         return None
@@ -286,8 +296,7 @@ class AdminCreateUserSerializer(serializers.ModelSerializer):
     - Ajusta flags como is_staff/is_superuser según el rol.
     """
     password = serializers.CharField(write_only=True, required=False)
-    role = serializers.ChoiceField(choices=['administrador', 'empleadonivel1', 'empleadonivel2', 'cliente'],
-                                   write_only=True)
+    role = serializers.ChoiceField(choices=ROLES_ASIGNABLES, write_only=True)
     send_welcome_email = serializers.BooleanField(default=True, write_only=True)
 
     # Campos de respuesta
@@ -306,9 +315,8 @@ class AdminCreateUserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'is_active', 'date_joined']
 
     def validate_role(self, value):
-        valid_roles = ['administrador', 'empleadonivel1', 'empleadonivel2', 'cliente']
-        if value not in valid_roles:
-            raise serializers.ValidationError(f"Rol debe ser uno de: {valid_roles}")
+        if value not in ROLES_ASIGNABLES:
+            raise serializers.ValidationError(f"Rol debe ser uno de: {ROLES_ASIGNABLES}")
         return value
 
     def create(self, validated_data):
@@ -357,7 +365,7 @@ class AdminCreateUserSerializer(serializers.ModelSerializer):
         return user
 
     def get_assigned_role(self, obj):
-        grupo = obj.groups.first()
+        grupo = rol_principal(obj)
         if grupo:
             descriptions = {
                 'administrador': 'Administrador con acceso total al sistema',
@@ -406,6 +414,50 @@ class LoginSerializer(serializers.Serializer):
         return data
 
 
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """
+    Refresh con rotación cuya lista negra está en Redis (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER']):
+    anular el token anterior y emitir el nuevo no escribe en la base de datos.
+    Los claims de staff y roles se releen del usuario en cada refresh, así un
+    cambio de permisos no sobrevive a la rotación.
+    """
+    token_class = RedisRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if refresh.get(CLAIM_TENANT, connection.schema_name) != connection.schema_name:
+            raise AuthenticationFailed('El token no pertenece a este inquilino.', 'tenant_mismatch')
+        try:
+            user = User.objects.get(**{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]})
+        except (KeyError, User.DoesNotExist):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if CLAIM_TENANT in refresh:
+            refresh[CLAIM_STAFF] = user.is_staff
+            refresh[CLAIM_ROLES] = nombres_grupos(user)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class VerifyTokenSerializer(TokenVerifySerializer):
+    """Igual que el de simplejwt, pero consulta la lista negra de Redis en lugar de BlacklistedToken."""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if lista_negra.esta_anulado(token.get(jwt_settings.JTI_CLAIM)):
+            raise serializers.ValidationError('El token está en la lista negra.')
+        return {}
+
+
 # -----------------------
 # Serializers para listados/búsquedas avanzadas y estadísticas
 # -----------------------
@@ -424,7 +476,8 @@ class UserAdminListSerializer(serializers.ModelSerializer):
         ]
 
     def get_role(self, obj):
-        grupo = obj.groups.first()
+        # Usa el prefetch_related('groups') de la vista en lugar de una consulta por usuario
+        grupo = rol_principal(obj)
         return grupo.name if grupo else None
 
 
@@ -0,0 +1,110 @@
+# apps/users/signals.py
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from apps.tenants.shards import alias_actual
+
+from .authentication import invalidar_usuario, revocar_claims
+from .estadisticas import invalidar_estadisticas
+from .roles import invalidar_permisos
+
+CAMPOS_CLAIMS = {'is_staff', 'is_superuser'}
+
+
+def _invalidar(**kwargs):
+    """
+    Borra la caché de permisos del inquilino ahora y de nuevo al confirmar la
+    transacción (en el shard del inquilino), por si otra petición la repobló
+    con datos previos al cambio.
+    """
+    invalidar_permisos()
+    transaction.on_commit(invalidar_permisos, using=alias_actual())
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def permisos_de_grupo_cambiados(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidar()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def grupo_o_permiso_cambiado(sender, **kwargs):
+    _invalidar()
+
+
+def _revocar_claims(user_ids):
+    """Anula los access tokens con claims viejos ahora y otra vez al confirmar (un refresh intermedio lee lo anterior)."""
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        revocar_claims(user_id)
+
+    def revocar():
+        for user_id in user_ids:
+            revocar_claims(user_id)
+
+    transaction.on_commit(revocar, using=alias_actual())
+
+
+@receiver(pre_save, sender=get_user_model())
+def usuario_por_guardar(sender, instance, update_fields=None, **kwargs):
+    """Guarda is_staff/is_superuser previos para saber en post_save si cambian los claims."""
+    if instance._state.adding or (update_fields is not None and not CAMPOS_CLAIMS.intersection(update_fields)):
+        return
+    instance._claims_previos = (
+        sender.objects.filter(pk=instance.pk).values_list(*sorted(CAMPOS_CLAIMS)).first()
+    )
+
+
+@receiver(post_save, sender=get_user_model())
+def usuario_cambiado(sender, instance, update_fields=None, **kwargs):
+    """Refresca la caché de usuarios de ClaimsJWTAuthentication (incluida la desactivación)."""
+    user_id, activo = getattr(instance, jwt_settings.USER_ID_FIELD), instance.is_active
+    invalidar_usuario(user_id, activo)
+    transaction.on_commit(lambda: invalidar_usuario(user_id, activo), using=alias_actual())
+    previos = instance.__dict__.pop('_claims_previos', None)
+    if previos is not None and previos != tuple(getattr(instance, campo) for campo in sorted(CAMPOS_CLAIMS)):
+        _revocar_claims([user_id])
+    # Un login solo guarda last_login: no hace falta recalcular las estadísticas
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        transaction.on_commit(invalidar_estadisticas, using=alias_actual())
+
+
+@receiver(post_delete, sender=get_user_model())
+def usuario_borrado(sender, instance, **kwargs):
+    """
+    Revoca los access tokens vigentes del usuario borrado. El id se toma ya:
+    Django pone el pk a None antes de que corra el on_commit.
+    """
+    user_id = getattr(instance, jwt_settings.USER_ID_FIELD)
+    invalidar_usuario(user_id, activo=False)
+    transaction.on_commit(lambda: invalidar_usuario(user_id, activo=False), using=alias_actual())
+    transaction.on_commit(invalidar_estadisticas, using=alias_actual())
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def grupos_de_usuario_cambiados(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse: se cambió desde el grupo y pk_set son usuarios
+    if action == 'pre_clear' and reverse:
+        instance._usuarios_previos = list(sender.objects.filter(group_id=instance.pk).values_list('user_id', flat=True))
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            _revocar_claims([instance.pk])
+        elif action == 'post_clear':
+            _revocar_claims(instance.__dict__.pop('_usuarios_previos', []))
+        else:
+            _revocar_claims(pk_set)
+        transaction.on_commit(invalidar_estadisticas, using=alias_actual())
+
+
+@receiver(pre_delete, sender=Group)
+def grupo_por_borrar(sender, instance, **kwargs):
+    # El borrado en cascada de la membresía no emite m2m_changed
+    miembros = get_user_model().groups.through.objects.filter(group_id=instance.pk)
+    _revocar_claims(miembros.values_list('user_id', flat=True))
@@ -1,102 +1,90 @@
 # apps/users/tasks.py
 """
 Tareas asíncronas relacionadas con usuarios.
-Ejemplo: enviar email de verificación usando Mailgun (HTTP API).
+Ejemplo: email de verificación, encolado en el envío por lotes de apps.core.correo.
 """
+import io
 
-import os
-import uuid
-import requests
 from django.conf import settings
-from django.template.loader import render_to_string
 from django.urls import reverse
 
 from celery import shared_task
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django_tenants.utils import schema_context, get_public_schema_name
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from apps.core.bitacora import registrar_bitacora
+from apps.core.correo import encolar_correo
+from .importacion import importar_usuarios_csv
 
 User = get_user_model()
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def send_verification_email_task(self, user_id):
+
+def encolar_email_verificacion(user):
     """
-    Tarea Celery para enviar email de verificación.
-    Requiere en settings:
-    - MAILCHIMP_API_KEY
-    - DEFAULT_FROM_EMAIL
-    - SITE_URL (ej: https://mi-dominio.com)
+    Encola el email de verificación del usuario. Se renderiza y envía por
+    lotes (ver apps.core.correo); aquí no se abre ninguna conexión.
     """
+    verify_path = reverse('users-verify-email')
+    encolar_correo(
+        user.email,
+        "Verifica tu email",
+        'emails/verify_email',
+        {
+            'nombre': user.get_full_name() or user.username,
+            'verify_url': f"{settings.SITE_URL}{verify_path}?token={user.verification_uuid}",
+        },
+    )
 
+
+@shared_task
+def send_verification_email_task(user_id):
+    """Compatibilidad con tareas ya encoladas: solo pasa el email a la cola de envío."""
     try:
         user = User.objects.get(pk=user_id)
     except User.DoesNotExist:
         return {'status': 'error', 'reason': 'user_not_found'}
+    encolar_email_verificacion(user)
+    return {'status': 'queued'}
 
-    # Construir URL de verificación
-    token = str(user.verification_uuid)
-    site = getattr(settings, 'SITE_URL', 'http://localhost:8000')
-    verify_path = reverse('users-verify-email')  # Asegúrate que la url name esté registrada
-    verify_url = f"{site}{verify_path}?token={token}"
-
-    # Renderizar templates HTML y texto plano (crea estos templates)
-    subject = "Verifica tu email"
-    text_body = render_to_string('emails/verify_email.txt', {'user': user, 'verify_url': verify_url})
-    html_body = render_to_string('emails/verify_email.html', {'user': user, 'verify_url': verify_url})
-
-    # Preferimos usar Mailgun HTTP API
-    MANDRILL_API_KEY = getattr(settings, 'MAILGUN_API_KEY', None)
-    FROM_EMAIL = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@tu-dominio.com')
-    FROM_NAME = getattr(settings, 'DEFAULT_FROM_NAME', 'Tu Tienda')
 
-    if not MAILGUN_API_KEY:
-        # Si no está Mailgun configurado, intentar enviar con Django (fallback)
-        from django.core.mail import EmailMultiAlternatives
-        msg = EmailMultiAlternatives(subject, text_body, FROM_EMAIL, [user.email])
-        msg.attach_alternative(html_body, "text/html")
-        msg.send(fail_silently=True)
-        return {'status': 'sent_via_django'}
+@shared_task
+def podar_tokens_expirados(lote=5000, simular=False):
+    """
+    Borra por lotes los OutstandingToken caducados y sus BlacklistedToken.
+    Las tablas de token_blacklist viven en el esquema público; desde que la
+    lista negra está en Redis solo quedan filas antiguas, pero sin podar
+    crecían sin límite. Con simular=True solo cuenta.
+    """
+    ahora = timezone.now()
+    borrados = {'outstanding': 0, 'blacklisted': 0}
+    with schema_context(get_public_schema_name()):
+        caducados = OutstandingToken.objects.filter(expires_at__lte=ahora)
+        if simular:
+            borrados['outstanding'] = caducados.count()
+            borrados['blacklisted'] = BlacklistedToken.objects.filter(token__expires_at__lte=ahora).count()
+            return borrados
 
-    # Construir el payload JSON que Mandrill espera
-    payload = {
-        'key': MANDRILL_API_KEY,
-        'message': {
-            'html': html_body,
-            'text': text_body,
-            'subject': subject,
-            'from_email': FROM_EMAIL,
-            'from_name': FROM_NAME,
-            'to': [
-                {
-                    'email': user.email,
-                    'name': user.get_full_name() or user.username,
-                    'type': 'to'
-                }
-            ],
-            'important': False,
-            'track_opens': True,
-            'track_clicks': True,
-        },
-        'async': False # Lo ponemos síncrono para que la tarea Celery sepa si falló
-    }
+        while True:
+            ids = list(caducados.values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            borrados['blacklisted'] += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+            borrados['outstanding'] += OutstandingToken.objects.filter(id__in=ids).delete()[0]
+    return borrados
 
-    try:
-        response = requests.post(
-            'https://mandrillapp.com/api/1.0/messages/send.json',
-            json=payload, # <--- Usamos 'json' en lugar de 'data'
-            timeout=10
-        )
-        response.raise_for_status()
-        
-        # Mandrill devuelve una lista, comprobamos el estado del primer (y único) email
-        result = response.json()
-        if result[0]['status'] in ['sent', 'queued']:
-            return {'status': result[0]['status'], 'provider': 'mandrill'}
-        else:
-            # Si Mandrill lo rechazó (ej. 'rejected')
-            raise requests.RequestException(f"Mandrill rejected email: {result[0]['reject_reason']}")
 
-    except requests.RequestException as exc:
-        # Reintentar con backoff
-        try:
-            self.retry(exc=exc)
-        except Exception:
-            return {'status': 'error', 'detail': str(exc)}
+@shared_task
+def importar_usuarios(schema, contenido, rol_por_defecto, usuario_id=None, ip=None):
+    """
+    Importación de un CSV subido por la API (UserViewSet.import_users).
+    Hashea sin pool de procesos: el worker de Celery no puede abrir hijos, y
+    las cargas grandes van por `manage.py import_users`. El resumen lleva el
+    esquema para que solo lo consulte el mismo inquilino.
+    """
+    with schema_context(schema):
+        resumen = importar_usuarios_csv(io.StringIO(contenido), procesos=1, rol_por_defecto=rol_por_defecto)
+        usuario = User.objects.filter(pk=usuario_id).first() if usuario_id else None
+        registrar_bitacora(f"Importación masiva de usuarios: {resumen['creados']} creados", ip=ip, usuario=usuario)
+    return {**resumen, 'schema': schema}
@@ -0,0 +1,30 @@
+# apps/users/tokens.py
+"""
+Refresh token cuya lista negra vive en Redis (ver blacklist.py).
+No escribe OutstandingToken al emitirse ni consulta BlacklistedToken al
+verificarse, así el coste de un refresh no crece con los tokens emitidos.
+"""
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+from .blacklist import lista_negra
+
+
+class RedisRefreshToken(RefreshToken):
+
+    def check_blacklist(self):
+        if lista_negra.esta_anulado(self.payload[jwt_settings.JTI_CLAIM]):
+            raise TokenError('El token está en la lista negra.')
+
+    def blacklist(self):
+        lista_negra.anular(self.payload[jwt_settings.JTI_CLAIM], self.payload['exp'])
+
+    def outstand(self):
+        # Solo hace falta registrar los tokens que se anulan, y eso lo hace blacklist()
+        return None
+
+    @classmethod
+    def for_user(cls, user):
+        # Salta BlacklistMixin.for_user, que inserta un OutstandingToken por login
+        return super(BlacklistMixin, cls).for_user(user)
@@ -8,23 +8,27 @@ Views (DRF) para la app users:
 - ViewSet para CRUD de usuarios (administración)
 - Gestión de direcciones (ya incluida)
 """
+import logging
 import uuid
+
+import redis
+from celery.result import AsyncResult
+from django.conf import settings
+from django.db import connection
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
-from django.db.models import Q, Count
-from datetime import timedelta
 
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.settings import api_settings as jwt_settings
 
-from .tasks import send_verification_email_task
+from .tasks import encolar_email_verificacion, importar_usuarios
 
 from .serializers import (
     UserListSerializer, UserDetailSerializer, UserSignupSerializer, 
@@ -32,16 +36,17 @@ from .serializers import (
     UserStatisticsSerializer, DireccionSerializer, 
     AdminCreateUserSerializer
 )
+from apps.core.bitacora import registrar_bitacora
+from apps.core.throttling import grupo_limite
 from .models import Direccion
+from .roles import ROLES_ASIGNABLES, nombres_grupos, permisos_de, tiene_rol
+from .estadisticas import estadisticas_usuarios
+from .busqueda import ALCANCES, ROLES_STAFF, autocompletar_usuarios, filtrar_usuarios
+from .authentication import emitir_tokens
+from .tokens import RedisRefreshToken
 
 User = get_user_model()
-
-# Bitacora: si no existe el modelo Bitacora, evitamos excepción (mejor importarlo correctamente)
-try:
-    from bitacora.models import Bitacora
-except Exception:
-    Bitacora = None
-
+logger = logging.getLogger(__name__)
 
 class UserSignupView(CreateAPIView):
     """
@@ -53,18 +58,10 @@ class UserSignupView(CreateAPIView):
 
     def perform_create(self, serializer):
         user = serializer.save()
-        if Bitacora:
-            Bitacora.objects.create(
-                accion=f"Nuevo usuario registrado: {user.email}",
-                ip=self.get_client_ip(),
-                usuario=user
-            )
+        registrar_bitacora(f"Nuevo usuario registrado: {user.email}", ip=self.get_client_ip(), usuario=user)
 
         # Desactivado temporalmente el envío de correos de verificación
-        # try:
-        #     send_verification_email_task.delay(user.id)
-        # except Exception:
-        #     send_verification_email_task(user.id)
+        # encolar_email_verificacion(user)
 
     def get_client_ip(self):
         x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
@@ -103,12 +100,7 @@ class VerifyEmailView(APIView):
         user.verification_uuid = uuid.uuid4()
         user.save(update_fields=['is_verified', 'is_active', 'verification_uuid'])
 
-        if Bitacora:
-            Bitacora.objects.create(
-                accion=f"Usuario verificado: {user.email}",
-                ip=self._get_client_ip(),
-                usuario=user
-            )
+        registrar_bitacora(f"Usuario verificado: {user.email}", ip=self._get_client_ip(), usuario=user)
         return Response({"detail": "Email verificado correctamente."}, status=status.HTTP_200_OK)
 
     def _get_client_ip(self):
@@ -143,11 +135,12 @@ class ResendVerificationView(APIView):
         user.verification_uuid = uuid.uuid4()
         user.save(update_fields=['verification_uuid'])
 
-        # Lanzar tarea asíncrona para enviar email
+        # Se envía en lote desde la cola de correo (apps.core.correo)
         try:
-            send_verification_email_task.delay(user.id)
-        except Exception:
-            send_verification_email_task(user.id)
+            encolar_email_verificacion(user)
+        except redis.RedisError:
+            # Sin Redis no hay cola: se responde igual y el usuario puede pedir otro reenvío
+            logger.exception("No se pudo encolar el email de verificación de %s", user.pk)
 
         return Response({"detail": "Si el email existe, recibirás un enlace de verificación."}, status=status.HTTP_200_OK)
 
@@ -159,23 +152,14 @@ class LoginView(APIView):
         if serializer.is_valid():
             user = serializer.validated_data['user']
 
-            refresh = RefreshToken.for_user(user)
+            refresh = emitir_tokens(user)
             access_token = refresh.access_token
 
             user.last_login = timezone.now()
             user.save(update_fields=['last_login'])
             access_exp = (timezone.now() + jwt_settings.ACCESS_TOKEN_LIFETIME)
 
-            if Bitacora:
-                Bitacora.objects.create(
-                    accion="Login exitoso",
-                    ip=self.get_client_ip(request),
-                    usuario=user
-                )
-
-            permissions_list = []
-            for group in user.groups.all():
-                permissions_list.extend(group.permissions.values_list('codename', flat=True))
+            registrar_bitacora("Login exitoso", ip=self.get_client_ip(request), usuario=user)
 
             return Response({
                 'access_token': str(access_token),
@@ -187,8 +171,8 @@ class LoginView(APIView):
                     'email': user.email,
                     'first_name': user.first_name,
                     'last_name': user.last_name,
-                    'groups': list(user.groups.values_list('name', flat=True)),
-                    'permissions': list(set(permissions_list))
+                    'groups': nombres_grupos(user),
+                    'permissions': permisos_de(user)
                 }
             }, status=status.HTTP_200_OK)
 
@@ -208,8 +192,8 @@ class LogoutView(APIView):
         if not refresh_token:
             return Response({"detail": "Refresh token requerido."}, status=400)
         try:
-            token = RefreshToken(refresh_token)
-            token.blacklist()  # requiere token_blacklist app
+            token = RedisRefreshToken(refresh_token)
+            token.blacklist()  # lista negra en Redis (apps.users.blacklist)
             return Response({"detail": "Sesión cerrada."}, status=200)
         except Exception as e:
             return Response({"detail": "Token inválido o ya anulado."}, status=400)
@@ -244,19 +228,13 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        if Bitacora:
-            ip = self._get_client_ip(request)
-            Bitacora.objects.create(
-                accion=f"Admin creó nuevo usuario: {user.email}",
-                ip=ip,
-                usuario=request.user # El admin que hizo la acción
-            )
+        registrar_bitacora(f"Admin creó nuevo usuario: {user.email}", ip=self._get_client_ip(request), usuario=request.user)
 
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def get_permissions(self):
-        if self.action == 'profile':
+        if self.action in ['profile', 'autocomplete']:
             permission_classes = [permissions.IsAuthenticated]
         elif self.action in ['list', 'retrieve', 'stats', 'by_role']:
             permission_classes = [permissions.IsAdminUser]
@@ -275,16 +253,11 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = UserDetailSerializer(user, data=request.data, partial=partial, context={'request': request})
         if serializer.is_valid():
             # Evitar que no-admin cambie is_active
-            if 'is_active' in serializer.validated_data and not request.user.groups.filter(name='administrador').exists():
+            if 'is_active' in serializer.validated_data and not tiene_rol(request.user, 'administrador'):
                 serializer.validated_data.pop('is_active', None)
 
             serializer.save()
-            if Bitacora:
-                Bitacora.objects.create(
-                    accion=f"Perfil actualizado: {user.email}",
-                    ip=self._get_client_ip(request),
-                    usuario=user
-                )
+            registrar_bitacora(f"Perfil actualizado: {user.email}", ip=self._get_client_ip(request), usuario=user)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -328,26 +301,93 @@ class UserViewSet(viewsets.ModelViewSet):
         user.set_password(new_password)
         user.save()
 
-        if Bitacora:
-            Bitacora.objects.create(
-                accion=f"Contraseña cambiada: {user.email}",
-                ip=self._get_client_ip(request),
-                usuario=user
-            )
+        registrar_bitacora(f"Contraseña cambiada: {user.email}", ip=self._get_client_ip(request), usuario=user)
 
         return Response(
             {'detail': 'Contraseña cambiada exitosamente'},
             status=status.HTTP_200_OK
         )
 
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    @grupo_limite('exportaciones')
+    def import_users(self, request):
+        """
+        Importación masiva desde CSV (campo 'archivo'); ver apps.users.importacion.
+        Se encola en Celery (tarea importar_usuarios) y responde 202 con el id
+        de la tarea, que se consulta en import/<tarea_id>/. Los archivos de más
+        de IMPORTACION_API_MAX_BYTES van por `manage.py import_users`.
+        """
+        archivo = request.FILES.get('archivo')
+        if not archivo:
+            return Response({'error': 'Debe enviar un archivo CSV en el campo "archivo"'}, status=status.HTTP_400_BAD_REQUEST)
+        if archivo.size > settings.IMPORTACION_API_MAX_BYTES:
+            return Response(
+                {'archivo': [f'El archivo supera {settings.IMPORTACION_API_MAX_BYTES} bytes; use el comando import_users']},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        rol = request.data.get('role') or 'cliente'
+        if rol not in ROLES_ASIGNABLES:
+            return Response({'role': [f'Rol debe ser uno de: {ROLES_ASIGNABLES}']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            contenido = archivo.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return Response({'archivo': ['El archivo debe estar en UTF-8']}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tarea = importar_usuarios.delay(
+                connection.schema_name, contenido, rol, usuario_id=request.user.pk, ip=self._get_client_ip(request),
+            )
+        except Exception:
+            logger.exception("No se pudo encolar la importación de usuarios")
+            return Response({'error': 'No se pudo encolar la importación; intente más tarde'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return Response({'tarea_id': tarea.id, 'estado': tarea.state}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'import/(?P<tarea_id>[^/.]+)')
+    def import_status(self, request, tarea_id=None):
+        """Estado de una importación encolada por import_users y, al terminar, su resumen."""
+        tarea = AsyncResult(tarea_id)
+        if not tarea.ready():
+            return Response({'tarea_id': tarea_id, 'estado': tarea.state})
+        if tarea.failed():
+            return Response({'tarea_id': tarea_id, 'estado': tarea.state, 'error': str(tarea.result)})
+        resumen = dict(tarea.result or {})
+        # Los resultados de Celery son globales: solo se muestran al inquilino que la encoló
+        if resumen.pop('schema', None) != connection.schema_name:
+            return Response({'detail': 'No encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'tarea_id': tarea_id, 'estado': tarea.state, 'resumen': resumen})
+
     @action(detail=False, methods=['get'])
     def search(self, request):
         q = request.query_params.get('q', '')
         if not q:
             return Response({'count': 0, 'results': []})
-        users = User.objects.filter(Q(username__icontains=q) | Q(email__icontains=q)).prefetch_related('groups')[:10]
+        users = filtrar_usuarios(q).prefetch_related('groups')[:10]
         serializer = UserAdminListSerializer(users, many=True)
-        return Response({'count': users.count(), 'results': serializer.data})
+        return Response({'count': len(serializer.data), 'results': serializer.data})
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Selector de usuarios para el staff: ?q=texto&scope=todos|staff|clientes&limit=10.
+        Una consulta indexada (ver apps.users.busqueda); pensado para cada tecla.
+        """
+        user = request.user
+        roles = getattr(user, 'roles', None)  # claims del token si vienen de ClaimsJWTAuthentication
+        if roles is None:
+            roles = nombres_grupos(user)
+        if not (user.is_staff or set(roles) & set(ROLES_STAFF)):
+            return Response({'detail': 'Solo el personal puede buscar usuarios.'}, status=status.HTTP_403_FORBIDDEN)
+
+        alcance = request.query_params.get('scope', 'todos')
+        if alcance not in ALCANCES:
+            return Response({'scope': [f'Debe ser uno de: {list(ALCANCES)}']}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limite = 10
+
+        resultados = autocompletar_usuarios(request.query_params.get('q', ''), alcance, limite)
+        return Response({'count': len(resultados), 'results': resultados})
 
     @action(detail=False, methods=['get'])
     def active(self, request):
@@ -373,30 +413,8 @@ class UserViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        total_usuarios = User.objects.count()
-        usuarios_activos = User.objects.filter(is_active=True).count()
-        roles_conteo = Group.objects.annotate(
-            user_count=Count('user')
-        ).filter(user_count__gt=0).values('name', 'user_count')
-        
-        usuarios_por_rol = {rol['name']: rol['user_count'] for rol in roles_conteo}
-
-        ultimo_mes = timezone.now() - timedelta(days=30)
-        registros_ultimo_mes = User.objects.filter(date_joined__gte=ultimo_mes).count()
-        ultimo_login_user = User.objects.filter(last_login__isnull=False).order_by('-last_login').first()
-        hoy = timezone.now().date()
-        usuarios_nuevos_hoy = User.objects.filter(date_joined__date=hoy).count()
-
-        stats_data = {
-            'total_users': total_usuarios,
-            'active_users': usuarios_activos,
-            'users_by_role': usuarios_por_rol,
-            'registered_last_month': registros_ultimo_mes,
-            'last_login': (ultimo_login_user.last_login if ultimo_login_user else None),
-            'new_users_today': usuarios_nuevos_hoy,
-            'inactive_users': total_usuarios - usuarios_activos
-        }
-
+        # Una consulta agregada, cacheada por inquilino (ver apps.users.estadisticas)
+        stats_data = estadisticas_usuarios()
         serializer = UserStatisticsSerializer(stats_data)
         return Response(serializer.data)
 
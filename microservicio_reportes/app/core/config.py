@@ -9,4 +9,11 @@ if not COHERE_API_KEY:
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
-    raise ValueError("¡No se encontró la DATABASE_URL! Asegúrate de que tu archivo .env esté correcto.")
\ No newline at end of file
+    raise ValueError("¡No se encontró la DATABASE_URL! Asegúrate de que tu archivo .env esté correcto.")
+
+# Shards de inquilinos, con el mismo formato que el backend: "shard1=postgresql://...;shard2=..."
+# El shard 'default' es DATABASE_URL.
+TENANT_SHARDS_URLS = dict(
+    (parte.strip() for parte in shard.split("=", 1))
+    for shard in os.getenv("TENANT_SHARDS_URLS", "").split(";") if shard.strip()
+)
\ No newline at end of file
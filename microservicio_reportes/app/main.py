@@ -44,6 +44,8 @@ def generar_reporte(request: ReportRequest):
     if request.tenant_schema:
         parametros['tenant_schema'] = request.tenant_schema
         print(f"DEBUG: Usando tenant schema: {request.tenant_schema}")
+    if request.tenant_shard:
+        parametros['tenant_shard'] = request.tenant_shard
     
     formato = parametros.get('format', 'json').lower()
     
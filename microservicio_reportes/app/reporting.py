@@ -2,7 +2,7 @@
 import pandas as pd
 import io
 from sqlalchemy import create_engine, text
-from .core.config import DATABASE_URL
+from .core.config import DATABASE_URL, TENANT_SHARDS_URLS
 from fastapi import HTTPException
 
 from reportlab.lib.pagesizes import letter, landscape
@@ -329,7 +329,25 @@ METRIC_HANDLERS = {
     'cupones_mas_usados': _not_implemented,
 }
 
+_engines_shards = {}
+
+def _engine_de_shard(shard):
+    """Engine del shard del tenant; 'default' (o sin shard) es el engine de DATABASE_URL."""
+    if not shard or shard == 'default':
+        return engine
+    if shard not in TENANT_SHARDS_URLS:
+        raise HTTPException(status_code=400, detail="Unknown tenant shard")
+    if shard not in _engines_shards:
+        _engines_shards[shard] = create_engine(
+            TENANT_SHARDS_URLS[shard],
+            connect_args={"sslmode": "require", "connect_timeout": 10},
+            pool_pre_ping=True,
+            pool_recycle=3600,
+        )
+    return _engines_shards[shard]
+
 def get_report_dataframe(parametros: dict) -> pd.DataFrame:
+    engine = _engine_de_shard(parametros.get('tenant_shard'))
     if engine is None:
         raise Exception("Error crítico: El motor de la base de datos no está inicializado.")
 
@@ -5,4 +5,5 @@ from typing import Optional
 # en nuestro endpoint. FastAPI lo usará para validar.
 class ReportRequest(BaseModel):
     prompt: str
-    tenant_schema: Optional[str] = None  # Schema del tenant para multi-tenancy
\ No newline at end of file
+    tenant_schema: Optional[str] = None  # Schema del tenant para multi-tenancy
+    tenant_shard: Optional[str] = None  # Base (shard) donde vive ese schema; None = 'default'
\ No newline at end of file